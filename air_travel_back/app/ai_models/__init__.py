@@ -1,7 +1,14 @@
 """
 AI Models package initialization.
 """
-from .clip_model import CLIPModel
 from .label_mapping import normalize_label
 
 __all__ = ['YOLOModel', 'CLIPModel', 'normalize_label']
+
+
+def __getattr__(name):
+    # CLIPModel pulls in torch and CLIP; web workers using the inference server never load them.
+    if name == 'CLIPModel':
+        from .clip_model import CLIPModel
+        return CLIPModel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
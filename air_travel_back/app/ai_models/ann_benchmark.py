@@ -0,0 +1,97 @@
+"""
+Recall / latency / memory benchmark for the CLIP index configurations in app.ai_models.ann_index.
+
+    python -m app.ai_models.ann_benchmark [--sizes 10000 100000 1000000] [--kinds flat hnsw ivfpq]
+                                          [--ef-search 16 64 128] [--nprobe 8 16 64]
+
+Vectors are synthetic but shaped like landmark photo embeddings: L2-normalized points clustered
+around per-landmark centers (several photos per landmark). Queries are held-out noisy views of
+database landmarks. Ground truth is the exact top-k from a flat index, and queries are timed one at
+a time, as CLIPModel.search issues them. 1M x 512 float32 vectors need about 2 GB of RAM per copy.
+"""
+import argparse
+import time
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from app.ai_models.ann_index import build_ann_index, configure_search
+
+
+def synthetic_embeddings(n: int, d: int, photos_per_landmark: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((max(n // photos_per_landmark, 1), d)).astype("float32")
+    vectors = centers[rng.integers(0, len(centers), n)] + noise * rng.standard_normal((n, d)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def time_queries(index: faiss.Index, queries: np.ndarray, k: int) -> Dict[str, float]:
+    latencies, results = [], []
+    for q in queries:
+        started = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(ids[0])
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99)), "ids": np.array(results)}
+
+
+def run(sizes: List[int], kinds: List[str], d: int, k: int, n_queries: int, ef_searches: List[int], nprobes: List[int], seed: int):
+    rng = np.random.default_rng(seed)
+    header = f"{'n':>9} {'index':<16} {'param':<12} {'build_s':>8} {'MB':>9} {'recall@' + str(k):>9} {'p50_ms':>8} {'p99_ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for n in sizes:
+        base = synthetic_embeddings(n + n_queries, d, photos_per_landmark=10, noise=0.6, rng=rng)
+        database, queries = base[:n], base[n:]
+
+        exact = faiss.IndexFlatIP(d)
+        exact.add(database)
+        _, truth = exact.search(queries, k)
+
+        for kind in kinds:
+            if kind == "ivfpq" and n < 256:
+                continue
+            started = time.perf_counter()
+            index = exact if kind == "flat" else build_ann_index(database, kind)
+            build_s = time.perf_counter() - started
+            size_mb = faiss.serialize_index(index).nbytes / 1e6
+
+            if kind == "hnsw":
+                settings = [(f"efSearch={ef}", dict(ef_search=ef)) for ef in ef_searches]
+            elif kind == "ivfpq":
+                settings = [(f"nprobe={p}", dict(nprobe=p)) for p in nprobes]
+            else:
+                settings = [("-", {})]
+            for label, params in settings:
+                configure_search(index, **params)
+                timing = time_queries(index, queries, k)
+                print(f"{n:>9} {kind:<16} {label:<12} {build_s:>8.1f} {size_mb:>9.1f} "
+                      f"{recall_at_k(timing['ids'], truth, k):>9.3f} {timing['p50_ms']:>8.3f} {timing['p99_ms']:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flat / HNSW / IVF-PQ CLIP indexes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--kinds", nargs="+", choices=("flat", "hnsw", "ivfpq"), default=["flat", "hnsw", "ivfpq"])
+    parser.add_argument("--dim", type=int, default=512, help="ViT-B/32 embeddings are 512-d")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 64])
+    parser.add_argument("--threads", type=int, default=None, help="faiss OpenMP threads (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+    run(args.sizes, args.kinds, args.dim, args.k, args.queries, args.ef_search, args.nprobe, args.seed)
+
+
+if __name__ == "__main__":
+    main()
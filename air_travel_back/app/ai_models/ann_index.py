@@ -0,0 +1,140 @@
+"""
+FAISS index configurations for the CLIP landmark index.
+
+    flat   exact inner-product search; right for up to a few tens of thousands of photos
+    hnsw   graph index (HNSW{M},Flat); fast and high recall, keeps full vectors (~d*4 bytes + graph per photo)
+    ivfpq  inverted lists with product quantization (IVF{nlist},PQ{m}); compact codes for city-scale sets
+
+All use inner product on L2-normalized CLIP embeddings, so scores are cosine similarities.
+Query-time knobs (efSearch for HNSW, nprobe for IVF) are applied with configure_search.
+
+Convert an existing index to another configuration:
+
+    python -m app.ai_models.ann_index --kind hnsw [--src ai_data/index.faiss] [--out ...]
+"""
+import argparse
+import math
+import os
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+
+INDEX_KINDS = ("flat", "hnsw", "ivfpq")
+
+
+def index_factory_string(kind: str, n: int, d: int, hnsw_m: int = 32, nlist: Optional[int] = None, pq_m: Optional[int] = None) -> str:
+    if kind == "flat":
+        return "Flat"
+    if kind == "hnsw":
+        return f"HNSW{hnsw_m},Flat"
+    if kind == "ivfpq":
+        # ~4*sqrt(n) lists keeps lists short without starving training (faiss wants ~39+ points per centroid).
+        nlist = nlist or max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+        pq_m = pq_m or next(m for m in (64, 32, 16, 8, 4, 2, 1) if d % m == 0)
+        return f"IVF{nlist},PQ{pq_m}"
+    raise ValueError(f"Unknown index kind: {kind} (expected one of {', '.join(INDEX_KINDS)})")
+
+
+def build_ann_index(vectors: np.ndarray, kind: str = "flat", ids: Optional[np.ndarray] = None, **options) -> faiss.Index:
+    """
+    Builds (training if needed) an inner-product index of the given kind over normalized float32 vectors.
+    With `ids`, the index is wrapped in an IndexIDMap2 and the vectors are added under those ids.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, d = vectors.shape
+    if kind == "ivfpq" and n < 256:
+        raise ValueError(f"IVF-PQ needs at least 256 vectors to train its codebooks (got {n}); use flat or hnsw")
+    index = faiss.index_factory(d, index_factory_string(kind, n, d, **options), faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        index.train(vectors)
+    if ids is None:
+        index.add(vectors)
+        return index
+    id_map = faiss.IndexIDMap2(index)
+    id_map.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    return id_map
+
+
+def configure_search(index: faiss.Index, ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> faiss.Index:
+    """Applies the query-time parameters that exist on the index, looking through IDMap wrappers."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    hnsw = hnsw_of(index)
+    if hnsw is not None and ef_search:
+        hnsw.hnsw.efSearch = ef_search
+    return index
+
+
+def hnsw_of(index: faiss.Index):
+    """Returns the HNSW index wrapped by `index` (IDMap, IDMap2), or None."""
+    while True:
+        index = faiss.downcast_index(index)
+        if isinstance(index, faiss.IndexHNSW):
+            return index
+        if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            index = index.index
+            continue
+        return None
+
+
+def search_parameters(index: faiss.Index, selector=None):
+    """SearchParameters of the type the index expects, carrying its current efSearch / nprobe."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    hnsw = hnsw_of(index)
+    if hnsw is not None:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=hnsw.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def read_index_mmap(path: str) -> faiss.Index:
+    """
+    Opens an index read-only with its vectors memory-mapped from the file, so the web workers on a host
+    share one page-cache copy. Flat/HNSW storage maps with IO_FLAG_MMAP_IFC; IVF inverted lists map with
+    IO_FLAG_MMAP and refuse the combination.
+    """
+    flags = faiss.IO_FLAG_READ_ONLY | faiss.IO_FLAG_MMAP
+    try:
+        return faiss.read_index(path, flags | getattr(faiss, "IO_FLAG_MMAP_IFC", 0))
+    except RuntimeError:
+        return faiss.read_index(path, flags)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the CLIP faiss index as flat, HNSW or IVF-PQ.")
+    parser.add_argument("--kind", choices=INDEX_KINDS, required=True)
+    parser.add_argument("--src", default=settings.FAISS_INDEX_PATH)
+    parser.add_argument("--out", default=None, help="defaults to overwriting --src")
+    parser.add_argument("--meta", default=settings.META_DATA_PATH, help="meta file whose index lock guards --src")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--pq-m", type=int, default=None)
+    args = parser.parse_args()
+
+    from app.ai_models.landmark_store import index_lock  # avoid a cycle: landmark_store uses this module
+
+    out = args.out or args.src
+    # Held from read to rename, like LandmarkStore, so a concurrent add/remove/compact is neither lost nor torn.
+    with index_lock(args.meta):
+        source = faiss.read_index(args.src)
+        id_map = faiss.downcast_index(source)
+        if isinstance(id_map, faiss.IndexIDMap2):
+            # Ids are meta row numbers and may have gaps (retired photos); carry them over unchanged.
+            ids = faiss.vector_to_array(id_map.id_map)
+            vectors = id_map.reconstruct_batch(ids)
+        else:
+            ids, vectors = None, source.reconstruct_n(0, source.ntotal)
+        index = build_ann_index(vectors, args.kind, ids=ids, hnsw_m=args.hnsw_m, nlist=args.nlist, pq_m=args.pq_m)
+        faiss.write_index(index, out + ".tmp")
+        # Row order / ids are preserved, so meta entries still line up with index ids.
+        os.replace(out + ".tmp", out)
+    print(f"Wrote {args.kind} index with {index.ntotal} vectors to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Dynamic micro-batching: concurrent callers submit single items, a worker thread groups whatever
+arrives within a short window into one batch call and resolves each caller's future.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects submitted items until `max_batch_size` are waiting or `max_wait_ms` has passed since the
+    first one, then runs `process_batch(items) -> results` (same length and order) on the worker thread.
+    A lone request waits at most max_wait_ms; under load, batches fill before the deadline.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0, name: str = "micro-batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[Any, Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self) -> Tuple[List[Tuple[Any, Future]], bool]:
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if not batch:
+                continue
+            # Callers that gave up (cancelled futures) are dropped before the batch runs.
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            items, futures = [item for item, _ in batch], [future for _, future in batch]
+            try:
+                results = self.process_batch(items)
+            except Exception as e:
+                logger.exception(f"Batch of {len(items)} failed")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
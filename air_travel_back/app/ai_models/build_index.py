@@ -0,0 +1,195 @@
+"""
+Offline builder for the CLIP landmark index.
+
+    python -m app.ai_models.build_index [--images ai_data] [--manifest ai_data/meta_baked.bin]
+                                        [--landmarks landmarks.json] [--kind flat|hnsw|ivfpq]
+                                        [--workers N] [--batch-size 64]
+
+Labels come from, in order: the manifest entry for the file (landmark meta, .json or .bin, with
+"file", "label", "lat", "lon", "desc" per row, matched case-insensitively), the image's subdirectory
+(images/<label>/*.jpg), or the file name without its trailing number ("king sejong01.jpg" ->
+"king sejong"). --landmarks maps labels to {"lat", "lon", "desc"} for labels the manifest lacks.
+
+Images are decoded and preprocessed in a process pool while the main process encodes batches
+with CLIP. The index (an IDMap2 whose ids are meta row numbers) and the compact metadata file are
+written to temporary names and renamed into place.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import clip
+import numpy as np
+import torch
+from PIL import Image, ImageOps
+from torchvision.transforms import CenterCrop, Compose, InterpolationMode, Normalize, Resize, ToTensor
+
+from app.ai_models.ann_index import INDEX_KINDS, build_ann_index
+from app.ai_models.clip_runtime import CLIP_MODEL_NAME
+from app.ai_models.landmark_store import index_lock, write_index_files
+from app.ai_models.meta_store import load_meta
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+META_FIELDS = ("file", "label", "lat", "lon", "desc")
+
+# CLIP's own preprocessing (clip.load's transform), rebuilt here so pool workers do not load the model.
+CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+
+_transform = None
+
+
+def _init_worker(resolution: int):
+    global _transform
+    torch.set_num_threads(1)
+    _transform = Compose([
+        Resize(resolution, interpolation=InterpolationMode.BICUBIC),
+        CenterCrop(resolution),
+        ToTensor(),
+        Normalize(CLIP_MEAN, CLIP_STD),
+    ])
+
+
+def _preprocess(path: str) -> Optional[np.ndarray]:
+    try:
+        with Image.open(path) as image:
+            # Phone photos store their rotation in EXIF; CLIP should see them upright.
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            return _transform(image).numpy()
+    except Exception as e:
+        logger.warning(f"Skipping unreadable image {path}: {e}")
+        return None
+
+
+def label_from_filename(file_name: str) -> str:
+    stem = os.path.splitext(file_name)[0]
+    return re.sub(r"[\s_-]*\d+$", "", stem).strip() or stem
+
+
+def collect_images(images_dir: str, manifest: List[Dict[str, Any]], landmarks: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Returns one metadata entry (plus its "path") per image file, sorted for a reproducible index."""
+    by_file = {entry["file"].casefold(): entry for entry in manifest if entry.get("file")}
+    # Coordinates known for a label from any manifest entry apply to all of its photos.
+    label_info: Dict[str, Dict[str, Any]] = {}
+    for entry in manifest:
+        if entry.get("lat") is not None and entry.get("label") not in label_info:
+            label_info[entry["label"]] = {"lat": entry["lat"], "lon": entry["lon"]}
+    for label, info in landmarks.items():
+        label_info[label] = {**label_info.get(label, {}), **info}
+
+    entries = []
+    for root, _, files in os.walk(images_dir):
+        for file_name in files:
+            if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, file_name)
+            rel = os.path.relpath(path, images_dir)
+            known = by_file.get(rel.casefold()) or by_file.get(file_name.casefold()) or {}
+            if known.get("label"):
+                label = known["label"]
+            elif os.path.dirname(rel):
+                label = os.path.basename(os.path.dirname(rel))
+            else:
+                label = label_from_filename(file_name)
+            info = label_info.get(label, {})
+            entries.append({
+                "path": path,
+                "file": rel,
+                "label": label,
+                "lat": known.get("lat", info.get("lat")),
+                "lon": known.get("lon", info.get("lon")),
+                "desc": known.get("desc") or info.get("desc") or label,
+            })
+    entries.sort(key=lambda e: e["file"].casefold())
+    return entries
+
+
+def _batches(items: Iterator[Tuple[int, Optional[np.ndarray]]], size: int) -> Iterator[List[Tuple[int, np.ndarray]]]:
+    batch = []
+    for position, pixels in items:
+        if pixels is None:
+            continue
+        batch.append((position, pixels))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_images(paths: List[str], workers: int, batch_size: int, device: str) -> Tuple[np.ndarray, List[int]]:
+    """CLIP-encodes the images. Returns L2-normalized float32 embeddings and the positions that decoded."""
+    model, _ = clip.load(CLIP_MODEL_NAME, device=device)
+    model.eval()
+    resolution = model.visual.input_resolution
+
+    vectors, kept = [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(resolution,)) as pool:
+        decoded = zip(range(len(paths)), pool.map(_preprocess, paths, chunksize=8))
+        for batch in _batches(decoded, batch_size):
+            pixels = torch.from_numpy(np.stack([p for _, p in batch])).to(device)
+            with torch.inference_mode():
+                embeddings = model.encode_image(pixels).float()
+                embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
+            vectors.append(embeddings.cpu().numpy())
+            kept.extend(position for position, _ in batch)
+            logger.info(f"Encoded {len(kept)}/{len(paths)} images")
+    if not vectors:
+        raise SystemExit("No images could be decoded.")
+    return np.ascontiguousarray(np.concatenate(vectors), dtype="float32"), kept
+
+
+def build(images_dir: str, index_path: str, meta_path: str, manifest_path: Optional[str], landmarks_path: Optional[str],
+          kind: str, workers: int, batch_size: int, device: str) -> int:
+    manifest = load_meta(manifest_path).to_records() if manifest_path and os.path.exists(manifest_path) else []
+    landmarks = {}
+    if landmarks_path:
+        with open(landmarks_path, encoding="utf-8") as f:
+            landmarks = json.load(f)
+
+    entries = collect_images(images_dir, manifest, landmarks)
+    if not entries:
+        raise SystemExit(f"No images found in {images_dir}")
+    logger.info(f"Found {len(entries)} images, {len({e['label'] for e in entries})} labels")
+
+    started = time.perf_counter()
+    vectors, kept = encode_images([e["path"] for e in entries], workers, batch_size, device)
+    meta = [{field: entries[position][field] for field in META_FIELDS} for position in kept]
+
+    # ids are meta row numbers, so ids and rows stay aligned and later updates can add/remove by id.
+    index = build_ann_index(vectors, kind, ids=np.arange(len(meta)))
+    with index_lock(meta_path):
+        write_index_files(index, meta, index_path, meta_path)
+    logger.info(f"Built {kind} index of {index.ntotal} images in {time.perf_counter() - started:.1f}s")
+    return index.ntotal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the CLIP landmark index from labeled reference photos.")
+    parser.add_argument("--images", default=settings.AI_MODELS_DIR)
+    parser.add_argument("--manifest", default=settings.META_DATA_PATH, help="existing metadata with labels/coordinates per file")
+    parser.add_argument("--landmarks", default=None, help="JSON {label: {lat, lon, desc}} for labels without manifest entries")
+    parser.add_argument("--out-index", default=settings.FAISS_INDEX_PATH)
+    parser.add_argument("--out-meta", default=settings.META_DATA_PATH)
+    parser.add_argument("--kind", choices=INDEX_KINDS, default="flat")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    count = build(args.images, args.out_index, args.out_meta, args.manifest, args.landmarks,
+                  args.kind, args.workers, args.batch_size, args.device)
+    print(f"Indexed {count} images into {args.out_index} ({args.out_meta})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Accuracy and latency check for the CPU inference options in app.ai_models.clip_runtime.
+
+    python -m app.ai_models.clip_benchmark [--images ai_data] [--meta ai_data/meta_baked.bin]
+                                           [--trace] [--threads N] [--runs 50] [--batch-size 16]
+
+Every live reference photo is used as a query against the others (leave-one-out), as the running
+service would see it: queries come from the candidate encoder, the index keeps fp32 embeddings
+because build_index and landmark ingestion write those. Reports how many top-1 labels differ from
+the fp32 baseline (the gate for enabling CLIP_QUANTIZE), cosine similarity to the fp32 embeddings,
+single-frame encode latency and batched throughput.
+"""
+import argparse
+import os
+import time
+from typing import Callable, Dict, List
+
+import clip
+import numpy as np
+import torch
+from PIL import Image
+
+from app.ai_models.clip_runtime import CLIP_MODEL_NAME, optimize_image_encoder, set_torch_threads
+from app.ai_models.meta_store import load_meta
+from app.core.config import settings
+
+
+def encode(encoder: Callable[[torch.Tensor], torch.Tensor], pixels: torch.Tensor, batch_size: int) -> np.ndarray:
+    vectors = []
+    with torch.inference_mode():
+        for start in range(0, len(pixels), batch_size):
+            v = encoder(pixels[start:start + batch_size])
+            vectors.append((v / v.norm(dim=-1, keepdim=True)).float().numpy())
+    return np.concatenate(vectors)
+
+
+def leave_one_out_top1(queries: np.ndarray, references: np.ndarray, labels: List[str]) -> List[str]:
+    scores = queries @ references.T
+    np.fill_diagonal(scores, -np.inf)
+    return [labels[j] for j in scores.argmax(axis=1)]
+
+
+def time_encoder(encoder: Callable[[torch.Tensor], torch.Tensor], pixels: torch.Tensor, runs: int, batch_size: int) -> Dict[str, float]:
+    with torch.inference_mode():
+        encoder(pixels[:1])  # warm-up (lazy init, first-call graph optimization for traced modules)
+        latencies = []
+        for i in range(runs):
+            frame = pixels[i % len(pixels)][None]
+            started = time.perf_counter()
+            encoder(frame)
+            latencies.append((time.perf_counter() - started) * 1000)
+        batch = pixels[:batch_size]
+        started = time.perf_counter()
+        for _ in range(max(1, runs // batch_size)):
+            encoder(batch)
+        throughput = max(1, runs // batch_size) * len(batch) / (time.perf_counter() - started)
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99)), "images_per_s": throughput}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fp32 and optimized CPU CLIP encoders on the reference photos.")
+    parser.add_argument("--images", default=settings.AI_MODELS_DIR)
+    parser.add_argument("--meta", default=settings.META_DATA_PATH)
+    parser.add_argument("--trace", action="store_true", help="also trace the quantized encoder")
+    parser.add_argument("--threads", type=int, default=settings.CLIP_TORCH_THREADS)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    set_torch_threads(args.threads)
+    meta = load_meta(args.meta)
+    rows = [i for i in range(len(meta)) if not meta.retired(i) and os.path.exists(os.path.join(args.images, meta[i]["file"]))]
+    if len(rows) < 2:
+        raise SystemExit("Need at least two reference photos on disk.")
+    labels = [meta.label(i) for i in rows]
+
+    model, preprocess = clip.load(CLIP_MODEL_NAME, device="cpu")
+    pixels = torch.stack([preprocess(Image.open(os.path.join(args.images, meta[i]["file"])).convert("RGB")) for i in rows])
+
+    baseline = encode(model.encode_image, pixels, args.batch_size)
+    baseline_top1 = leave_one_out_top1(baseline, baseline, labels)
+    variants = {"fp32": model.encode_image}
+    variants["int8" + ("+trace" if args.trace else "")] = optimize_image_encoder(model, quantize=True, trace=args.trace)
+
+    print(f"{len(rows)} reference photos, {len(set(labels))} labels, {torch.get_num_threads()} threads")
+    header = f"{'encoder':<12} {'top1_acc':>8} {'changed':>8} {'cos_fp32':>9} {'p50_ms':>8} {'p99_ms':>8} {'img/s':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, encoder in variants.items():
+        vectors = baseline if name == "fp32" else encode(encoder, pixels, args.batch_size)
+        top1 = leave_one_out_top1(vectors, baseline, labels)
+        accuracy = np.mean([p == t for p, t in zip(top1, labels)])
+        changed = [(meta[rows[i]]["file"], baseline_top1[i], top1[i]) for i in range(len(rows)) if top1[i] != baseline_top1[i]]
+        cosine = float(np.mean(np.sum(vectors * baseline, axis=1)))
+        timing = time_encoder(encoder, pixels, args.runs, args.batch_size)
+        print(f"{name:<12} {accuracy:>8.3f} {len(changed):>8} {cosine:>9.4f} "
+              f"{timing['p50_ms']:>8.1f} {timing['p99_ms']:>8.1f} {timing['images_per_s']:>8.1f}")
+        for file_name, before, after in changed:
+            print(f"    {file_name}: {before} -> {after}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,84 +2,203 @@
 CLIP model wrapper for scene recognition using FAISS.
 """
 import os
-import json
-import math
+import logging
+import threading
 import torch
 import clip
 import faiss
 import numpy as np
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from PIL import Image
 from collections import defaultdict
+from concurrent.futures import Future
 from app.core.config import settings
+from app.ai_models.geo_index import GeoIndex
+from app.ai_models.batcher import MicroBatcher
+from app.ai_models.clip_runtime import CLIP_MODEL_NAME, optimize_image_encoder, set_torch_threads
+from app.ai_models.ann_index import configure_search, read_index_mmap, search_parameters
+from app.ai_models.meta_store import MetaStore, load_meta
+from app.ai_models.landmark_store import index_lock, index_signature
+
+logger = logging.getLogger(__name__)
+
+# GPS candidate radii (m), tried in order until one contains reference photos.
+GPS_CANDIDATE_RADII_M = (800, 1500)
+# Candidate sets up to this size are scored directly from their stored vectors instead of through an ID selector.
+DIRECT_SCORING_MAX_CANDIDATES = 4096
+
+class IndexSnapshot:
+    """An index/meta pair with the lookups derived from it. Replaced as a whole, never mutated."""
+
+    def __init__(self, faiss_index: Optional[faiss.Index], meta: MetaStore, signature: Optional[Tuple] = None):
+        if faiss_index is not None:
+            configure_search(faiss_index, settings.CLIP_FAISS_EF_SEARCH, settings.CLIP_FAISS_NPROBE)
+        self.faiss_index = faiss_index
+        self.meta = meta
+        # Built once: per-request GPS filtering is a grid lookup plus vectorized haversine on nearby cells.
+        self.geo_index = GeoIndex.from_meta(meta)
+        self.signature = signature
+
+    @classmethod
+    def load(cls, index_path: str, meta_path: str) -> "IndexSnapshot":
+        # Shared lock: LandmarkStore / build_index cannot be halfway through replacing the pair.
+        with index_lock(meta_path, shared=True):
+            signature = index_signature(index_path, meta_path)
+            faiss_index = None
+            if os.path.exists(index_path):
+                faiss_index = read_index_mmap(index_path) if settings.CLIP_FAISS_MMAP else faiss.read_index(index_path)
+            meta = load_meta(meta_path) if os.path.exists(meta_path) else MetaStore.from_records([])
+        return cls(faiss_index, meta, signature)
+
 
 class CLIPModel:
     """CLIP model wrapper for scene recognition."""
     
-    def __init__(self):
+    def __init__(self, index_path: str = settings.FAISS_INDEX_PATH, meta_path: str = settings.META_DATA_PATH):
         self.device = "cuda" if (hasattr(torch, "cuda") and torch.cuda.is_available()) else "cpu"
+        self.index_path, self.meta_path = index_path, meta_path
+        self._reload_lock = threading.Lock()
+        self._watcher_stop = threading.Event()
         
         try:
-            self.model, self.preprocess = clip.load("ViT-B/32", device=self.device)
-            self.faiss_index = faiss.read_index(settings.FAISS_INDEX_PATH) if os.path.exists(settings.FAISS_INDEX_PATH) else None
-            self.meta_data = json.load(open(settings.META_DATA_PATH, "r", encoding="utf-8")) if os.path.exists(settings.META_DATA_PATH) else []
+            self.model, self.preprocess = clip.load(CLIP_MODEL_NAME, device=self.device)
+            self.image_encoder = self.model.encode_image
+            if self.device == "cpu":
+                set_torch_threads(settings.CLIP_TORCH_THREADS)
+                self.image_encoder = optimize_image_encoder(self.model, settings.CLIP_QUANTIZE, settings.CLIP_JIT_TRACE)
+            self.snapshot = IndexSnapshot.load(index_path, meta_path)
         except Exception as e:
             self.model = self.preprocess = None
-            self.faiss_index, self.meta_data = None, []
+            self.snapshot = IndexSnapshot(None, MetaStore.from_records([]))
             print(f"[CLIP/FAISS disabled] {e}")
+        self._batcher = MicroBatcher(self.search_batch, settings.CLIP_BATCH_MAX_SIZE, settings.CLIP_BATCH_MAX_WAIT_MS, name="clip-batcher")
+
+    def use_index(self, faiss_index: Optional[faiss.Index], meta_records: List[dict], signature: Optional[Tuple] = None):
+        """Swaps in an index/meta pair that was just written to disk (LandmarkStore), without re-reading it."""
+        self.snapshot = IndexSnapshot(faiss_index, MetaStore.from_records(meta_records), signature)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Loads the index files into a new snapshot if they changed on disk (or `force`), then swaps it in.
+        Searches already running keep the snapshot they started with. Returns whether a swap happened.
+        """
+        if self.model is None:
+            return False
+        with self._reload_lock:
+            if not force and index_signature(self.index_path, self.meta_path) == self.snapshot.signature:
+                return False
+            snapshot = IndexSnapshot.load(self.index_path, self.meta_path)
+            self.snapshot = snapshot
+        ntotal = snapshot.faiss_index.ntotal if snapshot.faiss_index is not None else 0
+        logger.info(f"Reloaded CLIP index: {ntotal} vectors, {len(snapshot.meta)} meta rows")
+        return True
+
+    def start_index_watcher(self, interval: float = settings.CLIP_INDEX_WATCH_SECONDS) -> threading.Thread:
+        """Polls the index files and reloads on change, so every worker picks up rebuilds and landmark updates."""
+        def watch():
+            while not self._watcher_stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    # Keep serving the current snapshot; a half-copied or corrupt file is retried next poll.
+                    logger.warning(f"CLIP index reload failed: {e}")
+
+        self._watcher_stop.clear()
+        thread = threading.Thread(target=watch, name="clip-index-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_index_watcher(self):
+        self._watcher_stop.set()
+
+    def encode_images(self, images: List[Image.Image], reference: bool = False) -> np.ndarray:
+        """
+        L2-normalized float32 CLIP embeddings, one row per image. Reference photos for the index use the
+        fp32 encoder, like build_index, even when queries run through the int8/traced one.
+        """
+        encoder = self.model.encode_image if reference else self.image_encoder
+        with torch.inference_mode():
+            x = torch.stack([self.preprocess(image) for image in images]).to(self.device)
+            v = encoder(x.type(self.model.dtype))
+            v = v / v.norm(dim=-1, keepdim=True)
+        return v.float().cpu().numpy()
     
-    def _haversine(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calculate haversine distance between two GPS coordinates."""
-        R = 6371000.0
-        toR = math.radians
-        dlat = toR(lat2 - lat1)
-        dlon = toR(lon2 - lon1)
-        a = math.sin(dlat/2)**2 + math.cos(toR(lat1))*math.cos(toR(lat2))*math.sin(dlon/2)**2
-        return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
+    @staticmethod
+    def _search_candidates(index: faiss.Index, q: np.ndarray, cand_ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k among the candidate ids only, so nearby landmarks are never crowded out by a global top-k.
+        Small candidate sets are scored exactly from their reconstructed vectors (cost independent of the
+        index size); larger ones, or indexes that cannot reconstruct, use a faiss ID selector.
+        """
+        if cand_ids.size <= DIRECT_SCORING_MAX_CANDIDATES and index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            try:
+                vectors = index.reconstruct_batch(cand_ids.astype("int64"))
+            except RuntimeError:
+                vectors = None
+            if vectors is not None:
+                scores = vectors @ q[0]
+                top = np.argsort(-scores)[:k]
+                return scores[top][None, :], cand_ids[top][None, :]
+        params = search_parameters(index, faiss.IDSelectorBatch(cand_ids.astype("int64")))
+        return index.search(q, k, params=params)
+
     def search(self, image: Image.Image, lat: Optional[float] = None, lon: Optional[float] = None) -> Optional[Dict[str, str]]:
         """Search for similar scenes using CLIP and FAISS."""
-        if self.model is None or self.faiss_index is None or not self.meta_data:
-            return None
+        return self.search_batch([(image, lat, lon)])[0]
 
-        # 유니크 라벨이 2개 미만이면 확정하지 않음
-        if len({m["label"] for m in self.meta_data}) < 2:
-            return None
+    def submit(self, image: Image.Image, lat: Optional[float] = None, lon: Optional[float] = None) -> Future:
+        """search() through the micro-batcher: concurrent requests share one forward pass and one faiss search."""
+        return self._batcher.submit((image, lat, lon))
 
-        with torch.no_grad():
-            x = self.preprocess(image).unsqueeze(0).to(self.device)
-            v = self.model.encode_image(x)
-            v = v / v.norm(dim=-1, keepdim=True)
-        q = v.detach().cpu().numpy().astype("float32")
-
-        # GPS 후보 제한(있으면)
-        cand_idx = list(range(len(self.meta_data)))
-        has_gps = (lat is not None and lon is not None)
-        if has_gps:
-            c800 = [i for i, m in enumerate(self.meta_data)
-                    if m.get("lat") is not None and self._haversine(lat, lon, m["lat"], m["lon"]) <= 800]
-            c1500 = [i for i, m in enumerate(self.meta_data)
-                     if m.get("lat") is not None and self._haversine(lat, lon, m["lat"], m["lon"]) <= 1500]
-            cand_idx = c800 or c1500 or cand_idx
-
-        k = min(10, self.faiss_index.ntotal)
-        if k == 0: 
-            return None
-        
-        D, I = self.faiss_index.search(q, k)
-        if I.size == 0: 
-            return None
+    def search_batch(self, requests: List[Tuple[Image.Image, Optional[float], Optional[float]]]) -> List[Optional[Dict[str, str]]]:
+        """search() for several (image, lat, lon) requests: one batched encode, one batched search for those without GPS candidates."""
+        # 검색 도중 인덱스가 교체되어도 이 배치는 시작 시점의 스냅샷으로 끝까지 처리
+        snapshot = self.snapshot
+        index, meta = snapshot.faiss_index, snapshot.meta
+        if self.model is None or index is None or not meta.live_count:
+            return [None] * len(requests)
+
+        # 유니크 라벨이 2개 미만이면 확정하지 않음 (라벨 통계는 로드 시 계산됨)
+        if meta.label_count < 2:
+            return [None] * len(requests)
+
+        Q = self.encode_images([image for image, _, _ in requests])
+
+        # GPS 후보 제한(있으면): 반경 내 사진만 대상으로 순위를 매김, 없으면 전체 검색
+        hits: List[Optional[Tuple[np.ndarray, np.ndarray]]] = [None] * len(requests)
+        has_gps = [lat is not None and lon is not None for _, lat, lon in requests]
+        global_rows = []
+        for row, (_, lat, lon) in enumerate(requests):
+            cand_ids = snapshot.geo_index.candidates(lat, lon, GPS_CANDIDATE_RADII_M) if has_gps[row] else None
+            if cand_ids is None:
+                global_rows.append(row)
+            else:
+                D, I = self._search_candidates(index, Q[row:row + 1], cand_ids, min(10, cand_ids.size))
+                hits[row] = (D[0], I[0])
+
+        k = min(10, index.ntotal)
+        if global_rows and k > 0:
+            D, I = index.search(Q[global_rows], k)
+            for j, row in enumerate(global_rows):
+                hits[row] = (D[j], I[j])
+
+        return [self._decide(meta, hit, gps) if hit is not None else None for hit, gps in zip(hits, has_gps)]
 
-        pairs = [(float(D[0][j]), int(I[0][j]))
-                 for j in range(len(I[0]))
-                 if (not cand_idx) or (int(I[0][j]) in cand_idx)]
+    @staticmethod
+    def _decide(meta: MetaStore, hit: Tuple[np.ndarray, np.ndarray], has_gps: bool) -> Optional[Dict[str, str]]:
+        """Votes the top hits into a label, or None when the evidence is too weak."""
+        D, I = hit
+        # 폐기(retired)된 사진은 제외 (HNSW는 압축 전까지 벡터가 남아 있음)
+        pairs = [(float(D[j]), int(I[j]))
+                 for j in range(len(I))
+                 if 0 <= int(I[j]) < len(meta) and not meta.retired(int(I[j]))]
         if not pairs: 
             return None
 
         # 라벨별 표 모으기 (top-5)
         votes = defaultdict(list)
         for s, idx in pairs[:5]:
-            votes[self.meta_data[idx]["label"]].append(s)
+            votes[meta.label(idx)].append(s)
 
         # 게이트: 최소 점수/표/마진 (인식률 향상을 위해 낮춤)
         min_score  = 0.25 if not has_gps else 0.20
@@ -103,9 +222,8 @@ class CLIPModel:
 
         # 통과 → 해당 라벨 설명 반환
         for s, idx in pairs:
-            if self.meta_data[idx]["label"] == best_label:
-                m = self.meta_data[idx]
-                return {"label": m["label"], "description": m.get("desc", m["label"])}
+            if meta.label(idx) == best_label:
+                return {"label": best_label, "description": meta.desc(idx) or best_label}
         return None
 
 
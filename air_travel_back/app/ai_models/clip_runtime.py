@@ -0,0 +1,54 @@
+"""
+CPU inference options for the CLIP image encoder.
+
+    quantize  dynamic int8 quantization of the nn.Linear layers (the transformer MLPs, which carry most
+              of ViT-B/32's FLOPs); attention projections and the patch convolution stay fp32
+    trace     TorchScript trace of the (possibly quantized) visual tower, frozen for inference
+
+Both only apply to query photos. Reference photos (build_index, landmark ingestion) are always encoded
+by the fp32 model, so the index holds one embedding space and quantized queries are scored against it.
+Check accuracy and latency on the reference photos with python -m app.ai_models.clip_benchmark.
+"""
+import logging
+from typing import Callable
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+CLIP_MODEL_NAME = "ViT-B/32"
+
+# Traced and eager outputs may differ by float rounding only.
+TRACE_TOLERANCE = 1e-3
+
+
+def set_torch_threads(threads: int):
+    """Intra-op threads for CPU inference; 0 keeps torch's default (one per core)."""
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+
+def optimize_image_encoder(model: torch.nn.Module, quantize: bool = False, trace: bool = False) -> Callable[[torch.Tensor], torch.Tensor]:
+    """
+    Returns a callable mapping preprocessed image batches to (unnormalized) image features, equivalent to
+    model.encode_image. `model` must be on the CPU; it is left unchanged (quantization works on a copy of the
+    visual tower), so model.encode_image stays available as the fp32 encoder.
+    """
+    visual = model.visual.eval()
+    if quantize:
+        visual = torch.ao.quantization.quantize_dynamic(visual, {torch.nn.Linear}, dtype=torch.qint8)
+    if not trace:
+        return visual
+
+    resolution = model.visual.input_resolution
+    try:
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(visual, torch.randn(2, 3, resolution, resolution)))
+            # The trace must not bake in the example's batch size.
+            check = torch.randn(3, 3, resolution, resolution)
+            if not torch.allclose(traced(check), visual(check), atol=TRACE_TOLERANCE):
+                raise RuntimeError("traced encoder output differs from eager output")
+    except Exception as e:
+        logger.warning(f"CLIP encoder tracing failed, running eager: {e}")
+        return visual
+    return traced
@@ -0,0 +1,83 @@
+"""
+Grid index over reference photo coordinates for GPS radius queries.
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def haversine_m(lat: float, lon: float, lats_rad: np.ndarray, lons_rad: np.ndarray) -> np.ndarray:
+    """Distances in meters from (lat, lon) in degrees to arrays of points given in radians."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    a = np.sin((lats_rad - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lats_rad) * np.sin((lons_rad - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoIndex:
+    """
+    Buckets meta entries into lat/lon cells of `cell_deg` degrees. A radius query only computes
+    (vectorized) haversine distances for the entries in the cells overlapping the query's bounding box,
+    so its cost follows the number of nearby photos rather than the size of the landmark database.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, cell_deg: float = 0.02):
+        self.size = len(lats)
+        self.cell_deg = cell_deg
+        self.lon_cells = int(math.ceil(360.0 / cell_deg))
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        self.ids = np.flatnonzero(valid)
+        self.lats_rad = np.radians(lats[valid])
+        self.lons_rad = np.radians(lons[valid])
+
+        # Sort entries by cell so each cell is one contiguous slice of self.ids.
+        lat_cells = np.floor((lats[valid] + 90.0) / cell_deg).astype(np.int64)
+        lon_cells = np.floor((lons[valid] + 180.0) / cell_deg).astype(np.int64) % self.lon_cells
+        keys = lat_cells * self.lon_cells + lon_cells
+        order = np.argsort(keys, kind="stable")
+        self.ids, self.lats_rad, self.lons_rad, keys = self.ids[order], self.lats_rad[order], self.lons_rad[order], keys[order]
+        unique_keys, starts = np.unique(keys, return_index=True)
+        ends = np.append(starts[1:], len(keys))
+        self._cells: Dict[int, Tuple[int, int]] = {int(k): (int(s), int(e)) for k, s, e in zip(unique_keys, starts, ends)}
+
+    @classmethod
+    def from_meta(cls, meta, cell_deg: float = 0.02) -> "GeoIndex":
+        """From a MetaStore, whose coordinate columns are NaN for unknown or retired rows."""
+        return cls(meta.lats.astype(np.float64), meta.lons.astype(np.float64), cell_deg)
+
+    def _cell_slices(self, lat: float, lon: float, radius_m: float) -> List[Tuple[int, int]]:
+        lat_span = radius_m / METERS_PER_DEGREE_LAT
+        lon_span = radius_m / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        lat_lo = int(math.floor((max(lat - lat_span, -90.0) + 90.0) / self.cell_deg))
+        lat_hi = int(math.floor((min(lat + lat_span, 90.0) + 90.0) / self.cell_deg))
+        lon_lo = int(math.floor((lon - lon_span + 180.0) / self.cell_deg))
+        lon_hi = int(math.floor((lon + lon_span + 180.0) / self.cell_deg))
+        if lon_hi - lon_lo + 1 >= self.lon_cells:
+            lon_lo, lon_hi = 0, self.lon_cells - 1
+        slices = []
+        for lat_cell in range(lat_lo, lat_hi + 1):
+            for lon_cell in range(lon_lo, lon_hi + 1):
+                cell = self._cells.get(lat_cell * self.lon_cells + lon_cell % self.lon_cells)
+                if cell:
+                    slices.append(cell)
+        return slices
+
+    def within(self, lat: float, lon: float, radius_m: float) -> np.ndarray:
+        """Meta indices of the entries within radius_m meters of (lat, lon)."""
+        slices = self._cell_slices(lat, lon, radius_m)
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        positions = np.concatenate([np.arange(start, end) for start, end in slices])
+        distances = haversine_m(lat, lon, self.lats_rad[positions], self.lons_rad[positions])
+        return np.sort(self.ids[positions[distances <= radius_m]])
+
+    def candidates(self, lat: float, lon: float, radii_m: Tuple[float, ...]) -> Optional[np.ndarray]:
+        """Meta indices within the first radius that has any entries, or None when no radius matches anything."""
+        for radius_m in radii_m:
+            ids = self.within(lat, lon, radius_m)
+            if ids.size:
+                return ids
+        return None
@@ -0,0 +1,218 @@
+"""
+Incremental updates to the CLIP landmark index and its metadata.
+
+    python -m app.ai_models.landmark_store add --label kyobo [--desc ...] [--lat ... --lon ...] photo1.jpg photo2.jpg
+    python -m app.ai_models.landmark_store remove (--label kyobo | --ids 3 4)
+    python -m app.ai_models.landmark_store compact
+
+Index ids are meta row numbers and stay stable across additions and removals: new photos are
+appended as new rows, and removed rows are kept as {"retired": true} tombstones (their vectors are
+dropped from the index, or masked for HNSW, which cannot delete). Compaction rebuilds what needs
+rebuilding and renumbers the live rows; it runs on demand and whenever tombstones exceed
+CLIP_INDEX_COMPACT_RATIO of the rows.
+
+Every change runs under an exclusive file lock, against a fresh read of both files, and is
+committed by writing both files to temporary names and renaming them into place. Metadata is
+renamed first: until the index follows, readers see new rows without vectors or retired rows
+that still have vectors, and both are harmless. Compaction renumbers ids, so readers that load
+both files (CLIPModel's reload) take the same lock in shared mode.
+"""
+import argparse
+import fcntl
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.ai_models.ann_index import hnsw_of, index_factory_string
+from app.ai_models.meta_store import load_meta, write_meta
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def index_lock(meta_path: str, shared: bool = False):
+    """
+    File lock guarding the index/meta pair: writers hold it exclusively while they read-modify-commit,
+    readers hold it shared while loading both files, so a reader never pairs files from different commits.
+    """
+    with open(meta_path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def index_signature(index_path: str, meta_path: str) -> Tuple:
+    """Identity of the files on disk; os.replace gives a renamed-in file a new inode."""
+    def stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+    return stat(index_path), stat(meta_path)
+
+
+def write_index_files(index: faiss.Index, meta: List[Dict[str, Any]], index_path: str, meta_path: str):
+    """Writes both files under temporary names, then renames them into place (metadata first)."""
+    faiss.write_index(index, index_path + ".tmp")
+    write_meta(meta, meta_path + ".tmp", like=meta_path)
+    os.replace(meta_path + ".tmp", meta_path)
+    os.replace(index_path + ".tmp", index_path)
+
+
+def live_rows(meta: List[Dict[str, Any]]) -> np.ndarray:
+    return np.array([i for i, m in enumerate(meta) if not m.get("retired")], dtype="int64")
+
+
+def _empty_like(index: faiss.Index) -> faiss.Index:
+    """An empty index of the same kind as `index`, to be filled with vectors reconstructed from it."""
+    hnsw = hnsw_of(index)
+    if hnsw is not None:
+        factory = index_factory_string("hnsw", 0, index.d, hnsw_m=hnsw.hnsw.nb_neighbors(1))
+        return faiss.index_factory(index.d, factory, faiss.METRIC_INNER_PRODUCT)
+    if faiss.try_extract_index_ivf(index) is not None:
+        # Rebuilding from reconstructed PQ codes would compound quantization error.
+        raise ValueError("IVF-PQ indexes must be rebuilt from the photos: python -m app.ai_models.build_index --kind ivfpq")
+    return faiss.IndexFlatIP(index.d)
+
+
+def as_id_map(index: faiss.Index) -> faiss.Index:
+    """Returns `index` as an IndexIDMap2 keyed by meta row; indexes built before ids existed are rewrapped."""
+    id_map = faiss.downcast_index(index)
+    if isinstance(id_map, faiss.IndexIDMap2):
+        # The downcast proxy does not own the index; keep the owner alive with it.
+        id_map.referenced_objects = [index]
+        return id_map
+    wrapped = faiss.IndexIDMap2(_empty_like(index))
+    wrapped.add_with_ids(index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype="int64"))
+    return wrapped
+
+
+class LandmarkStore:
+    """Adds, retires and compacts reference photos in the on-disk CLIP index."""
+
+    def __init__(self, index_path: str = settings.FAISS_INDEX_PATH, meta_path: str = settings.META_DATA_PATH):
+        self.index_path = index_path
+        self.meta_path = meta_path
+        self.index: Optional[faiss.Index] = None
+        self.meta: List[Dict[str, Any]] = []
+        # index_signature of the files as last committed, for readers handed self.index / self.meta directly
+        self.signature: Optional[Tuple] = None
+
+    @contextmanager
+    def _transaction(self):
+        """Locks out other writers (threads and processes), loads the current files and commits on success."""
+        with index_lock(self.meta_path):
+            index = as_id_map(faiss.read_index(self.index_path)) if os.path.exists(self.index_path) else None
+            meta = load_meta(self.meta_path).to_records() if os.path.exists(self.meta_path) else []
+            state = {"index": index, "meta": meta}
+            yield state
+            write_index_files(state["index"], state["meta"], self.index_path, self.meta_path)
+            self.index, self.meta = state["index"], state["meta"]
+            self.signature = index_signature(self.index_path, self.meta_path)
+
+    def add(self, vectors: np.ndarray, entries: List[Dict[str, Any]]) -> List[int]:
+        """Appends normalized embeddings with their meta entries (label, desc, lat, lon, file). Returns their ids."""
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if len(vectors) != len(entries):
+            raise ValueError("vectors and entries must have the same length")
+        with self._transaction() as state:
+            if state["index"] is None:
+                state["index"] = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+            ids = np.arange(len(state["meta"]), len(state["meta"]) + len(entries), dtype="int64")
+            state["index"].add_with_ids(vectors, ids)
+            state["meta"].extend(entries)
+        logger.info(f"Added {len(ids)} landmark photos (ids {ids[0]}..{ids[-1]})" if len(ids) else "Added no landmark photos")
+        return ids.tolist()
+
+    def remove(self, ids: Optional[Iterable[int]] = None, labels: Optional[Iterable[str]] = None) -> int:
+        """Retires photos by id and/or label. Returns how many were retired; compacts past the tombstone ratio."""
+        ids, labels = set(ids or ()), set(labels or ())
+        with self._transaction() as state:
+            meta = state["meta"]
+            retired = np.array([i for i, m in enumerate(meta)
+                                if not m.get("retired") and (i in ids or m.get("label") in labels)], dtype="int64")
+            for i in retired:
+                meta[i] = {"retired": True}
+            if retired.size and state["index"] is not None:
+                try:
+                    state["index"].remove_ids(faiss.IDSelectorBatch(retired))
+                except RuntimeError:
+                    pass  # HNSW cannot delete; the tombstone masks the vector until compaction
+            if meta and (len(meta) - live_rows(meta).size) / len(meta) >= settings.CLIP_INDEX_COMPACT_RATIO:
+                self._compact(state)
+        logger.info(f"Retired {retired.size} landmark photos")
+        return int(retired.size)
+
+    def compact(self) -> Tuple[int, int]:
+        """Drops tombstones and renumbers live rows. Returns (rows before, rows after)."""
+        with self._transaction() as state:
+            before = len(state["meta"])
+            self._compact(state)
+        return before, len(self.meta)
+
+    def _compact(self, state: Dict[str, Any]):
+        meta, index = state["meta"], state["index"]
+        live = live_rows(meta)
+        if index is not None:
+            if index.ntotal > live.size:
+                # Masked vectors remain (HNSW): rebuild the graph from the live vectors.
+                rebuilt = faiss.IndexIDMap2(_empty_like(index))
+                if live.size:
+                    rebuilt.add_with_ids(index.reconstruct_batch(live), np.arange(live.size, dtype="int64"))
+                index = rebuilt
+            else:
+                # Vectors are already gone; only the ids need renumbering.
+                remap = np.full(len(meta), -1, dtype="int64")
+                remap[live] = np.arange(live.size, dtype="int64")
+                faiss.copy_array_to_vector(remap[faiss.vector_to_array(index.id_map)], index.id_map)
+                index.construct_rev_map()
+        state["index"], state["meta"] = index, [meta[i] for i in live]
+        logger.info(f"Compacted landmark index: {len(meta)} -> {live.size} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add, retire or compact reference photos in the CLIP landmark index.")
+    parser.add_argument("--index", default=settings.FAISS_INDEX_PATH)
+    parser.add_argument("--meta", default=settings.META_DATA_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="encode photos of one landmark and append them")
+    add.add_argument("images", nargs="+")
+    add.add_argument("--label", required=True)
+    add.add_argument("--desc", default=None)
+    add.add_argument("--lat", type=float, default=None)
+    add.add_argument("--lon", type=float, default=None)
+    add.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    remove = commands.add_parser("remove", help="retire photos by label or id")
+    remove.add_argument("--label", nargs="+", default=[])
+    remove.add_argument("--ids", type=int, nargs="+", default=[])
+    commands.add_parser("compact", help="drop retired rows and renumber ids")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = LandmarkStore(args.index, args.meta)
+    if args.command == "add":
+        # Imported here so remove/compact work without torch installed.
+        from app.ai_models.build_index import encode_images
+        vectors, kept = encode_images(args.images, args.workers, batch_size=64, device="cpu")
+        entries = [{"file": os.path.relpath(os.path.abspath(args.images[i]), settings.AI_MODELS_DIR), "label": args.label,
+                    "lat": args.lat, "lon": args.lon, "desc": args.desc or args.label} for i in kept]
+        print(f"Added ids {store.add(vectors, entries)}")
+    elif args.command == "remove":
+        if not args.label and not args.ids:
+            parser.error("remove needs --label or --ids")
+        print(f"Retired {store.remove(ids=args.ids, labels=args.label)} photos")
+    else:
+        before, after = store.compact()
+        print(f"Compacted {before} -> {after} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Columnar, memory-mapped metadata for the CLIP landmark index.
+
+    python -m app.ai_models.meta_store old_meta.json ai_data/meta_baked.bin
+
+Row i describes index id i. Labels and descriptions are interned; coordinates are float32 arrays
+(NaN when unknown) and retired rows have label id -1. A .bin file is one header plus aligned
+arrays, opened with np.memmap so every worker on the host shares the same page-cache pages and
+loading costs no parsing. Paths ending in .json keep the original list-of-dicts format.
+
+ai_data/meta_baked.bin is the metadata of record: it is changed by build_index and landmark_store, and
+a readable copy is one conversion away (python -m app.ai_models.meta_store ai_data/meta_baked.bin out.json).
+
+Layout: MAGIC, uint64 header length, JSON header {"rows", "columns": {name: [offset, dtype, count]}},
+then each column at a 64-byte aligned offset.
+"""
+import argparse
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"LNDMETA1"
+ALIGN = 64
+
+
+def _string_table(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _intern(values: List[Optional[str]]) -> Tuple[np.ndarray, List[str]]:
+    table: Dict[str, int] = {}
+    ids = np.array([-1 if v is None else table.setdefault(v, len(table)) for v in values], dtype=np.int32)
+    return ids, list(table)
+
+
+class MetaStore:
+    """Read-only view of the landmark metadata; rows are materialized as dicts only when asked for."""
+
+    def __init__(self, label_ids: np.ndarray, desc_ids: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                 labels: List[str], descs: Tuple[np.ndarray, np.ndarray], files: Tuple[np.ndarray, np.ndarray]):
+        self.label_ids, self.desc_ids = label_ids, desc_ids
+        self.lats, self.lons = lats, lons
+        self.labels = labels
+        self._descs, self._files = descs, files
+        # Label statistics are fixed per snapshot, so they are computed once here rather than per search.
+        live = label_ids[label_ids >= 0]
+        self.label_count = int(np.unique(live).size)
+        self.live_count = int(live.size)
+
+    def __len__(self) -> int:
+        return len(self.label_ids)
+
+    @staticmethod
+    def _string(table: Tuple[np.ndarray, np.ndarray], i: int) -> str:
+        offsets, blob = table
+        return bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def retired(self, i: int) -> bool:
+        return self.label_ids[i] < 0
+
+    def label(self, i: int) -> Optional[str]:
+        label_id = self.label_ids[i]
+        return self.labels[label_id] if label_id >= 0 else None
+
+    def desc(self, i: int) -> Optional[str]:
+        desc_id = self.desc_ids[i]
+        return self._string(self._descs, desc_id) if desc_id >= 0 else self.label(i)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if self.retired(i):
+            return {"retired": True}
+        lat, lon = float(self.lats[i]), float(self.lons[i])
+        return {"file": self._string(self._files, i), "label": self.label(i),
+                "lat": None if np.isnan(lat) else lat, "lon": None if np.isnan(lon) else lon, "desc": self.desc(i)}
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [self[i] for i in range(len(self))]
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "MetaStore":
+        label_ids, labels = _intern([None if r.get("retired") else r["label"] for r in records])
+        desc_ids, descs = _intern([None if r.get("retired") else r.get("desc") for r in records])
+
+        def coordinate(r, key):
+            value = None if r.get("retired") else r.get(key)
+            return np.nan if value is None else float(value)
+
+        lats = np.array([coordinate(r, "lat") for r in records], dtype=np.float32)
+        lons = np.array([coordinate(r, "lon") for r in records], dtype=np.float32)
+        files = _string_table(["" if r.get("retired") else r.get("file", "") for r in records])
+        return cls(label_ids, desc_ids, lats, lons, labels, _string_table(descs), files)
+
+    def _columns(self) -> Dict[str, np.ndarray]:
+        label_offsets, label_blob = _string_table(self.labels)
+        return {
+            "label_ids": self.label_ids, "desc_ids": self.desc_ids, "lats": self.lats, "lons": self.lons,
+            "label_offsets": label_offsets, "label_blob": label_blob,
+            "desc_offsets": self._descs[0], "desc_blob": self._descs[1],
+            "file_offsets": self._files[0], "file_blob": self._files[1],
+        }
+
+    def write(self, path: str):
+        columns = {name: np.ascontiguousarray(array) for name, array in self._columns().items()}
+        # Column offsets are relative to the first aligned position after the header.
+        layout, position = {}, 0
+        for name, array in columns.items():
+            layout[name] = [position, array.dtype.str, int(array.size)]
+            position += -(-array.nbytes // ALIGN) * ALIGN
+        header = json.dumps({"rows": len(self), "columns": layout}).encode("utf-8")
+        data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+        with open(path, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            for name, array in columns.items():
+                f.seek(data_start + layout[name][0])
+                f.write(array.tobytes())
+            f.truncate(data_start + position)
+
+    @classmethod
+    def open(cls, path: str) -> "MetaStore":
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a landmark meta file")
+        (header_len,) = struct.unpack("<Q", bytes(buffer[len(MAGIC):len(MAGIC) + 8]))
+        header = json.loads(bytes(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_len]))
+        data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+
+        def column(name):
+            offset, dtype, count = header["columns"][name]
+            dtype = np.dtype(dtype)
+            start = data_start + offset
+            return buffer[start:start + count * dtype.itemsize].view(dtype)
+
+        label_offsets, label_blob = column("label_offsets"), column("label_blob")
+        labels = [bytes(label_blob[label_offsets[i]:label_offsets[i + 1]]).decode("utf-8") for i in range(len(label_offsets) - 1)]
+        return cls(column("label_ids"), column("desc_ids"), column("lats"), column("lons"), labels,
+                   (column("desc_offsets"), column("desc_blob")), (column("file_offsets"), column("file_blob")))
+
+
+def load_meta(path: str) -> MetaStore:
+    """Opens a .bin meta file memory-mapped, or parses a legacy .json list."""
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return MetaStore.from_records(json.load(f))
+    return MetaStore.open(path)
+
+
+def write_meta(records: List[Dict[str, Any]], path: str, like: Optional[str] = None):
+    """Writes meta records in the format implied by the extension of `like` (default: `path`), e.g. to a temp name."""
+    if (like or path).endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, separators=(",", ":"))
+    else:
+        MetaStore.from_records(records).write(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert landmark metadata between .json and the memory-mapped .bin format.")
+    parser.add_argument("src")
+    parser.add_argument("out")
+    args = parser.parse_args()
+    records = load_meta(args.src).to_records()
+    write_meta(records, args.out + ".tmp", like=args.out)
+    os.replace(args.out + ".tmp", args.out)
+    print(f"Wrote {len(records)} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
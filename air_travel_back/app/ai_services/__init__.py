@@ -1,8 +1,27 @@
 """
 AI Services package initialization.
 """
-from .detection_service import DetectionService
+from app.core.config import settings
 from .rag_service import RAGService
 from .tts_service import TTSService
 
-__all__ = ['DetectionService', 'RAGService', 'TTSService']
+__all__ = ['DetectionService', 'RemoteDetectionService', 'create_detection_service', 'RAGService', 'TTSService']
+
+
+def create_detection_service():
+    """In-process models (INFERENCE_BACKEND=local) or a client for python -m app.inference_server ("remote")."""
+    if settings.INFERENCE_BACKEND == "remote":
+        from .remote_detection_service import RemoteDetectionService
+        return RemoteDetectionService()
+    from .detection_service import DetectionService
+    return DetectionService()
+
+
+def __getattr__(name):
+    if name == 'DetectionService':
+        from .detection_service import DetectionService
+        return DetectionService
+    if name == 'RemoteDetectionService':
+        from .remote_detection_service import RemoteDetectionService
+        return RemoteDetectionService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
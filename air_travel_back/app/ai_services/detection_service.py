@@ -1,9 +1,16 @@
 """
 Detection service that combines YOLO and CLIP models.
 """
-from typing import List, Dict, Any, Optional
+import asyncio
+import io
+import os
+import threading
+import uuid
+from typing import List, Dict, Any, Optional, Tuple, Iterable
 from PIL import Image
 from app.ai_models import CLIPModel, normalize_label
+from app.ai_models.landmark_store import LandmarkStore
+from app.core.config import settings
 # from app.ai_models import YOLOModel  # 주석처리 (서울 데이터셋으로 재훈련 필요)
 
 class DetectionService:
@@ -12,6 +19,8 @@ class DetectionService:
     def __init__(self):
         # self.yolo_model = YOLOModel()  # 주석처리 (서울 데이터셋으로 재훈련 필요)
         self.clip_model = CLIPModel()
+        self._landmark_store: Optional[LandmarkStore] = None
+        self._landmark_store_lock = threading.Lock()
     
     def detect_objects_and_scenes(self, image: Image.Image, lat: Optional[float] = None, lon: Optional[float] = None) -> List[Dict[str, Any]]:
         """Detect objects using YOLO and scenes using CLIP."""
@@ -32,17 +41,86 @@ class DetectionService:
         #     })
         
         # CLIP scene recognition
-        scene_det = self.clip_model.search(image, lat, lon)
-        if scene_det is not None:
-            raw_label = scene_det["label"]
-            ko_label, aliases = normalize_label(raw_label)
-            
-            detections.append({
-                "id": "scene",
-                "label": ko_label,
-                "description": scene_det.get("description") or ko_label,
-                "bbox": [0.0, 0.0, 1.0, 1.0],
-                "type": "scene"
-            })
+        detections.extend(self._scene_detections(self.clip_model.search(image, lat, lon)))
         
         return detections
+
+    async def detect_scenes_async(self, image: Image.Image, lat: Optional[float] = None, lon: Optional[float] = None) -> List[Dict[str, Any]]:
+        """CLIP scene recognition for request handlers: micro-batched with concurrent requests, off the event loop."""
+        scene_det = await asyncio.wrap_future(self.clip_model.submit(image, lat, lon))
+        return self._scene_detections(scene_det)
+
+    @property
+    def model_available(self) -> bool:
+        return self.clip_model.model is not None
+
+    @property
+    def landmark_store(self) -> LandmarkStore:
+        # Opened on first use: only landmark admin requests write the index.
+        with self._landmark_store_lock:
+            if self._landmark_store is None:
+                self._landmark_store = LandmarkStore()
+            return self._landmark_store
+
+    def _serve_landmark_store(self):
+        """Swap in the index/meta pair LandmarkStore just committed, without waiting for the watcher."""
+        store = self.landmark_store
+        self.clip_model.use_index(store.index, store.meta, store.signature)
+
+    def add_landmark_photos(self, uploads: List[Tuple[Optional[str], bytes]], label: str, description: Optional[str] = None,
+                            lat: Optional[float] = None, lon: Optional[float] = None) -> List[int]:
+        """
+        Encodes (file name, image bytes) uploads and adds them to the live index under `label`. The originals
+        are kept in ai_data/ingested next to the other reference photos so build_index can re-encode them later.
+        """
+        if self.clip_model.model is None:
+            raise RuntimeError("CLIP model is not available")
+        images = [Image.open(io.BytesIO(data)).convert("RGB") for _, data in uploads]
+        vectors = self.clip_model.encode_images(images, reference=True)
+
+        ingest_dir = os.path.join(settings.AI_MODELS_DIR, "ingested")
+        os.makedirs(ingest_dir, exist_ok=True)
+        entries = []
+        for filename, data in uploads:
+            file_name = f"{uuid.uuid4().hex}{os.path.splitext(filename or '')[1].lower() or '.jpg'}"
+            with open(os.path.join(ingest_dir, file_name), "wb") as f:
+                f.write(data)
+            entries.append({"file": os.path.join("ingested", file_name), "label": label,
+                            "lat": lat, "lon": lon, "desc": description or label})
+
+        ids = self.landmark_store.add(vectors, entries)
+        self._serve_landmark_store()
+        return ids
+
+    def retire_landmark_photos(self, ids: Optional[Iterable[int]] = None, labels: Optional[Iterable[str]] = None) -> int:
+        retired = self.landmark_store.remove(ids, labels)
+        self._serve_landmark_store()
+        return retired
+
+    def compact_landmarks(self) -> Tuple[int, int]:
+        rows = self.landmark_store.compact()
+        self._serve_landmark_store()
+        return rows
+
+    def reload_index(self, force: bool = False) -> Dict[str, Any]:
+        reloaded = self.clip_model.reload(force)
+        snapshot = self.clip_model.snapshot
+        return {
+            "reloaded": reloaded,
+            "vectors": snapshot.faiss_index.ntotal if snapshot.faiss_index is not None else 0,
+            "rows": len(snapshot.meta)
+        }
+
+    @staticmethod
+    def _scene_detections(scene_det: Optional[Dict[str, str]]) -> List[Dict[str, Any]]:
+        if scene_det is None:
+            return []
+        raw_label = scene_det["label"]
+        ko_label, aliases = normalize_label(raw_label)
+        return [{
+            "id": "scene",
+            "label": ko_label,
+            "description": scene_det.get("description") or ko_label,
+            "bbox": [0.0, 0.0, 1.0, 1.0],
+            "type": "scene"
+        }]
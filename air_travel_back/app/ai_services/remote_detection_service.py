@@ -0,0 +1,155 @@
+"""
+DetectionService client for the inference server (python -m app.inference_server).
+
+Web workers talk to the process that owns the models over multiprocessing.connection (a Unix socket
+or host:port, authenticated with INFERENCE_AUTHKEY). Requests are (op, *args) tuples and replies
+("ok", result) or ("error", message). Connections are pooled per web worker and spread round-robin
+over INFERENCE_ADDRESSES, so inference servers scale independently of API workers. Landmark photo
+writes also run in the server, so web workers never open the faiss index. Every call blocks on the
+socket: async handlers run them with asyncio.to_thread.
+"""
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# CLIP's preprocessing starts by resizing the short side to this; doing that step here keeps
+# camera frames small on the wire without changing what the model sees.
+CLIP_INPUT_SIZE = 224
+
+# Landmark writes encode full-size photos and may compact the index; they get longer than a detection.
+LANDMARK_WRITE_TIMEOUT_SECONDS = 600
+
+
+class InferenceError(RuntimeError):
+    """The inference server could not be reached or failed the request."""
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """"host:port" -> (host, port); anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and host and not address.startswith("/") and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def image_payload(image: Image.Image) -> Tuple[str, Tuple[int, int], bytes]:
+    """Raw RGB pixels, pre-shrunk exactly as CLIP's Resize(224, bicubic) would (short side to 224)."""
+    image = image.convert("RGB")
+    width, height = image.size
+    short, long = min(width, height), max(width, height)
+    if short > CLIP_INPUT_SIZE:
+        new_long = int(CLIP_INPUT_SIZE * long / short)
+        size = (CLIP_INPUT_SIZE, new_long) if width <= height else (new_long, CLIP_INPUT_SIZE)
+        image = image.resize(size, Image.BICUBIC)
+    return image.mode, image.size, image.tobytes()
+
+
+def payload_image(payload: Tuple[str, Tuple[int, int], bytes]) -> Image.Image:
+    mode, size, data = payload
+    return Image.frombytes(mode, size, data)
+
+
+class RemoteDetectionService:
+    """Same interface as DetectionService, served by the inference server."""
+
+    def __init__(self, addresses: str = settings.INFERENCE_ADDRESSES, authkey: str = settings.INFERENCE_AUTHKEY,
+                 pool_size: int = settings.INFERENCE_POOL_SIZE, timeout: float = settings.INFERENCE_TIMEOUT_SECONDS):
+        if not authkey:
+            raise RuntimeError("INFERENCE_AUTHKEY must be set when INFERENCE_BACKEND=remote")
+        self.addresses = [parse_address(a.strip()) for a in addresses.split(",") if a.strip()]
+        self.authkey = authkey.encode("utf-8")
+        self.timeout = timeout
+        self._next_address = itertools.cycle(self.addresses)
+        self._address_lock = threading.Lock()
+        self._idle: "queue.LifoQueue[Connection]" = queue.LifoQueue()
+        # Bounds the connections (and so concurrent server-side requests) this worker opens.
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _connect(self) -> Connection:
+        with self._address_lock:
+            address = next(self._next_address)
+        return Client(address, authkey=self.authkey)
+
+    def _exchange(self, conn: Connection, request: tuple, timeout: float) -> Any:
+        conn.send(request)
+        if not conn.poll(timeout):
+            raise TimeoutError(f"no reply within {timeout}s")
+        status, result = conn.recv()
+        if status != "ok":
+            raise InferenceError(result)
+        return result
+
+    def _call(self, op: str, *args, idempotent: bool = True, timeout: Optional[float] = None) -> Any:
+        with self._slots:
+            # A pooled connection may have been dropped by a server restart: read-only requests retry once on a
+            # fresh one. Writes are never retried (the server may have applied them before the connection broke),
+            # so they skip the pool and open their own connection instead.
+            conn = None
+            if idempotent:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+            for _ in range(2 if idempotent else 1):
+                try:
+                    if conn is None:
+                        conn = self._connect()
+                    result = self._exchange(conn, (op, *args), timeout or self.timeout)
+                except InferenceError:
+                    self._idle.put(conn)
+                    raise
+                except TimeoutError as e:
+                    # The server is still working on it; the late reply would desynchronize this connection.
+                    if conn is not None:
+                        conn.close()
+                    raise InferenceError(f"inference server did not answer {op}: {e}") from e
+                except (OSError, EOFError, AuthenticationError) as e:
+                    if conn is not None:
+                        conn.close()
+                    conn = None
+                    last_error = e
+                    continue
+                self._idle.put(conn)
+                return result
+            raise InferenceError(f"inference server unavailable: {last_error}") from last_error
+
+    @property
+    def model_available(self) -> bool:
+        try:
+            return bool(self._call("stats")["model"])
+        except InferenceError:
+            return False
+
+    def detect_objects_and_scenes(self, image: Image.Image, lat: Optional[float] = None, lon: Optional[float] = None) -> List[Dict[str, Any]]:
+        return self._call("detect", image_payload(image), lat, lon)
+
+    async def detect_scenes_async(self, image: Image.Image, lat: Optional[float] = None, lon: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Runs the blocking round trip off the event loop; the server micro-batches across all web workers."""
+        return await asyncio.to_thread(self.detect_objects_and_scenes, image, lat, lon)
+
+    def add_landmark_photos(self, uploads: List[Tuple[Optional[str], bytes]], label: str, description: Optional[str] = None,
+                            lat: Optional[float] = None, lon: Optional[float] = None) -> List[int]:
+        """Originals go to the server unresized: it keeps them for later index rebuilds."""
+        return self._call("landmarks_add", uploads, label, description, lat, lon,
+                          idempotent=False, timeout=LANDMARK_WRITE_TIMEOUT_SECONDS)
+
+    def retire_landmark_photos(self, ids: Optional[Iterable[int]] = None, labels: Optional[Iterable[str]] = None) -> int:
+        return self._call("landmarks_remove", list(ids) if ids else None, list(labels) if labels else None,
+                          idempotent=False, timeout=LANDMARK_WRITE_TIMEOUT_SECONDS)
+
+    def compact_landmarks(self) -> Tuple[int, int]:
+        return tuple(self._call("landmarks_compact", idempotent=False, timeout=LANDMARK_WRITE_TIMEOUT_SECONDS))
+
+    def reload_index(self, force: bool = False) -> Dict[str, Any]:
+        return self._call("reload", force)
@@ -1,28 +1,36 @@
 """
 AI Analysis endpoints for place recognition and scene analysis.
 """
+import asyncio
 import base64
 import io
-import uuid
 from typing import Optional, List, Dict, Any
 from PIL import Image
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 
 from app.db.database import get_db
 from app.api.deps import get_current_user
 from app.db.models import User
-from app.ai_services import DetectionService, RAGService, TTSService
+from app.ai_services import RAGService, TTSService, create_detection_service
 from app.ai_models import normalize_label
+from app.ai_services.remote_detection_service import InferenceError
+from app.core.config import settings
+from app.services.llm_client import LLMPriority, llm_priority
 
 router = APIRouter()
 
 # Initialize AI services
-detection_service = DetectionService()
+detection_service = create_detection_service()
 rag_service = RAGService()
 tts_service = TTSService()
 
+async def _summarize(label: str, aliases: Optional[List[str]] = None) -> Optional[str]:
+    """RAG summary for a user waiting on the camera screen: interactive LLM priority, off the event loop."""
+    with llm_priority(LLMPriority.INTERACTIVE):
+        return await asyncio.to_thread(rag_service.summarize, label, aliases)
+
 class DetectionResult(BaseModel):
     """Represents a single detection returned to the client."""
     id: str
@@ -39,6 +47,12 @@ class AnalyzeRequest(BaseModel):
     longitude: Optional[float] = Field(None, description="GPS longitude coordinate")
     trip_id: Optional[int] = Field(None, description="Associated trip ID")
 
+def _require_landmark_admin(current_user: User = Depends(get_current_user)) -> User:
+    admins = {email.strip().lower() for email in settings.LANDMARK_ADMIN_EMAILS.split(",") if email.strip()}
+    if current_user.email.lower() not in admins:
+        raise HTTPException(status_code=403, detail="랜드마크 관리 권한이 없습니다.")
+    return current_user
+
 @router.get("/health")
 def ai_health_check():
     """Health check endpoint for AI services."""
@@ -64,8 +78,8 @@ async def analyze_base64_image(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"이미지 디코딩 실패: {e}")
 
-    # Run AI analysis
-    detections_data = detection_service.detect_objects_and_scenes(
+    # Run AI analysis (YOLO is disabled, so this is the micro-batched CLIP scene search)
+    detections_data = await detection_service.detect_scenes_async(
         pil_image, req.latitude, req.longitude
     )
 
@@ -77,7 +91,7 @@ async def analyze_base64_image(
         ko_label, aliases = normalize_label(raw_label)
 
         # Generate description using RAG
-        desc = rag_service.summarize(ko_label, aliases) or det.get("description") or ko_label
+        desc = await _summarize(ko_label, aliases) or det.get("description") or ko_label
         
         # Generate audio using TTS
         audio = tts_service.generate_audio(desc)
@@ -113,8 +127,8 @@ async def analyze_uploaded_image(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"이미지 처리 실패: {e}")
 
-    # Run AI analysis
-    detections_data = detection_service.detect_objects_and_scenes(
+    # Run AI analysis (YOLO is disabled, so this is the micro-batched CLIP scene search)
+    detections_data = await detection_service.detect_scenes_async(
         pil_image, latitude, longitude
     )
 
@@ -126,7 +140,7 @@ async def analyze_uploaded_image(
         ko_label, aliases = normalize_label(raw_label)
 
         # Generate description using RAG
-        desc = rag_service.summarize(ko_label, aliases) or det.get("description") or ko_label
+        desc = await _summarize(ko_label, aliases) or det.get("description") or ko_label
         
         # Generate audio using TTS
         audio = tts_service.generate_audio(desc)
@@ -154,7 +168,7 @@ async def get_place_information(
     """Get detailed information about a specific place."""
     try:
         # Generate description using RAG
-        description = rag_service.summarize(place_name)
+        description = await _summarize(place_name)
         
         # Generate audio using TTS
         audio_url = tts_service.generate_audio(description) if description else None
@@ -166,3 +180,64 @@ async def get_place_information(
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"장소 정보 조회 실패: {e}")
+
+@router.post("/landmarks", response_model=Dict[str, Any])
+async def add_landmark_photos(
+    images: List[UploadFile] = File(...),
+    label: str = Form(...),
+    description: Optional[str] = Form(None),
+    latitude: Optional[float] = Form(None),
+    longitude: Optional[float] = Form(None),
+    current_user: User = Depends(_require_landmark_admin)
+):
+    """Add reference photos of a landmark to the live CLIP index without a rebuild."""
+    # With the remote backend this is a round trip to the inference server, so it runs off the event loop.
+    if not await asyncio.to_thread(lambda: detection_service.model_available):
+        raise HTTPException(status_code=503, detail="CLIP 모델을 사용할 수 없습니다.")
+
+    uploads = []
+    for upload in images:
+        data = await upload.read()
+        try:
+            Image.open(io.BytesIO(data)).verify()
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"이미지 처리 실패 ({upload.filename}): {e}")
+        uploads.append((upload.filename, data))
+
+    try:
+        ids = await asyncio.to_thread(detection_service.add_landmark_photos, uploads, label, description, latitude, longitude)
+    except InferenceError as e:
+        raise HTTPException(status_code=503, detail=f"랜드마크 추가 실패: {e}")
+    return {"label": label, "ids": ids}
+
+@router.delete("/landmarks", response_model=Dict[str, Any])
+async def retire_landmark_photos(
+    label: Optional[str] = Query(None),
+    ids: Optional[List[int]] = Query(None),
+    current_user: User = Depends(_require_landmark_admin)
+):
+    """Retire reference photos by label and/or id."""
+    if not label and not ids:
+        raise HTTPException(status_code=400, detail="label 또는 ids가 필요합니다.")
+    try:
+        retired = await asyncio.to_thread(detection_service.retire_landmark_photos, ids, [label] if label else None)
+    except InferenceError as e:
+        raise HTTPException(status_code=503, detail=f"랜드마크 제거 실패: {e}")
+    return {"retired": retired}
+
+@router.post("/landmarks/compact", response_model=Dict[str, Any])
+async def compact_landmark_index(current_user: User = Depends(_require_landmark_admin)):
+    """Drop retired photos from the CLIP index and renumber the remaining ones."""
+    try:
+        rows_before, rows_after = await asyncio.to_thread(detection_service.compact_landmarks)
+    except InferenceError as e:
+        raise HTTPException(status_code=503, detail=f"인덱스 압축 실패: {e}")
+    return {"rows_before": rows_before, "rows_after": rows_after}
+
+@router.post("/index/reload", response_model=Dict[str, Any])
+async def reload_clip_index(current_user: User = Depends(_require_landmark_admin)):
+    """Load the CLIP index files in the background and swap them in; other workers follow via their watchers."""
+    try:
+        return await asyncio.to_thread(detection_service.reload_index, True)
+    except InferenceError as e:
+        raise HTTPException(status_code=503, detail=f"인덱스 재로드 실패: {e}")
@@ -1,40 +1,59 @@
 from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, BackgroundTasks, Query, Body
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List
+import asyncio
 import json
+import logging
 
 from app.db.database import get_db
 from app.schemas.trip import (
-    TripCreate, TripResponse, TripFullResponse, TripChatResponse, 
+    TripCreate, TripFullResponse, TripChatResponse, 
     TripMemberCreate, TripItineraryItemCreate, TripItineraryItemUpdate, TripItineraryItemResponse,
     TripItineraryOrderUpdate, PackingListItemCreate, PackingListItemUpdate, PackingListItemResponse,
-    TripCreateRequest
+    TripCreateRequest, TripCreateResponse, JobResponse
 )
 from app.schemas.notification import NotificationResponse
 from app.crud import trip as crud_trip, chat as crud_chat
 from app.crud import user as crud_user
 from app.crud import notification as crud_notification
+from app.crud import job as crud_job
 from app.api.deps import get_current_user, get_user_from_token
-from app.db.models import User
+from app.db.models import User, TripItineraryItem
 from app.api.websockets import manager
+from app.core.config import settings
+from app.services.llm_client import LLMPriority, llm_priority
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-async def plan_generation_task(trip_id: int, member_count: int, companion_relation: Optional[str]):
-    """A background task to generate a trip itinerary and notify via WebSocket."""
-    print(f"Starting background itinerary generation for trip {trip_id}")
-    with next(get_db()) as db:
-        crud_trip.generate_and_save_trip_plan(db, trip_id, member_count, companion_relation)
-    await manager.broadcast(
-        trip_id,
-        json.dumps({"type": "plan_update", "payload": {"message": "Trip itinerary has been generated!"}})
-    )
-    print(f"Finished background itinerary generation and sent notification for trip {trip_id}")
+async def description_generation_task(trip_id: int):
+    """A background task that fills missing place descriptions for a trip and streams each one via WebSocket."""
+    loop = asyncio.get_running_loop()
 
-@router.post("", response_model=TripResponse, status_code=status.HTTP_201_CREATED)
-async def create_trip(
+    def on_description(db_item: TripItineraryItem):
+        message = json.dumps(
+            {"type": "item_description", "payload": {"id": db_item.id, "gpt_description": db_item.gpt_description}},
+            ensure_ascii=False
+        )
+        asyncio.run_coroutine_threadsafe(manager.broadcast(trip_id, message), loop)
+
+    def generate():
+        with next(get_db()) as db:
+            try:
+                return crud_trip.generate_missing_descriptions_for_trip(db, trip_id, on_description=on_description)
+            finally:
+                db.rollback()
+                crud_trip.release_description_generation(db, trip_id)
+
+    # Someone has the plan open, but no single reply is blocking them: default priority, fair per trip.
+    with llm_priority(LLMPriority.DEFAULT, key=f"trip:{trip_id}"):
+        filled = await asyncio.to_thread(generate)
+    logger.info(f"Filled {filled} place descriptions for trip {trip_id}")
+
+@router.post("", response_model=TripCreateResponse, status_code=status.HTTP_201_CREATED)
+def create_trip(
     request: TripCreateRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -43,8 +62,55 @@ async def create_trip(
         trip=request.trip_data, 
         creator_id=current_user.id
     )
-    background_tasks.add_task(plan_generation_task, new_trip.id, request.member_count, request.companion_relation)
-    return new_trip
+    # A plan cached for the same inputs becomes an instant draft; generation then only personalizes it.
+    draft_ready = crud_trip.apply_plan_template_draft(db, new_trip.id)
+    plan_job = None
+    if not draft_ready or settings.PLAN_TEMPLATE_PERSONALIZE:
+        # Generation runs in a job worker; this process only records the job.
+        plan_job = crud_job.enqueue_job(
+            db,
+            crud_job.JOB_PLAN_GENERATION,
+            {"member_count": request.member_count, "companion_relation": request.companion_relation},
+            trip_id=new_trip.id,
+            idempotency_key=f"{crud_job.JOB_PLAN_GENERATION}:trip:{new_trip.id}",
+        )
+
+    response = TripCreateResponse.model_validate(new_trip)
+    response.plan_draft_ready = draft_ready
+    response.plan_job_id = plan_job.id if plan_job else None
+    return response
+
+@router.get("/{trip_id}/jobs", response_model=List[JobResponse])
+def list_trip_jobs(
+    trip_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    db_trip = crud_trip.get_trip_by_id(db, trip_id=trip_id)
+    if not db_trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    is_member = any(member.user_id == current_user.id for member in db_trip.members)
+    if not is_member:
+        raise HTTPException(status_code=403, detail="Not authorized to view this trip")
+    return crud_job.get_jobs_for_trip(db, trip_id)
+
+@router.get("/{trip_id}/jobs/{job_id}", response_model=JobResponse)
+def get_trip_job(
+    trip_id: int,
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    db_trip = crud_trip.get_trip_by_id(db, trip_id=trip_id)
+    if not db_trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    is_member = any(member.user_id == current_user.id for member in db_trip.members)
+    if not is_member:
+        raise HTTPException(status_code=403, detail="Not authorized to view this trip")
+    job = crud_job.get_job(db, job_id)
+    if not job or job.trip_id != trip_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.post("/{trip_id}/invite", response_model=NotificationResponse)
 def invite_user_to_trip(
@@ -305,13 +371,38 @@ def generate_item_description(
         raise HTTPException(status_code=404, detail="Itinerary item not found in this trip")
 
     # Generate and save description
-    updated_item = crud_trip.generate_and_save_gpt_description(db=db, item_id=item_id)
+    with llm_priority(LLMPriority.INTERACTIVE, key=f"trip:{trip_id}"):
+        updated_item = crud_trip.generate_and_save_gpt_description(db=db, item_id=item_id)
     if not updated_item:
         raise HTTPException(status_code=500, detail="Failed to generate description")
 
     return updated_item
 
 
+@router.post("/{trip_id}/itinerary/generate-descriptions", status_code=status.HTTP_202_ACCEPTED)
+def generate_trip_descriptions(
+    trip_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Starts generating descriptions for every itinerary item that has none.
+    Each description is pushed to the trip WebSocket as an `item_description` message.
+    """
+    db_trip = crud_trip.get_trip_by_id(db, trip_id=trip_id)
+    if not db_trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    is_member = any(member.user_id == current_user.id for member in db_trip.members)
+    if not is_member:
+        raise HTTPException(status_code=403, detail="Not authorized to modify this trip's itinerary")
+
+    pending = crud_trip.count_items_missing_description(db, trip_id=trip_id)
+    # The claim lives in the trips row, so reopening the plan on any web worker does not start a duplicate run.
+    if pending and crud_trip.claim_description_generation(db, trip_id=trip_id):
+        background_tasks.add_task(description_generation_task, trip_id)
+    return {"pending": pending}
+
 @router.websocket("/{trip_id}/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -411,12 +502,15 @@ async def websocket_endpoint(
                 # 2. Process GPT response
                 try:
                     with next(get_db()) as db:
-                        gpt_response, new_messages, itinerary_updated = crud_trip.process_gpt_prompt_for_trip(
-                            db=db,
-                            trip_id=trip_id,
-                            user_prompt=user_prompt,
-                            current_user_id=user.id
-                        )
+                        # Run off the event loop: the call may queue for an LLM slot (ahead of background work).
+                        with llm_priority(LLMPriority.INTERACTIVE, key=f"trip:{trip_id}"):
+                            gpt_response, new_messages, itinerary_updated = await asyncio.to_thread(
+                                crud_trip.process_gpt_prompt_for_trip,
+                                db=db,
+                                trip_id=trip_id,
+                                user_prompt=user_prompt,
+                                current_user_id=user.id
+                            )
 
                         if gpt_response is None:
                             await websocket.send_text(json.dumps({"type": "system_message", "payload": {"message": "Error processing GPT prompt."}}))
@@ -444,7 +538,7 @@ async def websocket_endpoint(
                                 json.dumps({"type": "plan_update", "payload": {"message": "Trip itinerary has been updated by GPT."}})
                             )
                 except Exception as e:
-                    print(f"Error processing GPT prompt: {e}")
+                    logger.error(f"Error processing GPT prompt: {e}")
                     await websocket.send_text(json.dumps({"type": "system_message", "payload": {"message": "An error occurred while talking to GPT."}}))
 
     except WebSocketDisconnect:
@@ -452,5 +546,5 @@ async def websocket_endpoint(
         if user:
             await manager.broadcast(trip_id, json.dumps({"type": "system_message", "payload": {"message": f"{user.nickname} has left the chat."}}))
     except Exception as e:
-        print(f"WebSocket Error: {e}")
+        logger.error(f"WebSocket Error: {e}")
         manager.disconnect(websocket, trip_id)
\ No newline at end of file
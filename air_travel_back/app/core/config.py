@@ -24,6 +24,58 @@ class Settings:
     AZURE_OPENAI_API_KEY: str = os.getenv("AZURE_OPENAI_API_KEY", "")
     AZURE_OPENAI_ENDPOINT: str = os.getenv("ENDPOINT_URL", "https://team2-openai.openai.azure.com/").split("/openai/")[0]
     AZURE_OPENAI_DEPLOYMENT_NAME: str = os.getenv("DEPLOYMENT_NAME", "gpt-4.1")
+    # Smaller deployment for intent classification, chat Q&A and place descriptions (empty: use DEPLOYMENT_NAME)
+    AZURE_OPENAI_SMALL_DEPLOYMENT_NAME: str = os.getenv("SMALL_DEPLOYMENT_NAME", "")
+    AZURE_OPENAI_API_VERSION: str = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
+    # Shared client limits (app.services.llm_client): in-flight calls overall / per deployment, and 429 retry backoff
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", 16))
+    OPENAI_MAX_CONCURRENCY_PER_DEPLOYMENT: int = int(os.getenv("OPENAI_MAX_CONCURRENCY_PER_DEPLOYMENT", 8))
+    # Slots (globally and per deployment) that only interactive calls may use, so user-facing replies never queue behind bulk generation
+    OPENAI_INTERACTIVE_RESERVED_SLOTS: int = int(os.getenv("OPENAI_INTERACTIVE_RESERVED_SLOTS", 2))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", 4))
+    OPENAI_BACKOFF_BASE_SECONDS: float = float(os.getenv("OPENAI_BACKOFF_BASE_SECONDS", 0.5))
+    OPENAI_BACKOFF_MAX_SECONDS: float = float(os.getenv("OPENAI_BACKOFF_MAX_SECONDS", 20))
+    OPENAI_TIMEOUT_SECONDS: float = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 60))
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME: str = os.getenv("EMBEDDING_DEPLOYMENT_NAME", "")
+    # Semantic cache for informational chat answers (needs an embedding deployment)
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+    SEMANTIC_CACHE_TTL_HOURS: int = int(os.getenv("SEMANTIC_CACHE_TTL_HOURS", 168))
+    # Prompt size above which the current plan sent to chat is trimmed to fewer columns
+    OPENAI_PROMPT_TOKEN_BUDGET: int = int(os.getenv("OPENAI_PROMPT_TOKEN_BUDGET", 6000))
+
+    # Trip plan generation ("stream": one streamed completion, "parallel": outline + per-day completions,
+    # "auto": parallel for trips of TRIP_PLAN_PARALLEL_MIN_DAYS days or more)
+    TRIP_PLAN_GENERATION_MODE: str = os.getenv("TRIP_PLAN_GENERATION_MODE", "auto")
+    TRIP_PLAN_PARALLEL_MIN_DAYS: int = int(os.getenv("TRIP_PLAN_PARALLEL_MIN_DAYS", 3))
+    TRIP_PLAN_PARALLEL_MAX_WORKERS: int = int(os.getenv("TRIP_PLAN_PARALLEL_MAX_WORKERS", 8))
+    # Plan templates: reuse a plan generated for the same normalized trip inputs as an instant draft,
+    # then (optionally) personalize it for the new trip in the background
+    PLAN_TEMPLATE_CACHE_ENABLED: bool = os.getenv("PLAN_TEMPLATE_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    PLAN_TEMPLATE_PERSONALIZE: bool = os.getenv("PLAN_TEMPLATE_PERSONALIZE", "True").lower() in ("true", "1", "t")
+    PLAN_TEMPLATE_TTL_DAYS: int = int(os.getenv("PLAN_TEMPLATE_TTL_DAYS", 30))
+    # Packing lists come from a separate small-model call, cached per destination, start month,
+    # trip length bucket, transport and accommodation
+    PACKING_LIST_CACHE_ENABLED: bool = os.getenv("PACKING_LIST_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    PACKING_LIST_TTL_DAYS: int = int(os.getenv("PACKING_LIST_TTL_DAYS", 90))
+    # Places per batched description completion (trip-level description generation)
+    PLACE_DESCRIPTION_BATCH_SIZE: int = int(os.getenv("PLACE_DESCRIPTION_BATCH_SIZE", 8))
+    # A shared place whose geocoding failed is geocoded again when it is next saved after this long
+    GEOCODE_RETRY_MINUTES: int = int(os.getenv("GEOCODE_RETRY_MINUTES", 60))
+    # A trip description run that has not finished after this long is assumed dead; the next request starts another
+    DESCRIPTION_CLAIM_SECONDS: int = int(os.getenv("DESCRIPTION_CLAIM_SECONDS", 600))
+
+    # Background jobs ("inline": each web process also runs a job worker thread, so nothing else needs to be started;
+    # "queue": web processes only enqueue and `python -m app.worker` must be running to execute the jobs)
+    JOB_BACKEND: str = os.getenv("JOB_BACKEND", "inline")
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETRY_BACKOFF_SECONDS: float = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", 30))
+    # A running job whose worker has not reported progress for this long is assumed dead and requeued
+    JOB_STALE_SECONDS: int = int(os.getenv("JOB_STALE_SECONDS", 600))
+    # How often a worker refreshes the heartbeat of each job it is running, whether or not the job reports progress
+    JOB_HEARTBEAT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", 60))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", 5))
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", 4))
 
     # Azure DALL_E Settings
     AZURE_DALL_E_DEPLOYMENT_NAME: str = os.getenv("AZURE_DALL_E_DEPLOYMENT_NAME", "")
@@ -46,9 +98,38 @@ class Settings:
     # AI Models and Data Paths
     AI_MODELS_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "ai_data")
     FAISS_INDEX_PATH: str = os.path.join(AI_MODELS_DIR, "index.faiss")
-    META_DATA_PATH: str = os.path.join(AI_MODELS_DIR, "meta_baked.json")
+    # Landmark metadata: .bin is the memory-mapped format (app.ai_models.meta_store); .json is still readable
+    META_DATA_PATH: str = os.getenv("META_DATA_PATH", os.path.join(AI_MODELS_DIR, "meta_baked.bin"))
     YOLO_MODEL_PATH: str = os.path.join(AI_MODELS_DIR, "yolov8n.pt")
     YOLO_DEVICE: str = os.getenv("YOLO_DEVICE", "cpu")
+    # Query-time knobs for approximate CLIP indexes (see app.ai_models.ann_index); ignored by flat indexes
+    CLIP_FAISS_EF_SEARCH: int = int(os.getenv("CLIP_FAISS_EF_SEARCH", 64))
+    CLIP_FAISS_NPROBE: int = int(os.getenv("CLIP_FAISS_NPROBE", 16))
+    # Open the CLIP index memory-mapped (read-only) so workers on a host share its pages
+    CLIP_FAISS_MMAP: bool = os.getenv("CLIP_FAISS_MMAP", "true").lower() in ("true", "1", "t")
+    # CPU inference for the CLIP encoder (app.ai_models.clip_runtime): int8 dynamic quantization, TorchScript trace,
+    # intra-op threads (0 = torch default); check with python -m app.ai_models.clip_benchmark before enabling
+    CLIP_QUANTIZE: bool = os.getenv("CLIP_QUANTIZE", "false").lower() in ("true", "1", "t")
+    CLIP_JIT_TRACE: bool = os.getenv("CLIP_JIT_TRACE", "false").lower() in ("true", "1", "t")
+    CLIP_TORCH_THREADS: int = int(os.getenv("CLIP_TORCH_THREADS", 0))
+    # Micro-batching of concurrent CLIP searches: a batch runs when this many are waiting or after the wait
+    CLIP_BATCH_MAX_SIZE: int = int(os.getenv("CLIP_BATCH_MAX_SIZE", 16))
+    CLIP_BATCH_MAX_WAIT_MS: float = float(os.getenv("CLIP_BATCH_MAX_WAIT_MS", 5))
+    # Seconds between checks of the CLIP index files for hot reload (0 disables the watcher)
+    CLIP_INDEX_WATCH_SECONDS: float = float(os.getenv("CLIP_INDEX_WATCH_SECONDS", 10))
+    # Incremental landmark updates (app.ai_models.landmark_store): compact once this share of rows is retired
+    CLIP_INDEX_COMPACT_RATIO: float = float(os.getenv("CLIP_INDEX_COMPACT_RATIO", 0.2))
+    # Comma-separated emails allowed to add/retire landmark photos through the API (empty: CLI only)
+    LANDMARK_ADMIN_EMAILS: str = os.getenv("LANDMARK_ADMIN_EMAILS", "")
+    # Where CLIP inference runs: "local" loads the models in every web worker, "remote" sends requests to
+    # python -m app.inference_server at INFERENCE_ADDRESSES (comma-separated Unix socket paths or host:port)
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "local")
+    INFERENCE_ADDRESSES: str = os.getenv("INFERENCE_ADDRESSES", "/tmp/air_travel_inference.sock")
+    # Shared secret for the inference server connections; required with the remote backend
+    INFERENCE_AUTHKEY: str = os.getenv("INFERENCE_AUTHKEY", "")
+    INFERENCE_TIMEOUT_SECONDS: float = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", 30))
+    # Connections each web worker keeps open to the inference server
+    INFERENCE_POOL_SIZE: int = int(os.getenv("INFERENCE_POOL_SIZE", 8))
 
     # Azure AI Search Settings
     AZURE_SEARCH_ENDPOINT: str = os.getenv("AZURE_SEARCH_ENDPOINT", "")
@@ -57,6 +138,16 @@ class Settings:
     AZURE_SPEECH_KEY: str = os.getenv("SPEECH_API_KEY", "")
     AZURE_SPEECH_REGION: str = os.getenv("SPEECH_REGION", "")
 
+    # Local retrieval (app.services.retrieval): "local" injects snippets from the on-disk faiss index,
+    # "azure" attaches the Azure Search data source, "auto" uses local when an index has been built
+    RAG_BACKEND: str = os.getenv("RAG_BACKEND", "auto")
+    RETRIEVAL_DOCS_DIR: str = os.getenv("RETRIEVAL_DOCS_DIR", os.path.join(AI_MODELS_DIR, "docs"))
+    RETRIEVAL_INDEX_DIR: str = os.getenv("RETRIEVAL_INDEX_DIR", os.path.join(AI_MODELS_DIR, "retrieval"))
+    RETRIEVAL_EMBEDDER: str = os.getenv("RETRIEVAL_EMBEDDER", "hashing")
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", 4))
+    RETRIEVAL_MIN_SCORE: float = float(os.getenv("RETRIEVAL_MIN_SCORE", 0.2))
+    RETRIEVAL_MAX_CONTEXT_CHARS: int = int(os.getenv("RETRIEVAL_MAX_CONTEXT_CHARS", 2000))
+
     # Azure RAG Settings
     AZURE_SEARCH_INDEX: str = os.getenv("AZURE_SEARCH_INDEX", "")
     AZURE_SEMANTIC_CONFIG: str = os.getenv("AZURE_SEMANTIC_CONFIG", "")
@@ -66,17 +157,4 @@ class Settings:
     # Static files directory
     STATIC_DIR: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
 
-    # Azure OpenAI Client
-    AZURE_OPENAI_CLIENT = None
-
-    def __init__(self):
-        # Initialize Azure OpenAI client
-        if self.AZURE_OPENAI_API_KEY and self.AZURE_OPENAI_ENDPOINT:
-            from openai import AzureOpenAI
-            self.AZURE_OPENAI_CLIENT = AzureOpenAI(
-                api_key=self.AZURE_OPENAI_API_KEY,
-                azure_endpoint=self.AZURE_OPENAI_ENDPOINT,
-                api_version="2024-02-01",
-            )
-
 settings = Settings()
\ No newline at end of file
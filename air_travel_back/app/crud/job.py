@@ -0,0 +1,180 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+from typing import Optional, List, Iterable
+from datetime import timedelta
+from app.db.models import Job
+from app.core.config import settings
+from app.services.events import JOBS_CHANNEL, notify
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+JOB_PLAN_GENERATION = "plan_generation"
+
+class JobLostError(RuntimeError):
+    """The job was requeued (or finished) by someone else; this worker's attempt must not write its result."""
+
+def get_job(db: Session, job_id: int) -> Optional[Job]:
+    return db.query(Job).filter(Job.id == job_id).first()
+
+def get_job_by_idempotency_key(db: Session, idempotency_key: str) -> Optional[Job]:
+    return db.query(Job).filter(Job.idempotency_key == idempotency_key).first()
+
+def get_jobs_for_trip(db: Session, trip_id: int, limit: int = 20) -> List[Job]:
+    return db.query(Job).filter(Job.trip_id == trip_id).order_by(Job.id.desc()).limit(limit).all()
+
+def enqueue_job(db: Session, kind: str, payload: dict, trip_id: Optional[int] = None,
+                idempotency_key: Optional[str] = None, max_attempts: Optional[int] = None) -> Job:
+    """
+    Adds a job for the workers and commits it. With an idempotency key, enqueuing again (a retried
+    request, a double click) returns the job already scheduled for that key instead of a second one.
+    """
+    if idempotency_key:
+        existing = get_job_by_idempotency_key(db, idempotency_key)
+        if existing:
+            logger.info(f"Job with idempotency key {idempotency_key} already exists (job {existing.id}).")
+            return existing
+
+    job = Job(
+        kind=kind,
+        trip_id=trip_id,
+        payload=payload,
+        idempotency_key=idempotency_key,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    try:
+        with db.begin_nested():
+            db.add(job)
+    except IntegrityError:
+        job = get_job_by_idempotency_key(db, idempotency_key)
+    db.commit()
+    db.refresh(job)
+    try:
+        # Wakes idle workers now; they would otherwise find the job at their next poll.
+        notify(JOBS_CHANNEL, job.kind)
+    except Exception as e:
+        logger.warning(f"Could not notify workers about job {job.id}: {e}")
+    return job
+
+def claim_next_job(db: Session, worker_id: str, kinds: Optional[Iterable[str]] = None) -> Optional[Job]:
+    """
+    Atomically takes the oldest due job. FOR UPDATE SKIP LOCKED lets any number of workers poll
+    the same table without blocking on, or double-claiming, each other's rows.
+    """
+    query = db.query(Job).filter(Job.status == JOB_QUEUED, Job.run_after <= func.now())
+    if kinds:
+        query = query.filter(Job.kind.in_(list(kinds)))
+    job = query.order_by(Job.run_after, Job.id).with_for_update(skip_locked=True).first()
+    if not job:
+        db.rollback()
+        return None
+    job.status = JOB_RUNNING
+    job.attempts = (job.attempts or 0) + 1
+    job.locked_by = worker_id
+    job.locked_at = func.now()
+    job.error = None
+    db.commit()
+    db.refresh(job)
+    return job
+
+def _owned_job_query(db: Session, job_id: int, worker_id: str, attempt: int):
+    """
+    The job row, only while it is still running under this worker's claim. Once requeue_stale_jobs hands
+    the job to another worker, the attempt number no longer matches and the first worker's writes find nothing.
+    """
+    return db.query(Job).filter(Job.id == job_id, Job.status == JOB_RUNNING, Job.locked_by == worker_id, Job.attempts == attempt)
+
+def lock_owned_job(db: Session, job_id: int, worker_id: str, attempt: int) -> Job:
+    """
+    Locks the job row in the caller's transaction if this worker's attempt still owns it, or raises
+    JobLostError. Requeuing skips locked rows, so the claim cannot be taken away until the caller commits.
+    """
+    job = _owned_job_query(db, job_id, worker_id, attempt).populate_existing().with_for_update().first()
+    if not job:
+        raise JobLostError(f"Job {job_id} attempt {attempt} is no longer held by {worker_id}")
+    return job
+
+def heartbeat_job(db: Session, job_id: int, worker_id: str, attempt: int) -> bool:
+    """Tells requeue_stale_jobs the worker running this job is still alive. Returns False if the job was lost."""
+    updated = _owned_job_query(db, job_id, worker_id, attempt).update(
+        {Job.locked_at: func.now()}, synchronize_session=False
+    )
+    db.commit()
+    return updated > 0
+
+def update_job_progress(db: Session, job_id: int, worker_id: str, attempt: int, progress: dict) -> bool:
+    """Records progress and doubles as the worker's heartbeat (see requeue_stale_jobs)."""
+    updated = _owned_job_query(db, job_id, worker_id, attempt).update(
+        {Job.progress: progress, Job.locked_at: func.now()}, synchronize_session=False
+    )
+    db.commit()
+    return updated > 0
+
+def complete_job(db: Session, job_id: int, worker_id: str, attempt: int) -> Job:
+    """Marks this worker's attempt as succeeded; raises JobLostError if the job was requeued meanwhile."""
+    try:
+        job = lock_owned_job(db, job_id, worker_id, attempt)
+    except JobLostError:
+        db.rollback()
+        raise
+    job.status = JOB_SUCCEEDED
+    job.locked_by = None
+    job.finished_at = func.now()
+    db.commit()
+    db.refresh(job)
+    return job
+
+def fail_job(db: Session, job_id: int, worker_id: str, attempt: int, error: str) -> Job:
+    """
+    Marks this worker's attempt as failed, requeuing the job with exponential backoff while it has attempts
+    left (then job.status is queued again). Raises JobLostError if the job was requeued meanwhile.
+    """
+    try:
+        job = lock_owned_job(db, job_id, worker_id, attempt)
+    except JobLostError:
+        db.rollback()
+        raise
+    job.error = error[:2000]
+    job.locked_by = None
+    retry = job.attempts < job.max_attempts
+    if retry:
+        delay = settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** (job.attempts - 1))
+        job.status = JOB_QUEUED
+        job.run_after = func.now() + timedelta(seconds=delay)
+    else:
+        job.status = JOB_FAILED
+        job.finished_at = func.now()
+    db.commit()
+    db.refresh(job)
+    return job
+
+def requeue_stale_jobs(db: Session, stale_seconds: Optional[int] = None) -> int:
+    """
+    Returns jobs whose worker died mid-run (no heartbeat for JOB_STALE_SECONDS) to the queue,
+    or fails them if they have used up their attempts.
+    """
+    cutoff = func.now() - timedelta(seconds=stale_seconds or settings.JOB_STALE_SECONDS)
+    stale = (
+        db.query(Job)
+        .filter(Job.status == JOB_RUNNING, Job.locked_at < cutoff)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for job in stale:
+        logger.warning(f"Job {job.id} ({job.kind}) lost its worker {job.locked_by}; requeuing.")
+        job.locked_by = None
+        job.error = "worker stopped responding"
+        if job.attempts < job.max_attempts:
+            job.status = JOB_QUEUED
+            job.run_after = func.now()
+        else:
+            job.status = JOB_FAILED
+            job.finished_at = func.now()
+    db.commit()
+    return len(stale)
@@ -0,0 +1,106 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from typing import Callable, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from app.db.models import PackingListTemplate
+from app.services.openai import generate_packing_list_with_gpt, trip_day_count
+from app.core.config import settings
+import contextvars
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Trip lengths that pack alike share a cache entry.
+LENGTH_BUCKETS = ((3, "1-3"), (7, "4-7"), (14, "8-14"))
+
+# Cache misses are generated here while the itinerary completion runs on the caller's thread.
+_packing_list_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="packing-list")
+
+def _normalize(value) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+def _length_bucket(days: int) -> str:
+    for limit, label in LENGTH_BUCKETS:
+        if days <= limit:
+            return label
+    return "15+"
+
+def packing_profile(trip_details: dict) -> dict:
+    """
+    The trip inputs a packing list depends on. The start month stands in for season and climate
+    (together with the destination, it also covers the southern hemisphere); party details are left out.
+    """
+    try:
+        month = date.fromisoformat(str(trip_details.get("start_date"))).month
+    except ValueError:
+        month = None
+    return {
+        "destination_country": _normalize(trip_details.get("destination_country")),
+        "destination_city": _normalize(trip_details.get("destination_city")),
+        "month": month,
+        "length": _length_bucket(trip_day_count(trip_details)),
+        "transport_method": _normalize(trip_details.get("transport_method")),
+        "accommodation": _normalize(trip_details.get("accommodation")),
+    }
+
+def make_packing_cache_key(profile: dict) -> str:
+    return hashlib.sha256(json.dumps(profile, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def get_packing_template(db: Session, profile: dict) -> Optional[PackingListTemplate]:
+    """Returns the cached packing list for the profile unless it is older than PACKING_LIST_TTL_DAYS."""
+    template = db.query(PackingListTemplate).filter(PackingListTemplate.cache_key == make_packing_cache_key(profile)).first()
+    if not template:
+        return None
+    max_age = timedelta(days=settings.PACKING_LIST_TTL_DAYS)
+    if template.created_at and datetime.now(timezone.utc) - template.created_at > max_age:
+        logger.info(f"Packing list template {template.id} expired.")
+        return None
+    return template
+
+def save_packing_template(db: Session, profile: dict, items: List[str]):
+    """Stores (or refreshes an expired) packing list for the profile. Flushed, not committed."""
+    if not items:
+        return
+    cache_key = make_packing_cache_key(profile)
+    template = db.query(PackingListTemplate).filter(PackingListTemplate.cache_key == cache_key).first()
+    if template:
+        template.items = items
+        template.created_at = datetime.now(timezone.utc)
+        return
+    try:
+        with db.begin_nested():
+            db.add(PackingListTemplate(cache_key=cache_key, params=profile, items=items))
+    except IntegrityError:
+        # Another trip with the same profile stored its list first; either one is fine.
+        pass
+
+def start_packing_list(db: Session, trip_details: dict) -> Callable[[], List[str]]:
+    """
+    Starts resolving the trip's packing list and returns a function that waits for it.
+    A cached profile resolves immediately; otherwise the list is generated in the background,
+    so callers can run the itinerary completion in the meantime. Only the returned function
+    touches `db`, so call it from the session's own thread.
+    """
+    profile = packing_profile(trip_details)
+    if settings.PACKING_LIST_CACHE_ENABLED:
+        template = get_packing_template(db, profile)
+        if template:
+            template.hit_count = (template.hit_count or 0) + 1
+            template.last_used_at = datetime.now(timezone.utc)
+            items = list(template.items or [])
+            logger.info(f"Packing list cache hit (template {template.id}, {len(items)} items)")
+            return lambda: items
+
+    # The copied context carries the caller's llm_priority into the executor thread.
+    future = _packing_list_executor.submit(contextvars.copy_context().run, generate_packing_list_with_gpt, profile)
+
+    def result() -> List[str]:
+        items = future.result()
+        if settings.PACKING_LIST_CACHE_ENABLED:
+            save_packing_template(db, profile, items)
+        return items
+
+    return result
@@ -0,0 +1,127 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+import requests
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from app.db.models import Place, PlaceDescription
+from app.services.openai import get_gpt_place_description
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DESCRIPTION_LANGUAGE = "ko"
+
+def geocode_address(address: str) -> Optional[dict]:
+    """Helper function to geocode an address using Google Geocoding API."""
+    if not address:
+        logger.info("No address provided, skipping geocoding.")
+        return None
+    if not settings.GOOGLE_MAPS_API_KEY:
+        logger.error("GOOGLE_MAPS_API_KEY is not set.")
+        return None
+
+    try:
+        url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={settings.GOOGLE_MAPS_API_KEY}"
+        logger.info(f"Geocoding URL: {url}")
+        response = requests.get(url, timeout=10) # Added timeout
+        response.raise_for_status()
+        data = response.json()
+        logger.info(f"Geocoding response for '{address}': {data.get('status')}")
+        if data.get('status') == 'OK' and data.get('results'):
+            result = data['results'][0]
+            location = result['geometry']['location']
+            coords = {"latitude": location['lat'], "longitude": location['lng'], "place_id": result.get('place_id')}
+            logger.info(f"Successfully geocoded '{address}' to {coords}")
+            return coords
+        else:
+            logger.warning(f"Geocoding failed for '{address}'. Status: {data.get('status')}, Error: {data.get('error_message')}")
+            return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Geocoding request failed for '{address}': {e}")
+    except (KeyError, IndexError) as e:
+        logger.error(f"Failed to parse geocoding response for '{address}': {e}")
+    return None
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").split()).casefold()
+
+def make_place_key(name: str, address: Optional[str]) -> str:
+    return f"{_normalize(name)}|{_normalize(address)}"[:600]
+
+def get_place_by_key(db: Session, name: str, address: Optional[str]) -> Optional[Place]:
+    return db.query(Place).filter(Place.place_key == make_place_key(name, address)).first()
+
+def _geocode_place(place: Place):
+    """Fills in the place's coordinates, or schedules another attempt if the lookup fails."""
+    coords = geocode_address(place.address)
+    if coords:
+        place.latitude = coords['latitude']
+        place.longitude = coords['longitude']
+        place.google_place_id = coords.get('place_id')
+        place.geocode_retry_at = None
+    else:
+        place.geocode_retry_at = datetime.now(timezone.utc) + timedelta(minutes=settings.GEOCODE_RETRY_MINUTES)
+
+def _geocode_due(place: Place) -> bool:
+    return (place.latitude is None and bool(place.address)
+            and (place.geocode_retry_at is None or place.geocode_retry_at <= datetime.now(timezone.utc)))
+
+def get_or_create_place(db: Session, name: str, address: Optional[str]) -> Place:
+    """
+    Returns the shared Place for a name/address pair, geocoding it the first time it is seen.
+    A failed lookup (timeout, quota, missing key) is not final: the place is geocoded again the next
+    time it is saved after GEOCODE_RETRY_MINUTES. Concurrent creators of the same place race on the
+    unique place_key; the loser reuses the winner's row.
+    """
+    place = get_place_by_key(db, name, address)
+    if place:
+        if _geocode_due(place):
+            logger.info(f"Retrying geocoding for place {place.id}: {place.name}")
+            _geocode_place(place)
+        return place
+
+    place = Place(place_key=make_place_key(name, address), name=name, address=address)
+    _geocode_place(place)
+    try:
+        with db.begin_nested():
+            db.add(place)
+    except IntegrityError:
+        place = get_place_by_key(db, name, address)
+    return place
+
+def get_cached_place_description(db: Session, place: Place, language: str = DEFAULT_DESCRIPTION_LANGUAGE) -> Optional[str]:
+    """
+    Looks up a stored description for the place, or for any other spelling of it
+    that Google geocoded to the same place_id.
+    """
+    query = db.query(PlaceDescription.description).join(Place).filter(PlaceDescription.language == language)
+    if place.google_place_id:
+        query = query.filter((Place.id == place.id) | (Place.google_place_id == place.google_place_id))
+    else:
+        query = query.filter(Place.id == place.id)
+    row = query.order_by(PlaceDescription.id).first()
+    return row[0] if row else None
+
+def get_or_generate_place_description(db: Session, place: Place, language: str = DEFAULT_DESCRIPTION_LANGUAGE) -> Optional[str]:
+    """Returns the place's description, generating and storing it with GPT only on the first request."""
+    description = get_cached_place_description(db, place, language)
+    if description:
+        logger.info(f"Place description cache hit for place {place.id} ({language}).")
+        return description
+
+    logger.info(f"Generating GPT description for place: {place.name} ({language})")
+    description = get_gpt_place_description(place_name=place.name, language=language)
+    if not description:
+        return None
+    return save_place_description(db, place, description, language)
+
+def save_place_description(db: Session, place: Place, description: str, language: str = DEFAULT_DESCRIPTION_LANGUAGE) -> str:
+    """Stores a generated description and returns the text every trip should see for the place."""
+    try:
+        with db.begin_nested():
+            db.add(PlaceDescription(place_id=place.id, language=language, description=description))
+    except IntegrityError:
+        # Another request stored it first; serve the stored copy so every trip sees the same text.
+        description = get_cached_place_description(db, place, language) or description
+    return description
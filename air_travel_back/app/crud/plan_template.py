@@ -0,0 +1,69 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from typing import Optional, List
+from datetime import datetime, timedelta, timezone
+from app.db.models import PlanTemplate
+from app.services.openai import trip_day_count
+from app.core.config import settings
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_ITEM_FIELDS = ("day", "order_in_day", "place_name", "description", "start_time", "end_time", "address")
+
+def _normalize(value) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+def plan_template_params(trip_details: dict) -> dict:
+    """
+    The trip inputs a plan skeleton depends on, normalized so equivalent trips share a key.
+    Dates, title and party details are left out; they only matter for personalization.
+    """
+    return {
+        "destination_country": _normalize(trip_details.get("destination_country")),
+        "destination_city": _normalize(trip_details.get("destination_city")),
+        "days": trip_day_count(trip_details),
+        "interests": sorted({_normalize(interest) for interest in trip_details.get("interests") or [] if _normalize(interest)}),
+        "transport_method": _normalize(trip_details.get("transport_method")),
+        "accommodation": _normalize(trip_details.get("accommodation")),
+        "trend": bool(trip_details.get("trend")),
+    }
+
+def make_plan_cache_key(params: dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def get_plan_template(db: Session, cache_key: str) -> Optional[PlanTemplate]:
+    """Returns a cached plan for the key unless it is older than PLAN_TEMPLATE_TTL_DAYS."""
+    template = db.query(PlanTemplate).filter(PlanTemplate.cache_key == cache_key).first()
+    if not template:
+        return None
+    max_age = timedelta(days=settings.PLAN_TEMPLATE_TTL_DAYS)
+    if template.created_at and datetime.now(timezone.utc) - template.created_at > max_age:
+        logger.info(f"Plan template {template.id} expired.")
+        return None
+    return template
+
+def mark_plan_template_used(db: Session, template: PlanTemplate):
+    template.hit_count = (template.hit_count or 0) + 1
+    template.last_used_at = datetime.now(timezone.utc)
+
+def save_plan_template(db: Session, params: dict, itinerary: List[dict], packing_list: Optional[List[str]]):
+    """Stores (or refreshes an expired) plan skeleton for these params. Flushed, not committed."""
+    if not itinerary:
+        return
+    cache_key = make_plan_cache_key(params)
+    items = [{field: item.get(field) for field in TEMPLATE_ITEM_FIELDS} for item in itinerary]
+    template = db.query(PlanTemplate).filter(PlanTemplate.cache_key == cache_key).first()
+    if template:
+        template.itinerary = items
+        template.packing_list = packing_list or []
+        template.created_at = datetime.now(timezone.utc)
+        return
+    try:
+        with db.begin_nested():
+            db.add(PlanTemplate(cache_key=cache_key, params=params, itinerary=items, packing_list=packing_list or []))
+    except IntegrityError:
+        # Another trip with the same inputs stored its plan first; either skeleton is fine.
+        pass
@@ -1,13 +1,19 @@
+from sqlalchemy import insert, or_
 from sqlalchemy.orm import Session, joinedload
-import requests
-from typing import Optional, List
+from sqlalchemy.sql import func
+from typing import Optional, List, Callable
 from app.db.models import Trip, TripMember, TripInterest, User, TripChat, TripItineraryItem, PackingListItem
 from app.schemas.trip import TripCreate, TripItineraryItemCreate, TripItineraryItemUpdate, TripItineraryOrderUpdate, PackingListItemCreate, PackingListItemUpdate
-from app.services.openai import generate_trip_plan_with_gpt, get_gpt_chat_response, get_gpt_place_description
+from app.services.openai import stream_trip_plan_with_gpt, generate_trip_plan_parallel, trip_day_count, get_gpt_chat_response, classify_chat_intent, generate_place_descriptions_batch
+from app.services.semantic_cache import answer_cache
+from app.services.itinerary_ops import apply_itinerary_operations, ItineraryOperationError
 from app.crud.user import get_user_by_email
 from app.crud.chat import create_chat_message
+from app.crud.plan_template import plan_template_params, make_plan_cache_key, get_plan_template, mark_plan_template_used, save_plan_template
+from app.crud.packing_template import packing_profile, get_packing_template, start_packing_list
+from app.crud.place import get_or_create_place, get_cached_place_description, get_or_generate_place_description, save_place_description
 from app.core.config import settings
-from datetime import datetime, timezone, time
+from datetime import datetime, timezone, time, timedelta
 import logging
 import json # Import json
 
@@ -15,35 +21,120 @@ import json # Import json
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def _geocode_address(address: str) -> Optional[dict]:
-    """Helper function to geocode an address using Google Geocoding API."""
-    if not address:
-        logger.info("No address provided, skipping geocoding.")
-        return None
-    if not settings.GOOGLE_MAPS_API_KEY:
-        logger.error("GOOGLE_MAPS_API_KEY is not set.")
-        return None
-    
-    try:
-        url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={settings.GOOGLE_MAPS_API_KEY}"
-        logger.info(f"Geocoding URL: {url}")
-        response = requests.get(url, timeout=10) # Added timeout
-        response.raise_for_status() 
-        data = response.json()
-        logger.info(f"Geocoding response for '{address}': {data.get('status')}")
-        if data.get('status') == 'OK' and data.get('results'):
-            location = data['results'][0]['geometry']['location']
-            coords = {"latitude": location['lat'], "longitude": location['lng']}
-            logger.info(f"Successfully geocoded '{address}' to {coords}")
-            return coords
-        else:
-            logger.warning(f"Geocoding failed for '{address}'. Status: {data.get('status')}, Error: {data.get('error_message')}")
-            return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Geocoding request failed for '{address}': {e}")
-    except (KeyError, IndexError) as e:
-        logger.error(f"Failed to parse geocoding response for '{address}': {e}")
-    return None
+def _parse_time(value: Optional[str]) -> Optional[time]:
+    return datetime.strptime(value, '%H:%M').time() if value else None
+
+def _place_fields(db: Session, place_name: str, address: Optional[str]) -> dict:
+    """
+    Resolves the shared Place for an item and returns the item columns derived from it.
+    Coordinates and an existing description come from the Place, so known places skip geocoding and GPT.
+    """
+    place = get_or_create_place(db, place_name, address)
+    return {
+        "place_id": place.id,
+        "latitude": place.latitude,
+        "longitude": place.longitude,
+        "gpt_description": get_cached_place_description(db, place),
+    }
+
+def _build_itinerary_item(db: Session, trip_id: int, item_data: dict) -> TripItineraryItem:
+    """Builds a TripItineraryItem from a GPT itinerary entry, linked to its shared Place."""
+    return TripItineraryItem(
+        trip_id=trip_id,
+        day=item_data['day'],
+        order_in_day=item_data['order_in_day'],
+        place_name=item_data['place_name'],
+        description=item_data.get('description'),
+        start_time=_parse_time(item_data.get('start_time')),
+        end_time=_parse_time(item_data.get('end_time')),
+        address=item_data.get('address'),
+        **_place_fields(db, item_data['place_name'], item_data.get('address'))
+    )
+
+def _normalize_key(value: Optional[str]) -> str:
+    return " ".join((value or "").split()).casefold()
+
+def _apply_itinerary_diff(db: Session, trip_id: int, existing_items: List[TripItineraryItem], new_itinerary_data: List[dict]) -> dict:
+    """
+    Applies a GPT itinerary to the existing rows with as few writes as possible.
+
+    New entries are matched to existing rows from the most to the least specific key
+    (item id, place+address+slot, place+address, place name, slot). Matched rows are only updated
+    when a field actually changed, and only rows whose place or address changed are re-linked to a Place
+    (which geocodes only places never seen before). gpt_description follows the linked Place.
+    Unmatched entries are inserted and unmatched rows are deleted.
+    """
+    def place_key(name, address):
+        return (_normalize_key(name), _normalize_key(address))
+
+    matchers = [
+        lambda d: d.get('id'),
+        lambda d: (place_key(d['place_name'], d.get('address')), d['day'], d['order_in_day']),
+        lambda d: place_key(d['place_name'], d.get('address')),
+        lambda d: _normalize_key(d['place_name']),
+        lambda d: (d['day'], d['order_in_day']),
+    ]
+
+    def row_as_data(row: TripItineraryItem) -> dict:
+        return {"id": row.id, "place_name": row.place_name, "address": row.address, "day": row.day, "order_in_day": row.order_in_day}
+
+    unmatched_rows = list(existing_items)
+    unmatched_new = list(new_itinerary_data)
+    pairs = []
+    for matcher in matchers:
+        rows_by_key = {}
+        for row in unmatched_rows:
+            rows_by_key.setdefault(matcher(row_as_data(row)), []).append(row)
+        still_unmatched = []
+        for item_data in unmatched_new:
+            key = matcher(item_data)
+            candidates = rows_by_key.get(key) if key is not None else None
+            if candidates:
+                row = candidates.pop(0)
+                unmatched_rows.remove(row)
+                pairs.append((row, item_data))
+            else:
+                still_unmatched.append(item_data)
+        unmatched_new = still_unmatched
+
+    stats = {"unchanged": 0, "updated": 0, "inserted": 0, "deleted": 0, "places_resolved": 0}
+
+    for row, item_data in pairs:
+        changes = {
+            "day": item_data['day'],
+            "order_in_day": item_data['order_in_day'],
+            "place_name": item_data['place_name'],
+            "description": item_data.get('description'),
+            "start_time": _parse_time(item_data.get('start_time')),
+            "end_time": _parse_time(item_data.get('end_time')),
+            "address": item_data.get('address'),
+        }
+        changes = {key: value for key, value in changes.items() if getattr(row, key) != value}
+        if not changes:
+            stats["unchanged"] += 1
+            continue
+
+        if 'address' in changes or 'place_name' in changes:
+            place_fields = _place_fields(db, item_data['place_name'], item_data.get('address'))
+            if place_fields['place_id'] != row.place_id:
+                changes.update(place_fields)
+                stats["places_resolved"] += 1
+
+        for key, value in changes.items():
+            setattr(row, key, value)
+        stats["updated"] += 1
+
+    for row in unmatched_rows:
+        db.delete(row)
+        stats["deleted"] += 1
+
+    for item_data in unmatched_new:
+        db.add(_build_itinerary_item(db, trip_id, item_data))
+        stats["inserted"] += 1
+
+    db.flush()
+    logger.info(f"Itinerary diff for trip {trip_id}: {stats}")
+    return stats
 
 def create_trip(db: Session, trip: TripCreate, creator_id: int):
     db_trip = Trip(
@@ -104,14 +195,16 @@ def add_trip_member(db: Session, trip_id: int, user_id: int):
     db.refresh(db_member)
     return db_member
 
-def generate_and_save_trip_plan(db: Session, trip_id: int, member_count: int, companion_relation: Optional[str]):
-    logger.info(f"Starting plan generation for trip_id: {trip_id}")
-    db_trip = db.query(Trip).options(joinedload(Trip.interests)).filter(Trip.id == trip_id).first()
-    if not db_trip:
-        logger.error(f"Trip with ID {trip_id} not found for plan generation.")
-        return
+def _use_parallel_plan_generation(trip_details: dict) -> bool:
+    mode = settings.TRIP_PLAN_GENERATION_MODE
+    if mode == "parallel":
+        return True
+    if mode == "auto":
+        return trip_day_count(trip_details) >= settings.TRIP_PLAN_PARALLEL_MIN_DAYS
+    return False
 
-    trip_data_for_gpt = {
+def _trip_details_for_plan(db_trip: Trip, member_count: Optional[int] = None, companion_relation: Optional[str] = None) -> dict:
+    return {
         "title": db_trip.title,
         "start_date": str(db_trip.start_date),
         "end_date": str(db_trip.end_date),
@@ -125,51 +218,160 @@ def generate_and_save_trip_plan(db: Session, trip_id: int, member_count: int, co
         "companion_relation": companion_relation
     }
 
+def _add_packing_list(db: Session, trip_id: int, item_names: List[str], existing_names: Optional[set] = None):
+    """Inserts the items not already on the list (ignoring case and spacing) in a single INSERT statement."""
+    seen = set(existing_names or ())
+    rows = []
+    for item_name in item_names:
+        item_name = " ".join(str(item_name or "").split())[:255]
+        if not item_name or _normalize_key(item_name) in seen:
+            continue
+        seen.add(_normalize_key(item_name))
+        rows.append({"trip_id": trip_id, "item_name": item_name, "is_packed": False, "quantity": 1})
+    if rows:
+        db.execute(insert(PackingListItem).values(rows))
+        logger.info(f"Saved {len(rows)} packing list items for trip {trip_id}")
+
+def apply_plan_template_draft(db: Session, trip_id: int) -> bool:
+    """
+    Copies a cached plan for trips with the same normalized inputs into the new trip as an instant draft.
+    Returns False (and writes nothing) when there is no usable template.
+    """
+    if not settings.PLAN_TEMPLATE_CACHE_ENABLED:
+        return False
+    db_trip = db.query(Trip).options(joinedload(Trip.interests)).filter(Trip.id == trip_id).first()
+    if not db_trip:
+        return False
+
+    trip_details = _trip_details_for_plan(db_trip)
+    template = get_plan_template(db, make_plan_cache_key(plan_template_params(trip_details)))
+    if not template:
+        return False
+
     try:
-        logger.info(f"Calling GPT for trip {trip_id}...")
-        gpt_response = generate_trip_plan_with_gpt(trip_data_for_gpt)
+        for item_data in template.itinerary:
+            db.add(_build_itinerary_item(db, trip_id, item_data))
+        # The plan template's list was made for another trip's month; prefer one cached for this trip's profile.
+        packing_template = get_packing_template(db, packing_profile(trip_details)) if settings.PACKING_LIST_CACHE_ENABLED else None
+        _add_packing_list(db, trip_id, (packing_template.items if packing_template else template.packing_list) or [])
+        mark_plan_template_used(db, template)
+        db.commit()
+        logger.info(f"Applied plan template {template.id} as draft for trip {trip_id} ({len(template.itinerary)} items)")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to apply plan template for trip {trip_id}: {e}", exc_info=True)
+        db.rollback()
+        return False
+
+def _generate_plan_with_gpt(trip_details: dict, on_item: Optional[Callable[[dict], None]] = None) -> dict:
+    if _use_parallel_plan_generation(trip_details):
+        logger.info("Generating GPT plan with per-day parallel completions...")
+        gpt_response = generate_trip_plan_parallel(trip_details, on_item=on_item)
+    else:
+        logger.info("Streaming GPT plan...")
+        gpt_response = stream_trip_plan_with_gpt(trip_details, on_item=on_item)
+    if gpt_response.get("error"):
+        raise RuntimeError(gpt_response["error"])
+    return gpt_response
+
+def _mark_plan_edited(db: Session, trip_id: int):
+    """
+    Flags the plan as edited by its members, in the caller's transaction. The UPDATE takes the trip row
+    lock that draft personalization holds while rewriting items, so the two never interleave.
+    """
+    db.query(Trip).filter(Trip.id == trip_id).update({Trip.plan_edited: True}, synchronize_session=False)
+
+def _personalize_draft_plan(db: Session, db_trip: Trip, trip_details: dict, draft_items: List[TripItineraryItem], packing_list: Callable[[], List[str]]):
+    """Regenerates the plan for this trip's party and applies it onto the cached draft as a diff."""
+    trip_id = db_trip.id
+    if db_trip.plan_edited:
+        logger.info(f"Draft plan for trip {trip_id} was already edited; skipping personalization.")
+        return
+
+    gpt_response = _generate_plan_with_gpt(trip_details)
+
+    # Re-check under the trip row lock: an edit made while the plan was generating must win.
+    db_trip = db.query(Trip).filter(Trip.id == trip_id).populate_existing().with_for_update().one()
+    if db_trip.plan_edited:
+        logger.info(f"Draft plan for trip {trip_id} was edited during personalization; keeping the edits.")
+        db.rollback()
+        return
+    draft_items = db.query(TripItineraryItem).filter(TripItineraryItem.trip_id == trip_id).populate_existing().all()
+    itinerary_items = gpt_response.get("itinerary", [])
+    if itinerary_items:
+        _apply_itinerary_diff(db, trip_id, draft_items, itinerary_items)
+    existing_names = {_normalize_key(item.item_name) for item in db_trip.packing_list_items}
+    _add_packing_list(db, trip_id, packing_list(), existing_names)
+    db.commit()
+    logger.info(f"Personalized draft plan for trip {trip_id}")
+
+def generate_and_save_trip_plan(db: Session, trip_id: int, member_count: int, companion_relation: Optional[str], on_item: Optional[Callable[[TripItineraryItem], None]] = None):
+    """
+    Generates the initial plan with a streamed completion (or per-day parallel completions for long trips).
+    Each itinerary item is flushed and passed to `on_item` as soon as it is available; everything is
+    committed at the end, or rolled back and re-raised on failure so the job can be retried (the ids
+    passed to `on_item` are then gone, which is why plan_item events carry the job attempt). A freshly
+    generated plan is stored as the template for later trips with the same inputs. If the trip already
+    holds a template draft, the plan is personalized onto it instead.
+    """
+    logger.info(f"Starting plan generation for trip_id: {trip_id}")
+    db_trip = db.query(Trip).options(joinedload(Trip.interests)).filter(Trip.id == trip_id).first()
+    if not db_trip:
+        logger.error(f"Trip with ID {trip_id} not found for plan generation.")
+        return
+
+    trip_data_for_gpt = _trip_details_for_plan(db_trip, member_count, companion_relation)
+
+    # The packing list is a separate small completion that runs while the itinerary is generated.
+    packing_list = start_packing_list(db, trip_data_for_gpt)
+
+    draft_items = db.query(TripItineraryItem).filter(TripItineraryItem.trip_id == trip_id).all()
+    if draft_items:
+        try:
+            _personalize_draft_plan(db, db_trip, trip_data_for_gpt, draft_items, packing_list)
+        except Exception as e:
+            logger.error(f"An error occurred while personalizing the plan for trip {trip_id}: {e}", exc_info=True)
+            db.rollback()
+            raise
+        return
+
+    persisted_keys = set()
+
+    def persist_item(item_data: dict):
+        # Flush (not commit) so the item gets an id for the client while the whole plan stays one transaction.
+        db_item = _build_itinerary_item(db, trip_id, item_data)
+        db.add(db_item)
+        db.flush()
+        persisted_keys.add((db_item.day, db_item.order_in_day))
+        if on_item:
+            on_item(db_item)
+
+    try:
+        gpt_response = _generate_plan_with_gpt(trip_data_for_gpt, on_item=persist_item)
         logger.info(f"Received GPT response for trip {trip_id}")
 
         itinerary_items = gpt_response.get("itinerary", [])
         if not itinerary_items:
             logger.warning(f"GPT returned no itinerary items for trip {trip_id}")
 
-        # Handle packing list
-        packing_list_items = gpt_response.get("packing_list", [])
-        if packing_list_items:
-            for item_name in packing_list_items:
-                db_packing_item = PackingListItem(
-                    trip_id=trip_id,
-                    item_name=item_name,
-                    is_packed=False,
-                    quantity=1  # Default quantity
-                )
-                db.add(db_packing_item)
-            logger.info(f"Saved {len(packing_list_items)} packing list items for trip {trip_id}")
-
+        # Items the incremental parser could not pick up are persisted from the final parse.
         for item_data in itinerary_items:
-            coords = _geocode_address(item_data.get('address'))
-            
-            db_item = TripItineraryItem(
-                trip_id=trip_id,
-                day=item_data['day'],
-                order_in_day=item_data['order_in_day'],
-                place_name=item_data['place_name'],
-                description=item_data.get('description'),
-                start_time=datetime.strptime(item_data['start_time'], '%H:%M').time() if item_data.get('start_time') else None,
-                end_time=datetime.strptime(item_data['end_time'], '%H:%M').time() if item_data.get('end_time') else None,
-                address=item_data.get('address'),
-                latitude=coords['latitude'] if coords else None,
-                longitude=coords['longitude'] if coords else None
-            )
-            db.add(db_item)
-        
-        logger.info(f"Adding {len(itinerary_items)} itinerary items and packing list to session for trip {trip_id}")
+            if (item_data.get('day'), item_data.get('order_in_day')) not in persisted_keys:
+                persist_item(item_data)
+
+        packing_list_items = packing_list()
+        _add_packing_list(db, trip_id, packing_list_items)
+
+        if settings.PLAN_TEMPLATE_CACHE_ENABLED:
+            save_plan_template(db, plan_template_params(trip_data_for_gpt), itinerary_items, packing_list_items)
+
+        logger.info(f"Adding {len(persisted_keys)} itinerary items and packing list to session for trip {trip_id}")
         db.commit()
         logger.info(f"Successfully generated and saved plan for trip {trip_id}")
     except Exception as e:
         logger.error(f"An error occurred during plan generation for trip {trip_id}: {e}", exc_info=True)
         db.rollback()
+        raise
 
 
 def get_trip_by_id(db: Session, trip_id: int):
@@ -188,13 +390,12 @@ def get_itinerary_item(db: Session, item_id: int):
     return db.query(TripItineraryItem).filter(TripItineraryItem.id == item_id).first()
 
 def create_itinerary_item(db: Session, trip_id: int, item: TripItineraryItemCreate):
-    coords = _geocode_address(item.address)
     item_data = item.model_dump()
-    item_data['latitude'] = coords['latitude'] if coords else None
-    item_data['longitude'] = coords['longitude'] if coords else None
+    item_data.update(_place_fields(db, item.place_name, item.address))
 
     db_item = TripItineraryItem(**item_data, trip_id=trip_id)
     db.add(db_item)
+    _mark_plan_edited(db, trip_id)
     db.commit()
     db.refresh(db_item)
     return db_item
@@ -205,15 +406,18 @@ def update_itinerary_item(db: Session, item_id: int, item_update: TripItineraryI
         return None
     update_data = item_update.model_dump(exclude_unset=True)
 
-    if 'address' in update_data and update_data['address'] != db_item.address:
-        logger.info(f"Address changed for item {item_id}. Re-geocoding.")
-        coords = _geocode_address(update_data['address'])
-        update_data['latitude'] = coords['latitude'] if coords else None
-        update_data['longitude'] = coords['longitude'] if coords else None
+    address_changed = 'address' in update_data and update_data['address'] != db_item.address
+    name_changed = 'place_name' in update_data and update_data['place_name'] != db_item.place_name
+    if address_changed or name_changed:
+        logger.info(f"Place changed for item {item_id}. Re-linking place.")
+        place_fields = _place_fields(db, update_data.get('place_name', db_item.place_name), update_data.get('address', db_item.address))
+        if place_fields['place_id'] != db_item.place_id:
+            update_data.update(place_fields)
 
     for key, value in update_data.items():
         setattr(db_item, key, value)
     db.add(db_item)
+    _mark_plan_edited(db, db_item.trip_id)
     db.commit()
     db.refresh(db_item)
     return db_item
@@ -223,6 +427,7 @@ def delete_itinerary_item(db: Session, item_id: int):
     if not db_item:
         return None
     db.delete(db_item)
+    _mark_plan_edited(db, db_item.trip_id)
     db.commit()
     return db_item
 
@@ -234,6 +439,7 @@ def process_gpt_prompt_for_trip(db: Session, trip_id: int, user_prompt: str, cur
 
     current_plan_for_gpt = [
         {
+            "id": item.id,
             "day": item.day,
             "order_in_day": item.order_in_day,
             "place_name": item.place_name,
@@ -253,41 +459,60 @@ def process_gpt_prompt_for_trip(db: Session, trip_id: int, user_prompt: str, cur
     }
     
     try:
-        gpt_response = get_gpt_chat_response(
-            trip_details=trip_details_for_chat,
-            current_plan=current_plan_for_gpt,
-            user_prompt=user_prompt
-        )
+        # Questions are answered by the small model; only edits (or answers that turn out to need one) use the large one.
+        gpt_response = None
+        if classify_chat_intent(user_prompt) == "question":
+            cached_answer, question_vector = answer_cache.lookup(db, trip_details_for_chat, user_prompt)
+            if cached_answer:
+                gpt_response = {"notes": cached_answer, "cached": True}
+            else:
+                gpt_response = get_gpt_chat_response(
+                    trip_details=trip_details_for_chat,
+                    current_plan=current_plan_for_gpt,
+                    user_prompt=user_prompt,
+                    edit_format="answer"
+                )
+                if gpt_response.get("needs_edit") or gpt_response.get("error"):
+                    logger.info(f"Chat prompt for trip {trip_id} escalated from answer to edit.")
+                    gpt_response = None
+                elif gpt_response.get("general") is True:
+                    # Only trip-independent answers are shared with other trips to the same destination.
+                    answer_cache.store(db, trip_details_for_chat, user_prompt, gpt_response.get("notes"), question_vector)
+        if gpt_response is None:
+            gpt_response = get_gpt_chat_response(
+                trip_details=trip_details_for_chat,
+                current_plan=current_plan_for_gpt,
+                user_prompt=user_prompt
+            )
 
         print(f"DEBUG: GPT Response Content: {gpt_response}")
 
         itinerary_updated = False
         new_itinerary_data = gpt_response.get("itinerary")
 
-        if new_itinerary_data and new_itinerary_data != current_plan_for_gpt:
-            logger.info(f"GPT returned updated itinerary for trip {trip_id}. Updating DB.")
-            # Delete old itinerary items
-            for item in db_trip.itinerary_items:
-                db.delete(item)
-            db.flush()
-
-            # Add new itinerary items
-            for item_data in new_itinerary_data:
-                coords = _geocode_address(item_data.get('address'))
-                db_item = TripItineraryItem(
-                    trip_id=trip_id,
-                    day=item_data['day'],
-                    order_in_day=item_data['order_in_day'],
-                    place_name=item_data['place_name'],
-                    description=item_data.get('description'),
-                    start_time=datetime.strptime(item_data['start_time'], '%H:%M').time() if item_data.get('start_time') else None,
-                    end_time=datetime.strptime(item_data['end_time'], '%H:%M').time() if item_data.get('end_time') else None,
-                    address=item_data.get('address'),
-                    latitude=coords['latitude'] if coords else None,
-                    longitude=coords['longitude'] if coords else None
+        operations = gpt_response.get("operations")
+        if operations:
+            try:
+                new_itinerary_data = apply_itinerary_operations(
+                    current_plan_for_gpt, operations, max_day=trip_day_count(trip_details_for_chat)
                 )
-                db.add(db_item)
-            itinerary_updated = True
+                logger.info(f"Applied {len(operations)} GPT edit operations for trip {trip_id}.")
+            except ItineraryOperationError as e:
+                logger.warning(f"Invalid GPT edit operations for trip {trip_id} ({e}). Falling back to full itinerary.")
+                gpt_response = get_gpt_chat_response(
+                    trip_details=trip_details_for_chat,
+                    current_plan=current_plan_for_gpt,
+                    user_prompt=user_prompt,
+                    edit_format="full"
+                )
+                new_itinerary_data = gpt_response.get("itinerary")
+
+        if new_itinerary_data and new_itinerary_data != current_plan_for_gpt:
+            logger.info(f"GPT returned updated itinerary for trip {trip_id}. Applying diff.")
+            stats = _apply_itinerary_diff(db, trip_id, list(db_trip.itinerary_items), new_itinerary_data)
+            itinerary_updated = any(stats[key] for key in ("updated", "inserted", "deleted"))
+            if itinerary_updated:
+                _mark_plan_edited(db, trip_id)
             logger.info(f"DB updated with new itinerary for trip {trip_id}.")
         
         gpt_message_content = gpt_response.get("notes", "GPT가 응답했습니다.")
@@ -331,12 +556,14 @@ def update_itinerary_order(db: Session, trip_id: int, order_update: TripItinerar
             db.add(db_item) # Add to session to mark for update
             updated_items.append(db_item)
 
+    _mark_plan_edited(db, trip_id)
     db.commit()
     return updated_items
 
 def generate_and_save_gpt_description(db: Session, item_id: int) -> Optional[TripItineraryItem]:
     """
     Generates a GPT description for an itinerary item and saves it to the database.
+    Descriptions are stored per shared Place, so GPT only runs the first time any trip asks about a place.
     """
     db_item = get_itinerary_item(db, item_id=item_id)
     if not db_item:
@@ -350,9 +577,13 @@ def generate_and_save_gpt_description(db: Session, item_id: int) -> Optional[Tri
         return db_item
 
     try:
-        logger.info(f"Generating GPT description for place: {db_item.place_name}")
-        description = get_gpt_place_description(place_name=db_item.place_name)
-        
+        if db_item.place is None:
+            db_item.place = get_or_create_place(db, db_item.place_name, db_item.address)
+        description = get_or_generate_place_description(db, db_item.place)
+        if not description:
+            db.rollback()
+            return None
+
         db_item.gpt_description = description
         db.add(db_item)
         db.commit()
@@ -364,6 +595,87 @@ def generate_and_save_gpt_description(db: Session, item_id: int) -> Optional[Tri
         db.rollback()
         return None
 
+def count_items_missing_description(db: Session, trip_id: int) -> int:
+    return db.query(TripItineraryItem).filter(
+        TripItineraryItem.trip_id == trip_id, TripItineraryItem.gpt_description.is_(None)
+    ).count()
+
+def claim_description_generation(db: Session, trip_id: int) -> bool:
+    """
+    Marks the trip's description run as started unless another one holds a live claim. The conditional
+    UPDATE is atomic across web workers, so concurrent requests start at most one run per trip.
+    """
+    cutoff = func.now() - timedelta(seconds=settings.DESCRIPTION_CLAIM_SECONDS)
+    claimed = db.query(Trip).filter(
+        Trip.id == trip_id,
+        or_(Trip.descriptions_claimed_at.is_(None), Trip.descriptions_claimed_at < cutoff)
+    ).update({Trip.descriptions_claimed_at: func.now()}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def release_description_generation(db: Session, trip_id: int):
+    db.query(Trip).filter(Trip.id == trip_id).update({Trip.descriptions_claimed_at: None}, synchronize_session=False)
+    db.commit()
+
+def generate_missing_descriptions_for_trip(db: Session, trip_id: int, on_description: Optional[Callable[[TripItineraryItem], None]] = None) -> int:
+    """
+    Fills gpt_description for every item of the trip that lacks one.
+    Places with a stored description are filled from the DB; the rest are generated with batched
+    completions (one request per place, however many items share it). Each item is committed and
+    passed to `on_description` as soon as its text is available. Returns the number of items filled.
+    """
+    items = db.query(TripItineraryItem).filter(
+        TripItineraryItem.trip_id == trip_id, TripItineraryItem.gpt_description.is_(None)
+    ).order_by(TripItineraryItem.day, TripItineraryItem.order_in_day).all()
+    if not items:
+        return 0
+
+    filled = 0
+
+    def fill(place_items: List[TripItineraryItem], description: str):
+        nonlocal filled
+        for db_item in place_items:
+            db_item.gpt_description = description
+        db.commit()
+        filled += len(place_items)
+        if on_description:
+            for db_item in place_items:
+                on_description(db_item)
+
+    items_by_place = {}
+    for db_item in items:
+        if db_item.place is None:
+            db_item.place = get_or_create_place(db, db_item.place_name, db_item.address)
+        items_by_place.setdefault(db_item.place.id, []).append(db_item)
+
+    to_generate = []
+    for place_items in items_by_place.values():
+        place = place_items[0].place
+        cached = get_cached_place_description(db, place)
+        if cached:
+            fill(place_items, cached)
+        else:
+            to_generate.append(place_items)
+    logger.info(f"Trip {trip_id}: {filled} descriptions served from places, {len(to_generate)} places to generate.")
+
+    def on_generated(index: int, description: str):
+        place_items = to_generate[index]
+        fill(place_items, save_place_description(db, place_items[0].place, description))
+
+    try:
+        generated = generate_place_descriptions_batch(
+            [place_items[0].place.name for place_items in to_generate], on_description=on_generated
+        )
+    except Exception as e:
+        logger.error(f"Batch description generation failed for trip {trip_id}: {e}", exc_info=True)
+        db.rollback()
+        return filled
+
+    missing = len(to_generate) - len(generated)
+    if missing:
+        logger.warning(f"Trip {trip_id}: {missing} place descriptions were not returned by the batch.")
+    return filled
+
 def leave_trip(db: Session, trip_id: int, user_id: int) -> bool:
     """
     Allows a user to leave a trip. If the user is the last member, deletes the trip.
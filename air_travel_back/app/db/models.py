@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Text, TIMESTAMP, Boolean, ForeignKey, Time, Float
+from sqlalchemy import Column, Integer, String, Date, Text, TIMESTAMP, Boolean, ForeignKey, Time, Float, UniqueConstraint, JSON, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.sql import text
@@ -69,6 +69,10 @@ class Trip(Base):
     accommodation = Column(String(50))
     trend = Column(Boolean, default=False)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    # Set while a process is filling the trip's missing place descriptions (see claim_description_generation)
+    descriptions_claimed_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Set by user and chat edits of the itinerary; a cached draft is then no longer personalized over them
+    plan_edited = Column(Boolean, nullable=False, server_default=text("FALSE"))
 
     creator = relationship("User", back_populates="trips_created")
     members = relationship("TripMember", back_populates="trip")
@@ -113,10 +117,99 @@ class TripItineraryItem(Base):
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
     gpt_description = Column(Text, nullable=True)
+    place_id = Column(Integer, ForeignKey("places.id", ondelete="SET NULL"), nullable=True, index=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
 
     trip = relationship("Trip", back_populates="itinerary_items")
+    place = relationship("Place")
+
+class Place(Base):
+    __tablename__ = "places"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Normalized "name|address" so the same landmark written by different trips resolves to one row
+    place_key = Column(String(600), unique=True, nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    address = Column(Text)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    google_place_id = Column(String(255), nullable=True, index=True)
+    # Set when geocoding failed: the next save of the place after this time geocodes it again
+    geocode_retry_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    descriptions = relationship("PlaceDescription", back_populates="place", cascade="all, delete-orphan")
+
+class PlaceDescription(Base):
+    __tablename__ = "place_descriptions"
+    __table_args__ = (UniqueConstraint("place_id", "language", name="uq_place_descriptions_place_language"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    place_id = Column(Integer, ForeignKey("places.id", ondelete="CASCADE"), nullable=False, index=True)
+    language = Column(String(10), nullable=False, default="ko")
+    description = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    place = relationship("Place", back_populates="descriptions")
+
+class PlanTemplate(Base):
+    __tablename__ = "plan_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # sha256 of the normalized plan inputs (destination, day count, interests, transport, accommodation, trend)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)
+    params = Column(JSON, nullable=False)
+    itinerary = Column(JSON, nullable=False)
+    packing_list = Column(JSON, nullable=True)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    last_used_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+class PackingListTemplate(Base):
+    __tablename__ = "packing_list_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # sha256 of the packing profile (destination, start month, trip length bucket, transport, accommodation)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)
+    params = Column(JSON, nullable=False)
+    items = Column(JSON, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    last_used_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+class ChatAnswerCache(Base):
+    __tablename__ = "chat_answer_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    destination_key = Column(String(255), nullable=False, index=True)
+    question = Column(Text, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # float32, L2-normalized
+    answer = Column(Text, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=True, index=True)
+    payload = Column(JSON, nullable=False, default=dict)
+    # queued -> running -> succeeded | failed (a failed attempt with attempts left goes back to queued)
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    # Enqueuing the same key twice returns the existing job instead of scheduling a duplicate
+    idempotency_key = Column(String(255), unique=True, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    progress = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    run_after = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    locked_by = Column(String(100), nullable=True)
+    locked_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
 class PackingListItem(Base):
     __tablename__ = "packing_list_items"
@@ -0,0 +1,103 @@
+"""
+CLIP inference server.
+
+    python -m app.inference_server [--address /tmp/air_travel_inference.sock | host:port]
+
+Owns the models (torch, CLIP, the faiss index) so web workers started with INFERENCE_BACKEND=remote
+don't load them (see app.ai_services.remote_detection_service). Every connection is served on its own
+thread and detection requests go through the CLIP micro-batcher, so concurrent frames from all web
+workers share batches. Landmark photo writes from the admin API run here too, and the index watcher
+keeps the server in sync with offline rebuilds. Run one per host (or one per address listed in INFERENCE_ADDRESSES); SIGINT/SIGTERM stop it.
+"""
+import argparse
+import logging
+import os
+import signal
+import threading
+from multiprocessing.connection import Connection, Listener
+
+from app.ai_services.detection_service import DetectionService
+from app.ai_services.remote_detection_service import parse_address, payload_image
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def handle(service: DetectionService, op: str, *args):
+    if op == "detect":
+        payload, lat, lon = args
+        scene_det = service.clip_model.submit(payload_image(payload), lat, lon).result()
+        return DetectionService._scene_detections(scene_det)
+    if op == "landmarks_add":
+        return service.add_landmark_photos(*args)
+    if op == "landmarks_remove":
+        return service.retire_landmark_photos(*args)
+    if op == "landmarks_compact":
+        return service.compact_landmarks()
+    if op == "reload":
+        return service.reload_index(*args)
+    if op == "stats":
+        return {"model": service.model_available, "pid": os.getpid()}
+    raise ValueError(f"unknown op {op!r}")
+
+
+def serve_connection(service: DetectionService, conn: Connection):
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                reply = ("ok", handle(service, *request))
+            except Exception as e:
+                logger.exception(f"Inference request {request[0]!r} failed")
+                reply = ("error", str(e))
+            try:
+                conn.send(reply)
+            except OSError:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve CLIP scene detection to the web workers.")
+    parser.add_argument("--address", default=settings.INFERENCE_ADDRESSES.split(",")[0].strip())
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if not settings.INFERENCE_AUTHKEY:
+        raise SystemExit("INFERENCE_AUTHKEY must be set (the web workers use the same key).")
+    address = parse_address(args.address)
+    if isinstance(address, str) and os.path.exists(address):
+        os.unlink(address)  # left behind by a previous server that was killed
+
+    service = DetectionService()
+    if settings.CLIP_INDEX_WATCH_SECONDS > 0:
+        service.clip_model.start_index_watcher()
+    listener = Listener(address, authkey=settings.INFERENCE_AUTHKEY.encode("utf-8"))
+
+    def request_stop(signum, frame):
+        logger.info("Stopping inference server...")
+        listener.close()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    logger.info(f"Serving CLIP inference on {args.address}")
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError:
+            break  # listener closed by the signal handler
+        except Exception as e:
+            # A client with the wrong authkey (or one that hung up mid-handshake) must not stop the server.
+            logger.warning(f"Rejected inference connection: {e}")
+            continue
+        threading.Thread(target=serve_connection, args=(service, conn), daemon=True).start()
+
+    if settings.CLIP_INDEX_WATCH_SECONDS > 0:
+        service.clip_model.stop_index_watcher()
+
+
+if __name__ == "__main__":
+    main()
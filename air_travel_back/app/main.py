@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware # Import CORSMiddleware
 from fastapi.staticfiles import StaticFiles # Import StaticFiles
@@ -5,6 +6,7 @@ from fastapi.staticfiles import StaticFiles # Import StaticFiles
 from app.api.v1.api import api_router
 from app.core.config import settings
 from app.db.database import Base, engine
+from app.services.events import start_trip_event_listener
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -34,4 +36,30 @@ app.include_router(api_router, prefix="/v1")
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 # Create database tables
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+Base.metadata.create_all(bind=engine)
+
+@app.on_event("startup")
+async def start_background_services():
+    # Job workers (possibly on other hosts) publish trip events; relay them to this process's WebSockets.
+    app.state.trip_event_listener = start_trip_event_listener(asyncio.get_running_loop())
+    if settings.CLIP_INDEX_WATCH_SECONDS > 0 and settings.INFERENCE_BACKEND == "local":
+        # Index rebuilds and landmark updates from other processes are swapped in without a restart
+        # (with the remote backend the inference server runs the watcher).
+        from app.api.v1.endpoints.ai_analysis import detection_service
+
+        detection_service.clip_model.start_index_watcher()
+    if settings.JOB_BACKEND == "inline":
+        from app.services.jobs import JobWorker
+
+        app.state.job_worker = JobWorker(concurrency=1)
+        app.state.job_worker.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    app.state.trip_event_listener.stop()
+    if settings.CLIP_INDEX_WATCH_SECONDS > 0 and settings.INFERENCE_BACKEND == "local":
+        from app.api.v1.endpoints.ai_analysis import detection_service
+
+        detection_service.clip_model.stop_index_watcher()
+    if getattr(app.state, "job_worker", None):
+        await asyncio.to_thread(app.state.job_worker.stop)
@@ -84,6 +84,26 @@ class TripResponse(TripBase):
     creator_id: int
     created_at: datetime
 
+class TripCreateResponse(TripResponse):
+    # True when a cached plan was copied in as a draft, so the client can open the itinerary right away
+    plan_draft_ready: bool = False
+    # Job generating (or personalizing) the plan; poll GET /trips/{id}/jobs/{job_id} or watch job_status events
+    plan_job_id: Optional[int] = None
+
+class JobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    kind: str
+    trip_id: Optional[int] = None
+    status: str
+    attempts: int
+    max_attempts: int
+    progress: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class TripResponseWithMemberCount(TripResponse):
     member_count: int
 
@@ -106,6 +126,7 @@ class TripItineraryItemResponse(TripItineraryItemBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
     trip_id: int
+    place_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
@@ -0,0 +1,109 @@
+"""
+Cross-process notifications over Postgres LISTEN/NOTIFY.
+
+Job workers run outside the web process, so they cannot reach the WebSocket connections directly.
+They publish trip events on TRIP_EVENTS_CHANNEL; every web process listens and forwards each event
+to its own connected clients via manager.broadcast. Enqueuing a job notifies JOBS_CHANNEL so idle
+workers pick it up immediately instead of at their next poll.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from typing import Callable, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import text
+
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+TRIP_EVENTS_CHANNEL = "trip_events"
+JOBS_CHANNEL = "jobs"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+NOTIFY_MAX_BYTES = 7900
+
+
+def notify(channel: str, payload: str = ""):
+    # Its own connection and transaction, so the notification goes out now even while the
+    # caller's session is still holding uncommitted work (e.g. a plan being generated).
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+        conn.commit()
+
+
+def publish_trip_event(trip_id: int, message: dict):
+    """Sends a WebSocket message to everyone connected to the trip, from any process."""
+    payload = json.dumps({"trip_id": trip_id, "message": message}, ensure_ascii=False)
+    if len(payload.encode("utf-8")) > NOTIFY_MAX_BYTES:
+        logger.warning(f"Dropping oversized {message.get('type')} event for trip {trip_id}.")
+        return
+    try:
+        notify(TRIP_EVENTS_CHANNEL, payload)
+    except Exception as e:
+        logger.error(f"Failed to publish {message.get('type')} event for trip {trip_id}: {e}")
+
+
+class PgListener:
+    """LISTENs on the given channels in a daemon thread and calls on_notify(channel, payload) for each notification."""
+
+    def __init__(self, channels: List[str], on_notify: Callable[[str, str], None], reconnect_seconds: float = 5.0):
+        self.channels = channels
+        self.on_notify = on_notify
+        self.reconnect_seconds = reconnect_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"pg-listen-{'-'.join(self.channels)}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _listen(self):
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        conn = psycopg2.connect(dsn)
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                for channel in self.channels:
+                    cursor.execute(f"LISTEN {channel};")
+            logger.info(f"Listening on {', '.join(self.channels)}.")
+            while not self._stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notification = conn.notifies.pop(0)
+                    self.on_notify(notification.channel, notification.payload)
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.error(f"Listener on {', '.join(self.channels)} failed: {e}; reconnecting in {self.reconnect_seconds}s.")
+                self._stop.wait(self.reconnect_seconds)
+
+
+def start_trip_event_listener(loop: asyncio.AbstractEventLoop) -> PgListener:
+    """Forwards trip events published by any process to this web process's WebSocket clients."""
+    from app.api.websockets import manager  # only the web process listens for trip events
+
+    def on_notify(channel: str, payload: str):
+        try:
+            event = json.loads(payload)
+            message = json.dumps(event["message"], ensure_ascii=False)
+            asyncio.run_coroutine_threadsafe(manager.broadcast(int(event["trip_id"]), message), loop)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Ignoring malformed trip event: {e}")
+
+    listener = PgListener([TRIP_EVENTS_CHANNEL], on_notify)
+    listener.start()
+    return listener
@@ -0,0 +1,107 @@
+"""
+Edit operations that GPT emits instead of a full itinerary when modifying a trip plan.
+
+Supported operations (items are referenced by their itinerary item `id`):
+    {"op": "move",   "id": 12, "day": 2, "order_in_day": 1}
+    {"op": "insert", "day": 1, "order_in_day": 3, "item": {"place_name": ..., "description": ..., "start_time": ..., "end_time": ..., "address": ...}}
+    {"op": "delete", "id": 12}
+    {"op": "update", "id": 12, "fields": {"start_time": "10:00", ...}}
+"""
+import copy
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+EDITABLE_FIELDS = ("place_name", "description", "start_time", "end_time", "address")
+
+
+class ItineraryOperationError(ValueError):
+    """Raised when GPT edit operations cannot be applied to the current plan."""
+
+
+def _validate_fields(fields: Any, require_place_name: bool) -> Dict[str, Any]:
+    if not isinstance(fields, dict):
+        raise ItineraryOperationError("Item fields must be an object")
+    unknown = set(fields) - set(EDITABLE_FIELDS)
+    if unknown:
+        raise ItineraryOperationError(f"Unknown item fields: {sorted(unknown)}")
+    if require_place_name and not str(fields.get("place_name") or "").strip():
+        raise ItineraryOperationError("Inserted item needs a place_name")
+    if "place_name" in fields and not str(fields["place_name"] or "").strip():
+        raise ItineraryOperationError("place_name cannot be empty")
+    for key in ("start_time", "end_time"):
+        if fields.get(key):
+            try:
+                datetime.strptime(fields[key], "%H:%M")
+            except (TypeError, ValueError):
+                raise ItineraryOperationError(f"Invalid {key}: {fields[key]!r}")
+    return fields
+
+
+def _validate_position(op: Dict[str, Any], max_day: Optional[int]) -> int:
+    day = op.get("day")
+    if not isinstance(day, int) or day < 1 or (max_day is not None and day > max_day):
+        raise ItineraryOperationError(f"Invalid day: {day!r}")
+    order = op.get("order_in_day")
+    if order is not None and (not isinstance(order, int) or order < 1):
+        raise ItineraryOperationError(f"Invalid order_in_day: {order!r}")
+    return day
+
+
+def _insert_at(day_items: List[Dict[str, Any]], order: Optional[int], item: Dict[str, Any]):
+    position = len(day_items) if order is None else min(order - 1, len(day_items))
+    day_items.insert(position, item)
+
+
+def apply_itinerary_operations(current_plan: List[Dict[str, Any]], operations: List[Dict[str, Any]], max_day: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Applies edit operations in order to `current_plan` (a list of item dicts with `id`)
+    and returns the resulting plan with `order_in_day` renumbered per day.
+    The input plan is not modified. Raises ItineraryOperationError on any invalid operation.
+    """
+    if not isinstance(operations, list):
+        raise ItineraryOperationError("operations must be a list")
+
+    days: Dict[int, List[Dict[str, Any]]] = {}
+    for item in sorted(current_plan, key=lambda i: (i["day"], i["order_in_day"])):
+        days.setdefault(item["day"], []).append(copy.deepcopy(item))
+
+    def find(item_id: Any):
+        for day, day_items in days.items():
+            for index, item in enumerate(day_items):
+                if item.get("id") is not None and item.get("id") == item_id:
+                    return day, index
+        raise ItineraryOperationError(f"Unknown item id: {item_id!r}")
+
+    for op in operations:
+        if not isinstance(op, dict):
+            raise ItineraryOperationError("Each operation must be an object")
+        kind = op.get("op")
+
+        if kind == "delete":
+            day, index = find(op.get("id"))
+            days[day].pop(index)
+        elif kind == "move":
+            target_day = _validate_position(op, max_day)
+            day, index = find(op.get("id"))
+            item = days[day].pop(index)
+            item["day"] = target_day
+            _insert_at(days.setdefault(target_day, []), op.get("order_in_day"), item)
+        elif kind == "update":
+            fields = _validate_fields(op.get("fields"), require_place_name=False)
+            day, index = find(op.get("id"))
+            days[day][index].update(fields)
+        elif kind == "insert":
+            target_day = _validate_position(op, max_day)
+            fields = _validate_fields(op.get("item"), require_place_name=True)
+            item = {key: fields.get(key) for key in EDITABLE_FIELDS}
+            item["day"] = target_day
+            _insert_at(days.setdefault(target_day, []), op.get("order_in_day"), item)
+        else:
+            raise ItineraryOperationError(f"Unknown operation: {kind!r}")
+
+    new_plan = []
+    for day in sorted(days):
+        for order, item in enumerate(days[day], start=1):
+            item["order_in_day"] = order
+            new_plan.append(item)
+    return new_plan
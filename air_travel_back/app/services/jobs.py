@@ -0,0 +1,228 @@
+"""
+Job handlers and the worker loop that runs them.
+
+Web processes only enqueue jobs (app.crud.job.enqueue_job). Workers started with
+`python -m app.worker` claim them from the jobs table, run the handler registered for the job kind,
+record progress and retries, and publish job_status / plan events to the trip's WebSocket clients
+through app.services.events. Throughput scales by running more workers, on any number of hosts.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import job as crud_job
+from app.crud import trip as crud_trip
+from app.db.database import get_db
+from app.db.models import Job, TripItineraryItem
+from app.services.events import JOBS_CHANNEL, PgListener, publish_trip_event
+from app.services.llm_client import LLMPriority, llm_priority
+from app.services.semantic_cache import answer_cache
+
+logger = logging.getLogger(__name__)
+
+# How often each worker deletes expired semantic cache rows
+CACHE_PURGE_SECONDS = 3600
+
+ProgressCallback = Callable[[dict], None]
+
+
+def itinerary_item_payload(db_item: TripItineraryItem) -> dict:
+    """Serializes a (possibly uncommitted) itinerary item for WebSocket delivery."""
+    return {
+        "id": db_item.id,
+        "trip_id": db_item.trip_id,
+        "day": db_item.day,
+        "order_in_day": db_item.order_in_day,
+        "place_name": db_item.place_name,
+        "description": db_item.description,
+        "start_time": db_item.start_time.strftime('%H:%M') if db_item.start_time else None,
+        "end_time": db_item.end_time.strftime('%H:%M') if db_item.end_time else None,
+        "address": db_item.address,
+        "latitude": db_item.latitude,
+        "longitude": db_item.longitude
+    }
+
+
+def job_status_payload(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "progress": job.progress,
+        "error": job.error,
+    }
+
+
+def run_plan_generation(db: Session, job: Job, report_progress: ProgressCallback):
+    trip_id = job.trip_id
+    generated = 0
+
+    def on_item(db_item: TripItineraryItem):
+        nonlocal generated
+        generated += 1
+        # Items are streamed before the plan commits; a failed attempt rolls them back, so clients keep
+        # only the items of the latest attempt they have seen.
+        publish_trip_event(trip_id, {"type": "plan_item", "attempt": job.attempts, "payload": itinerary_item_payload(db_item)})
+        report_progress({"items": generated})
+
+    crud_trip.generate_and_save_trip_plan(
+        db, trip_id, job.payload.get("member_count"), job.payload.get("companion_relation"), on_item=on_item
+    )
+    publish_trip_event(trip_id, {"type": "plan_update", "payload": {"message": "Trip itinerary has been generated!"}})
+
+
+JOB_HANDLERS: Dict[str, Callable[[Session, Job, ProgressCallback], None]] = {
+    crud_job.JOB_PLAN_GENERATION: run_plan_generation,
+}
+
+
+class JobWorker:
+    """Runs `concurrency` threads that each claim and execute one job at a time."""
+
+    def __init__(self, concurrency: int = 1, kinds: Optional[List[str]] = None, worker_id: Optional[str] = None):
+        self.concurrency = max(concurrency, 1)
+        self.kinds = kinds or list(JOB_HANDLERS)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._listener: Optional[PgListener] = None
+        self._last_stale_check = 0.0
+        self._last_cache_purge = 0.0
+
+    def start(self):
+        self._listener = PgListener([JOBS_CHANNEL], lambda channel, payload: self._wakeup.set())
+        self._listener.start()
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job worker {self.worker_id} started with {self.concurrency} threads for {', '.join(self.kinds)}.")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops claiming new jobs and waits for the running ones to finish."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._listener:
+            self._listener.stop()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self._requeue_stale_jobs()
+                self._purge_expired_cache()
+                with next(get_db()) as db:
+                    job = crud_job.claim_next_job(db, self.worker_id, self.kinds)
+                    job_id = job.id if job else None
+                if job_id is None:
+                    self._wakeup.wait(settings.JOB_POLL_SECONDS)
+                    self._wakeup.clear()
+                    continue
+                self.run(job_id)
+            except Exception as e:
+                logger.error(f"Job worker loop error: {e}", exc_info=True)
+                self._stop.wait(settings.JOB_POLL_SECONDS)
+
+    def _requeue_stale_jobs(self):
+        now = time.monotonic()
+        if now - self._last_stale_check < 60:
+            return
+        self._last_stale_check = now
+        with next(get_db()) as db:
+            requeued = crud_job.requeue_stale_jobs(db)
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale jobs.")
+
+    def _purge_expired_cache(self):
+        now = time.monotonic()
+        if now - self._last_cache_purge < CACHE_PURGE_SECONDS:
+            return
+        self._last_cache_purge = now
+        with next(get_db()) as db:
+            deleted = answer_cache.purge_expired(db)
+        if deleted:
+            logger.info(f"Deleted {deleted} expired semantic cache rows.")
+
+    def _report_progress(self, job_id: int, attempt: int) -> ProgressCallback:
+        def report(progress: dict):
+            # A separate session: the handler's own session may hold an open transaction.
+            with next(get_db()) as progress_db:
+                crud_job.update_job_progress(progress_db, job_id, self.worker_id, attempt, progress)
+        return report
+
+    def _heartbeat(self, job_id: int, attempt: int, done: threading.Event):
+        # Handlers report progress only per item, and some phases (e.g. draft personalization) report none.
+        while not done.wait(settings.JOB_HEARTBEAT_SECONDS):
+            try:
+                with next(get_db()) as heartbeat_db:
+                    if not crud_job.heartbeat_job(heartbeat_db, job_id, self.worker_id, attempt):
+                        logger.warning(f"Job {job_id} attempt {attempt} was requeued; its result will not be committed.")
+                        return
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+
+    def _publish_status(self, job: Job):
+        if job.trip_id:
+            publish_trip_event(job.trip_id, {"type": "job_status", "payload": job_status_payload(job)})
+
+    def run(self, job_id: int):
+        with next(get_db()) as db:
+            job = crud_job.get_job(db, job_id)
+            attempt = job.attempts
+            handler = JOB_HANDLERS.get(job.kind)
+            try:
+                if handler is None:
+                    crud_job.fail_job(db, job_id, self.worker_id, attempt, f"No handler for job kind {job.kind}")
+                    return
+                logger.info(f"Running job {job.id} ({job.kind}), attempt {attempt}/{job.max_attempts}")
+                self._publish_status(job)
+                job = self._run_handler(db, job, handler)
+            except crud_job.JobLostError as e:
+                # requeue_stale_jobs gave the job to another worker; that attempt owns the result now.
+                logger.warning(f"Job {job_id} ({job.kind}) lost its claim, result discarded: {e}")
+                return
+            self._publish_status(job)
+
+    def _run_handler(self, db: Session, job: Job, handler: Callable[[Session, Job, ProgressCallback], None]) -> Job:
+        job_id, kind, attempt = job.id, job.kind, job.attempts
+
+        def check_claim(session: Session):
+            # Every commit the handler makes first re-locks the job row under this attempt's claim.
+            crud_job.lock_owned_job(session, job_id, self.worker_id, attempt)
+
+        started = time.monotonic()
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job_id, attempt, done), name=f"job-heartbeat-{job_id}", daemon=True).start()
+        try:
+            event.listen(db, "before_commit", check_claim)
+            try:
+                # Nobody is waiting on a single reply here, so these calls yield to interactive ones.
+                with llm_priority(LLMPriority.BACKGROUND, key=f"trip:{job.trip_id}"):
+                    handler(db, job, self._report_progress(job_id, attempt))
+            finally:
+                event.remove(db, "before_commit", check_claim)
+        except crud_job.JobLostError:
+            db.rollback()
+            raise
+        except Exception as e:
+            db.rollback()
+            job = crud_job.fail_job(db, job_id, self.worker_id, attempt, f"{type(e).__name__}: {e}")
+            retry = job.status == crud_job.JOB_QUEUED
+            logger.error(f"Job {job_id} ({kind}) failed: {e}; {'will retry' if retry else 'giving up'}.")
+        else:
+            job = crud_job.complete_job(db, job_id, self.worker_id, attempt)
+            logger.info(f"Job {job_id} ({kind}) succeeded in {time.monotonic() - started:.1f}s")
+        finally:
+            done.set()
+        return job
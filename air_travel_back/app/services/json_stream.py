@@ -0,0 +1,74 @@
+"""
+Incremental JSON parsing helpers for streamed GPT completions.
+"""
+import json
+from typing import Any, Dict, List
+
+
+class IncrementalArrayParser:
+    """
+    Consumes a JSON document chunk by chunk and returns every object of a
+    top-level array (e.g. `itinerary`) as soon as its closing brace arrives.
+
+    Only the structure needed to find object boundaries is tracked (string /
+    escape state and nesting depth), so each character is scanned exactly once.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._array_depth = None
+        self._array_closed = False
+        self._item_start = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Appends a chunk and returns the array objects completed by it."""
+        if not chunk:
+            return []
+        self.text += chunk
+        completed = []
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                if (c == "[" and self._depth == 1 and self._array_depth is None
+                        and not self._array_closed and self._last_string == self.array_key):
+                    self._array_depth = self._depth + 1
+                elif c == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._item_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if c == "}" and self._item_start is not None and self._depth == self._array_depth:
+                    try:
+                        completed.append(json.loads(text[self._item_start:i + 1]))
+                    except json.JSONDecodeError:
+                        # A malformed object is left to the final full parse.
+                        pass
+                    self._item_start = None
+                elif c == "]" and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._array_depth = None
+                    self._array_closed = True
+
+        self._pos = len(text)
+        return completed
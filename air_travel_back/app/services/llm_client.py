@@ -0,0 +1,324 @@
+"""
+Shared Azure OpenAI clients with connection pooling, concurrency limits and 429-aware retries.
+
+All LLM calls go through chat_completion / stream_chat_completion / create_embeddings / generate_image
+so that every request in the process shares one HTTP connection pool and one set of rate limits.
+Callers set the dispatch priority of their calls with `llm_priority(...)`.
+"""
+import contextlib
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from datetime import timezone
+from enum import IntEnum
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+import httpx
+from openai import (
+    AzureOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 429s, timeouts, dropped connections and 5xx are worth retrying; everything else is a caller error.
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+_client_lock = threading.Lock()
+_sync_client: Optional[AzureOpenAI] = None
+_image_client: Optional[AzureOpenAI] = None
+
+
+class LLMPriority(IntEnum):
+    """Dispatch classes for LLM calls; lower values are served first."""
+    INTERACTIVE = 0  # a user is waiting on the reply (chat prompt, place description, AI analysis)
+    DEFAULT = 1
+    BACKGROUND = 2  # bulk work nobody is blocked on (initial trip plan generation)
+
+
+_priority_context: ContextVar[Tuple[LLMPriority, Optional[str]]] = ContextVar(
+    "llm_priority", default=(LLMPriority.DEFAULT, None)
+)
+
+
+@contextlib.contextmanager
+def llm_priority(priority: LLMPriority, key: Optional[str] = None):
+    """
+    Marks every LLM call made inside the block with a priority class and a fairness key
+    (e.g. "trip:12"); waiters with the same class are served round-robin across keys.
+    The setting follows contextvars, so it carries into asyncio.to_thread but worker pools
+    need contextvars.copy_context().run.
+    """
+    token = _priority_context.set((priority, key))
+    try:
+        yield
+    finally:
+        _priority_context.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("granted",)
+
+    def __init__(self):
+        self.granted = threading.Event()
+
+
+class PriorityGate:
+    """
+    Counting semaphore that hands freed slots to the highest priority class first and,
+    within a class, round-robin across fairness keys so one trip cannot starve another.
+    `reserved` slots are only ever given to INTERACTIVE calls.
+    """
+
+    def __init__(self, capacity: int, reserved: int = 0):
+        self.capacity = max(capacity, 1)
+        self.reserved = min(max(reserved, 0), self.capacity - 1)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiters: Dict[LLMPriority, "OrderedDict[Optional[str], Deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in LLMPriority
+        }
+
+    def _limit(self, priority: LLMPriority) -> int:
+        return self.capacity if priority == LLMPriority.INTERACTIVE else self.capacity - self.reserved
+
+    def _grant_waiting(self):
+        # Caller holds self._lock.
+        for priority in LLMPriority:
+            queues = self._waiters[priority]
+            while queues and self._in_use < self._limit(priority):
+                key, queue = next(iter(queues.items()))
+                waiter = queue.popleft()
+                if queue:
+                    queues.move_to_end(key)
+                else:
+                    del queues[key]
+                self._in_use += 1
+                waiter.granted.set()
+
+    def acquire(self, priority: LLMPriority, key: Optional[str] = None):
+        waiter = _Waiter()
+        with self._lock:
+            self._waiters[priority].setdefault(key, deque()).append(waiter)
+            self._grant_waiting()
+        waiter.granted.wait()
+
+    def release(self):
+        with self._lock:
+            self._in_use -= 1
+            self._grant_waiting()
+
+
+_global_gate = PriorityGate(settings.OPENAI_MAX_CONCURRENCY, settings.OPENAI_INTERACTIVE_RESERVED_SLOTS)
+_deployment_gates: Dict[str, PriorityGate] = {}
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONCURRENCY,
+        max_keepalive_connections=settings.OPENAI_MAX_CONCURRENCY,
+        keepalive_expiry=60,
+    )
+
+
+def get_openai_client() -> AzureOpenAI:
+    """Returns the process-wide sync Azure OpenAI client (created on first use)."""
+    global _sync_client
+    if _sync_client is None:
+        with _client_lock:
+            if _sync_client is None:
+                _sync_client = AzureOpenAI(
+                    azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+                    api_key=settings.AZURE_OPENAI_API_KEY,
+                    api_version=settings.AZURE_OPENAI_API_VERSION,
+                    max_retries=0,  # retries are handled here so they respect our slots and Retry-After
+                    http_client=httpx.Client(limits=_http_limits(), timeout=settings.OPENAI_TIMEOUT_SECONDS),
+                )
+    return _sync_client
+
+
+def get_image_client() -> AzureOpenAI:
+    """Returns the process-wide client for the DALL-E deployment, which lives on its own endpoint."""
+    global _image_client
+    if _image_client is None:
+        with _client_lock:
+            if _image_client is None:
+                _image_client = AzureOpenAI(
+                    azure_endpoint=settings.AZURE_DALL_E_ENDPOINT,
+                    api_key=settings.AZURE_DALL_E_API_KEY,
+                    api_version=settings.AZURE_DALL_E_API_VERSION,
+                    max_retries=0,
+                    http_client=httpx.Client(limits=_http_limits(), timeout=settings.OPENAI_TIMEOUT_SECONDS),
+                )
+    return _image_client
+
+
+def _deployment_gate(deployment: str) -> PriorityGate:
+    with _client_lock:
+        if deployment not in _deployment_gates:
+            _deployment_gates[deployment] = PriorityGate(
+                settings.OPENAI_MAX_CONCURRENCY_PER_DEPLOYMENT, settings.OPENAI_INTERACTIVE_RESERVED_SLOTS
+            )
+        return _deployment_gates[deployment]
+
+
+def _acquire_slots(deployment: str, priority: LLMPriority, key: Optional[str]):
+    """Takes one per-deployment and one global slot, waiting in priority order for each."""
+    started_at = time.perf_counter()
+    deployment_gate = _deployment_gate(deployment)
+    deployment_gate.acquire(priority, key)
+    try:
+        _global_gate.acquire(priority, key)
+    except BaseException:
+        deployment_gate.release()
+        raise
+    waited = time.perf_counter() - started_at
+    if waited > 1:
+        logger.info(f"[openai] {priority.name.lower()} call on {deployment} (key={key}) queued for {waited:.2f}s")
+
+
+def _release_slots(deployment: str):
+    _global_gate.release()
+    _deployment_gate(deployment).release()
+
+
+@contextlib.contextmanager
+def _slot(deployment: str):
+    """Holds the concurrency slots for the duration of a call, using the caller's llm_priority."""
+    priority, key = _priority_context.get()
+    _acquire_slots(deployment, priority, key)
+    try:
+        yield
+    finally:
+        _release_slots(deployment)
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Reads retry-after-ms / retry-after (seconds or HTTP date) from the error response, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            parsed = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            # A malformed header must not replace the 429 being retried.
+            return None
+        if parsed.tzinfo is None:
+            # HTTP dates are always GMT; a date without a zone must not be read as local time.
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return max(parsed.timestamp() - time.time(), 0.0)
+    return None
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """
+    Honors Retry-After when the server sends it (plus a little jitter so waiting callers
+    do not all return at once); otherwise uses full-jitter exponential backoff.
+    """
+    retry_after = _retry_after_seconds(error)
+    if retry_after is not None:
+        return min(retry_after, settings.OPENAI_BACKOFF_MAX_SECONDS) + random.uniform(0, 0.5)
+    ceiling = min(settings.OPENAI_BACKOFF_BASE_SECONDS * (2 ** attempt), settings.OPENAI_BACKOFF_MAX_SECONDS)
+    return random.uniform(0, ceiling)
+
+
+def _should_retry(attempt: int, error: Exception, call: str) -> Optional[float]:
+    if attempt >= settings.OPENAI_MAX_RETRIES:
+        return None
+    delay = _backoff_delay(attempt, error)
+    logger.warning(f"[openai] {call} failed with {type(error).__name__} (attempt {attempt + 1}), retrying in {delay:.2f}s")
+    return delay
+
+
+def chat_completion(**kwargs: Any):
+    """chat.completions.create on the shared client, within concurrency limits and with retries."""
+    deployment = kwargs["model"]
+    attempt = 0
+    while True:
+        try:
+            with _slot(deployment):
+                return get_openai_client().chat.completions.create(**kwargs)
+        except RETRYABLE_ERRORS as e:
+            delay = _should_retry(attempt, e, f"chat[{deployment}]")
+            if delay is None:
+                raise
+        # Sleep outside the slots so a backing-off call does not block others.
+        time.sleep(delay)
+        attempt += 1
+
+
+def stream_chat_completion(**kwargs: Any) -> Iterator[Any]:
+    """
+    Streaming chat completion that keeps its concurrency slot until the stream is consumed.
+    Retries only happen before the first chunk arrives, so callers never see duplicated output.
+    """
+    deployment = kwargs["model"]
+    attempt = 0
+    while True:
+        received_any = False
+        try:
+            with _slot(deployment):
+                for chunk in get_openai_client().chat.completions.create(stream=True, **kwargs):
+                    received_any = True
+                    yield chunk
+            return
+        except RETRYABLE_ERRORS as e:
+            delay = None if received_any else _should_retry(attempt, e, f"stream[{deployment}]")
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+def create_embeddings(**kwargs: Any):
+    """embeddings.create on the shared client, within concurrency limits and with retries."""
+    deployment = kwargs["model"]
+    attempt = 0
+    while True:
+        try:
+            with _slot(deployment):
+                return get_openai_client().embeddings.create(**kwargs)
+        except RETRYABLE_ERRORS as e:
+            delay = _should_retry(attempt, e, f"embeddings[{deployment}]")
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+def generate_image(**kwargs: Any):
+    """images.generate on the shared DALL-E client, within limits and with retries."""
+    deployment = kwargs["model"]
+    attempt = 0
+    while True:
+        try:
+            with _slot(deployment):
+                return get_image_client().images.generate(**kwargs)
+        except RETRYABLE_ERRORS as e:
+            delay = _should_retry(attempt, e, f"image[{deployment}]")
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
@@ -1,8 +1,24 @@
+import contextvars
 import json
+import logging
+import queue
 import re
-from typing import Dict, Any, List
-from openai import AzureOpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from app.core.config import settings
+from app.services.llm_client import chat_completion, stream_chat_completion, create_embeddings, generate_image
+from app.services.json_stream import IncrementalArrayParser
+from app.services.retrieval import use_local_retrieval, retrieve_context
+
+# Exact token counts when tiktoken is installed; count_tokens falls back to an estimate otherwise.
+try:
+    import tiktoken  # type: ignore
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
 
 
 search_index = settings.AZURE_SEARCH_INDEX
@@ -11,9 +27,168 @@ search_endpoint = settings.AZURE_SEARCH_ENDPOINT
 search_ai_key = settings.AZURE_SEARCH_AI_KEY
 
 
+PLAN_ROLE_INFORMATION = "You are an AI assistant that helps people create detailed travel itineraries. You must respond only with pure JSON format without markdown code blocks."
+DESCRIPTION_ROLE_INFORMATION = "You are an AI assistant that helps people create detailed travel itineraries. You must respond only with descriptive text."
+
+
+# Which deployment tier each task runs on: full plans and edits need the large model,
+# short classification / Q&A / description calls are served by the small one.
+MODEL_ROUTES = {
+    "trip_plan": "large",
+    "trip_outline": "large",
+    "day_plan": "large",
+    "chat_edit": "large",
+    "chat_intent": "small",
+    "chat_answer": "small",
+    "place_description": "small",
+    "packing_list": "small",
+}
+
+
+def route_deployment(task: str) -> str:
+    """
+    Returns the deployment name for a task in MODEL_ROUTES.
+    Falls back to the large deployment when no small deployment is configured.
+    """
+    if MODEL_ROUTES.get(task, "large") == "small" and settings.AZURE_OPENAI_SMALL_DEPLOYMENT_NAME:
+        return settings.AZURE_OPENAI_SMALL_DEPLOYMENT_NAME
+    return settings.AZURE_OPENAI_DEPLOYMENT_NAME
+
+
+def _azure_search_data_source(role_information: str) -> Dict[str, Any]:
+    """
+    Returns the Azure AI Search data source used for RAG grounding.
+    """
+    return {
+        "type": "azure_search",
+        "parameters": {
+            "endpoint": f"{search_endpoint}",
+            "index_name": f"{search_index}",
+            "semantic_configuration": f"{semantic_config}",
+            "query_type": "semantic",
+            "fields_mapping": {},
+            "in_scope": True,
+            "role_information": role_information,
+            "filter": None,
+            "strictness": 3,
+            "top_n_documents": 5,
+            "authentication": {
+                "type": "api_key",
+                "key": f"{search_ai_key}"
+            }
+        }
+    }
+
+
+def _grounding(messages: List[Dict[str, str]], query: str, role_information: str) -> Dict[str, Any]:
+    """
+    Grounds a completion in our travel documents. With local retrieval the top snippets for `query`
+    are appended to the last user message (system prompts stay byte-stable) and no extra kwargs are
+    needed; otherwise returns the Azure Search data source kwargs.
+    """
+    if use_local_retrieval():
+        context = retrieve_context(query)
+        if context:
+            messages[-1] = {**messages[-1], "content": f"{messages[-1]['content']}\n\n{context}"}
+        return {}
+    return {"extra_body": {"data_sources": [_azure_search_data_source(role_information)]}}
+
+
+_token_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken when it is installed, otherwise estimates
+    (~4 ASCII characters per token, ~1 token per Hangul/CJK character).
+    """
+    global _token_encoding
+    if tiktoken is not None and _token_encoding is None:
+        try:
+            _token_encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken encoding unavailable, using estimate: {e}")
+            _token_encoding = False
+    if _token_encoding:
+        return len(_token_encoding.encode(text))
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+def _log_usage(call_name: str, model: str, started_at: float, completion=None, messages: Optional[List[Dict[str, str]]] = None, output_text: Optional[str] = None):
+    """
+    Logs prompt/completion token counts per OpenAI call. Uses the API usage block when present
+    and falls back to local counts (marked estimated) for streamed responses.
+    """
+    elapsed_ms = int((time.perf_counter() - started_at) * 1000)
+    usage = getattr(completion, "usage", None) if completion is not None else None
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+        logger.info(f"[openai] call={call_name} model={model} prompt_tokens={usage.prompt_tokens} "
+                    f"completion_tokens={usage.completion_tokens} cached_tokens={cached} elapsed_ms={elapsed_ms}")
+    else:
+        prompt_tokens = sum(count_tokens(m["content"]) for m in (messages or []))
+        completion_tokens = count_tokens(output_text or "")
+        logger.info(f"[openai] call={call_name} model={model} prompt_tokens~{prompt_tokens} "
+                    f"completion_tokens~{completion_tokens} elapsed_ms={elapsed_ms} (estimated)")
+
+
+PLAN_ENCODING_COLUMNS = ("id", "day", "order_in_day", "place_name", "time", "address", "description")
+PLAN_ENCODING_LEGEND = (
+    "한 줄에 일정 하나씩 `" + "|".join(PLAN_ENCODING_COLUMNS) + "` 순서로 제공됩니다. "
+    "time은 `시작~종료`(HH:MM), 값이 없으면 `-`입니다. 계획이 길면 뒤쪽 열(description, address, time)이 생략될 수 있습니다."
+)
+
+
+def _compact_value(value: Any, limit: Optional[int] = None) -> str:
+    if value is None or value == "":
+        return "-"
+    text = " ".join(str(value).replace("|", "/").split())
+    if limit and len(text) > limit:
+        text = text[:limit] + "…"
+    return text
+
+
+def encode_plan_compact(plan: List[Dict[str, Any]], columns: int = len(PLAN_ENCODING_COLUMNS)) -> str:
+    """
+    Encodes the itinerary as one pipe-separated line per item, keeping the first `columns` columns.
+    Much smaller than indented JSON, and deterministic so identical plans encode identically.
+    """
+    lines = []
+    for item in sorted(plan, key=lambda i: (i.get("day") or 0, i.get("order_in_day") or 0)):
+        row = [
+            _compact_value(item.get("id")),
+            _compact_value(item.get("day")),
+            _compact_value(item.get("order_in_day")),
+            _compact_value(item.get("place_name")),
+            f"{item.get('start_time') or '-'}~{item.get('end_time') or '-'}",
+            _compact_value(item.get("address")),
+            _compact_value(item.get("description"), limit=80),
+        ]
+        lines.append("|".join(row[:columns]))
+    return "\n".join(lines) if lines else "(일정 없음)"
+
+
+def fit_plan_to_budget(plan: List[Dict[str, Any]], fixed_tokens: int) -> str:
+    """
+    Returns the most detailed plan encoding that fits OPENAI_PROMPT_TOKEN_BUDGET
+    together with `fixed_tokens`, dropping trailing columns until it does.
+    """
+    budget = settings.OPENAI_PROMPT_TOKEN_BUDGET
+    for columns in range(len(PLAN_ENCODING_COLUMNS), 3, -1):
+        encoded = encode_plan_compact(plan, columns)
+        if fixed_tokens + count_tokens(encoded) <= budget:
+            if columns < len(PLAN_ENCODING_COLUMNS):
+                logger.info(f"[openai] plan trimmed to {columns} columns to fit {budget} token budget")
+            return encoded
+    logger.warning(f"[openai] plan exceeds {budget} token budget even with names only")
+    return encoded
+
+
 def clean_json_response(response_text: str) -> str:
     # 디버그 출력으로 문제 추적
-    print(f"[DEBUG] 원본 응답 시작 100자: {repr(response_text[:100])}")
+    logger.debug(f"원본 응답 시작 100자: {repr(response_text[:100])}")
     
     cleaned = response_text.strip()
     
@@ -28,35 +203,16 @@ def clean_json_response(response_text: str) -> str:
     
     cleaned = cleaned.strip()
     
-    print(f"[DEBUG] 정리된 응답 시작 100자: {repr(cleaned[:100])}")
+    logger.debug(f"정리된 응답 시작 100자: {repr(cleaned[:100])}")
     return cleaned
 
 
 
-def generate_trip_plan_with_gpt(trip_details: Dict[str, Any]) -> Dict[str, Any]:
+def _format_trip_info(trip_details: Dict[str, Any]) -> str:
     """
-    Generates a trip plan using Azure OpenAI GPT model, formatted for the new itinerary item structure.
+    Formats the trip parameters block shared by the plan generation prompts.
     """
-    client = AzureOpenAI(
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version="2024-02-01",
-    )
-
-
-    prompt_content = f"""
-당신은 상세한 여행 계획과 그에 따른 준비물 리스트를 생성하는 유용한 AI 비서입니다.
-다음 정보를 바탕으로 신뢰할 수 있는 RAG 데이터와 여행 DB를 활용해 시간대별 최적화된 포괄적인 여행 일정과 준비물 리스트를 생성해 주세요. 
-이동 동선은 효율적이며, 이동 시간과 거리도 최소화합니다.
-각 장소의 운영시간, 입장료, 그리고 1박 2일 이상의 일정에서는 숙소 체크인 시간(오후 3~4시 이후) 조건도 반드시 반영하세요.
-일정 내 여유시간과 식사 시간도 포함하세요.
-추천된 일정의 요약과 함께, 장소별로 방문 이유 및 추가 선택지(대체 맛집 혹은 활동)를 함께 기록하세요.
-만약 RAG 데이터 내 정보가 부족할 경우, 모델 자체 판단으로 적절한 일정을 생성하되, 사용자 요청과 최근 트렌드를 반영하세요.
-응답은 반드시 순수한 JSON 형식으로만 제공해야 합니다. 마크다운 코드 블록(```
-
-
-**여행 정보:**
-- 여행 제목: {trip_details.get('title', '미정')}
+    return f"""- 여행 제목: {trip_details.get('title', '미정')}
 - 기간: {trip_details.get('start_date')}부터 {trip_details.get('end_date')}까지
 - 목적지: {trip_details.get('destination_city', '')}, {trip_details.get('destination_country', '')}
 - 교통 방식: {trip_details.get('transport_method', '미정')}
@@ -64,15 +220,22 @@ def generate_trip_plan_with_gpt(trip_details: Dict[str, Any]) -> Dict[str, Any]:
 - 관심사: {', '.join(trip_details.get('interests', []))}
 - 여행 인원: {trip_details.get('member_count', '미정')}명
 - 동반자와의 관계: {trip_details.get('companion_relation', '미정')}
-- 최신 트렌드 반영 여부: {'예' if trip_details.get('trend') else '아니오'}
+- 최신 트렌드 반영 여부: {'예' if trip_details.get('trend') else '아니오'}"""
 
 
-**필수 JSON 출력 형식:**
-응답은 `itinerary`와 `packing_list`라는 두 개의 키를 가진 JSON 객체여야 합니다.
+TRIP_PLAN_SYSTEM_PROMPT = """You are an AI assistant that helps people create detailed travel itineraries. You must respond only with pure JSON format without any markdown code blocks (```json). Your response should be valid JSON that can be parsed directly.
 
+당신은 상세한 여행 계획을 생성하는 유용한 AI 비서입니다.
+사용자가 보내는 여행 정보를 바탕으로 신뢰할 수 있는 RAG 데이터와 여행 DB를 활용해 시간대별 최적화된 포괄적인 여행 일정을 생성해 주세요.
+이동 동선은 효율적이며, 이동 시간과 거리도 최소화합니다.
+각 장소의 운영시간, 입장료, 그리고 1박 2일 이상의 일정에서는 숙소 체크인 시간(오후 3~4시 이후) 조건도 반드시 반영하세요.
+일정 내 여유시간과 식사 시간도 포함하세요.
+추천된 일정의 요약과 함께, 장소별로 방문 이유 및 추가 선택지(대체 맛집 혹은 활동)를 함께 기록하세요.
+만약 RAG 데이터 내 정보가 부족할 경우, 모델 자체 판단으로 적절한 일정을 생성하되, 사용자 요청과 최근 트렌드를 반영하세요.
 
-`itinerary`의 값은 각 일정을 나타내는 객체들의 배열이어야 합니다.
-각 일정 객체는 다음 키를 포함해야 합니다:
+**필수 JSON 출력 형식:**
+응답은 `itinerary` 키를 가진 JSON 객체여야 합니다.
+`itinerary`의 값은 각 일정을 나타내는 객체들의 배열이며, 각 일정 객체는 다음 키를 포함해야 합니다:
 - `day`: (Integer) 몇일차인지 나타내는 숫자.
 - `order_in_day`: (Integer) 그날의 일정 순서 (1부터 시작).
 - `place_name`: (String) 장소의 이름.
@@ -81,155 +244,381 @@ def generate_trip_plan_with_gpt(trip_details: Dict[str, Any]) -> Dict[str, Any]:
 - `end_time`: (String) 일정이 끝나는 시간 (HH:MM 형식). 정보가 없으면 null.
 - `address`: (String) 장소의 정확하고 완전한 주소. 정보가 없으면 null.
 
+**JSON 예시:**
+{"itinerary": [{"day": 1, "order_in_day": 1, "place_name": "에펠탑", "description": "파리의 상징인 에펠탑을 방문하여 도시의 전경을 감상합니다.", "start_time": "09:00", "end_time": "11:00", "address": "Champ de Mars, 5 Av. Anatole France, 75007 Paris, France"}, {"day": 1, "order_in_day": 2, "place_name": "루브르 박물관", "description": "모나리자를 비롯한 세계적인 예술 작품들을 감상합니다.", "start_time": "12:00", "end_time": "15:00", "address": "Rue de Rivoli, 75001 Paris, France"}]}"""
 
-`packing_list`의 값은 여행에 필요한 준비물 항목들을 문자열로 나열한 배열이어야 합니다.
-`packing_list`의 값은 중복되는 내용 없이, 각각 한번씩만 포함하여야 합니다.
 
+def _retrieval_query(trip_details: Dict[str, Any], extra: str = "") -> str:
+    interests = " ".join(trip_details.get("interests") or [])
+    return f"{trip_details.get('destination_city', '')} {trip_details.get('destination_country', '')} {interests} {extra}".strip()
 
-**JSON 예시:**
-{{
-  "itinerary": [
-    {{
-      "day": 1,
-      "order_in_day": 1,
-      "place_name": "에펠탑",
-      "description": "파리의 상징인 에펠탑을 방문하여 도시의 전경을 감상합니다.",
-      "start_time": "09:00",
-      "end_time": "11:00",
-      "address": "Champ de Mars, 5 Av. Anatole France, 75007 Paris, France"
-    }},
-    {{
-      "day": 1,
-      "order_in_day": 2,
-      "place_name": "루브르 박물관",
-      "description": "모나리자를 비롯한 세계적인 예술 작품들을 감상합니다.",
-      "start_time": "12:00",
-      "end_time": "15:00",
-      "address": "Rue de Rivoli, 75001 Paris, France"
-    }}
-  ],
-  "packing_list": [
-    "여권",
-    "비자 (필요시)",
-    "항공권/E-티켓",
-    "숙소 예약 확인서",
-    "여행자 보험 증서",
-    "현금 (현지 통화)",
-    "신용카드",
-    "스마트폰 및 충전기",
-    "보조 배터리",
-    "국제 운전면허증 (필요시)",
-    "상비약",
-    "세면도구",
-    "갈아입을 옷",
-    "편한 신발",
-    "카메라",
-    "선글라스",
-    "모자",
-    "우산/우비",
-    "개인 위생용품",
-    "작은 가방 (데일리용)",
-    "여행용 어댑터/변환기"
-  ]
-}}
-"""
 
-
-    messages = [
-        {
-            "role": "system",
-            "content": "You are an AI assistant that helps people create detailed travel itineraries. You must respond only with pure JSON format without any markdown code blocks (```json). Your response should be valid JSON that can be parsed directly."
-        },
-        {
-            "role": "user",
-            "content": prompt_content
-        }
+def _build_trip_plan_messages(trip_details: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    Builds the chat messages for initial trip plan generation.
+    All static instructions live in the system message so the prefix is byte-stable for prompt caching.
+    """
+    return [
+        {"role": "system", "content": TRIP_PLAN_SYSTEM_PROMPT},
+        {"role": "user", "content": f"**여행 정보:**\n{_format_trip_info(trip_details)}"}
     ]
 
 
+def _trip_plan_completion_kwargs(messages: List[Dict[str, str]], trip_details: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the chat.completions.create arguments shared by the blocking and streaming plan calls.
+    """
+    return dict(
+        model=route_deployment("trip_plan"),
+        messages=messages,
+        max_tokens=3000, # Increased for potentially longer structured plans
+        temperature=0.7,
+        top_p=0.95,
+        response_format={"type": "json_object"}, # Enforce JSON output,
+        **_grounding(messages, _retrieval_query(trip_details), PLAN_ROLE_INFORMATION)
+    )
+
+
+def generate_trip_plan_with_gpt(trip_details: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generates a trip plan using Azure OpenAI GPT model, formatted for the new itinerary item structure.
+    """
+    messages = _build_trip_plan_messages(trip_details)
+
     try:
-        completion = client.chat.completions.create(
-            model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-            messages=messages,
-            max_tokens=3000, # Increased for potentially longer structured plans
-            temperature=0.7,
-            top_p=0.95,
-            response_format={"type": "json_object"}, # Enforce JSON output,
-            extra_body={
-                "data_sources": [{
-                    "type": "azure_search",
-                    "parameters": {
-                        "endpoint": f"{search_endpoint}",
-                        "index_name": f"{search_index}",
-                        "semantic_configuration": f"{semantic_config}",
-                        "query_type": "semantic",
-                        "fields_mapping": {},
-                        "in_scope": True,
-                        "role_information": "You are an AI assistant that helps people create detailed travel itineraries. You must respond only with pure JSON format without markdown code blocks.",
-                        "filter": None,
-                        "strictness": 3,
-                        "top_n_documents": 5,
-                        "authentication": {
-                            "type": "api_key",
-                            "key": f"{search_ai_key}"
-                        }
-                    }
-                }]
-            }
-        )
+        started_at = time.perf_counter()
+        completion = chat_completion(**_trip_plan_completion_kwargs(messages, trip_details))
+        _log_usage("trip_plan", route_deployment("trip_plan"), started_at, completion=completion)
         
         gpt_response_content = completion.choices[0].message.content
         
         # JSON 응답 정리
         cleaned_response = clean_json_response(gpt_response_content)
-        print(f"원본 응답 길이: {len(gpt_response_content)}")
-        print(f"정리 후 길이: {len(cleaned_response)}")
-        print(f"정리된 응답 시작: {cleaned_response[:100]}...")
+        logger.debug(f"원본 응답 길이: {len(gpt_response_content)}")
+        logger.debug(f"정리 후 길이: {len(cleaned_response)}")
+        logger.debug(f"정리된 응답 시작: {cleaned_response[:100]}...")
         
         parsed_plan = json.loads(cleaned_response)
         return parsed_plan
 
 
     except json.JSONDecodeError as je:
-        print(f"JSON parsing error: {je}")
-        print(f"Cleaned response: {cleaned_response[:500]}...")
+        logger.error(f"JSON parsing error: {je}")
+        logger.debug(f"Cleaned response: {cleaned_response[:500]}...")
         return {"error": f"Failed to parse JSON: {str(je)}", "itinerary": []}
     except Exception as e:
-        print(f"Error calling Azure OpenAI or parsing response: {e}")
+        logger.error(f"Error calling Azure OpenAI or parsing response: {e}")
         return {"error": f"Failed to generate plan: {str(e)}", "itinerary": []}
 
 
-def get_gpt_chat_response(trip_details: Dict[str, Any], current_plan: List[Dict[str, Any]], user_prompt: str) -> Dict[str, Any]:
+def stream_trip_plan_with_gpt(trip_details: Dict[str, Any], on_item: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
     """
-    Generates a chat response or a modified trip plan using Azure OpenAI GPT model.
+    Streams the trip plan completion and calls `on_item` for each itinerary item as soon as it is complete.
+    Returns the fully parsed plan (same shape as generate_trip_plan_with_gpt) once the stream ends.
+    """
+    messages = _build_trip_plan_messages(trip_details)
+    parser = IncrementalArrayParser("itinerary")
+    emitted = 0
+
+    try:
+        started_at = time.perf_counter()
+        stream = stream_chat_completion(**_trip_plan_completion_kwargs(messages, trip_details))
+        for chunk in stream:
+            # Azure sends prompt filter results and data source context in chunks without content.
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if not delta or not delta.content:
+                continue
+            for item in parser.feed(delta.content):
+                emitted += 1
+                if on_item:
+                    on_item(item)
+
+        _log_usage("trip_plan_stream", route_deployment("trip_plan"), started_at, messages=messages, output_text=parser.text)
+        cleaned_response = clean_json_response(parser.text)
+        parsed_plan = json.loads(cleaned_response)
+        logger.info(f"스트리밍 완료: 중간 전달 {emitted}개 / 전체 {len(parsed_plan.get('itinerary', []))}개 일정")
+        return parsed_plan
+
+    except json.JSONDecodeError as je:
+        logger.error(f"JSON parsing error in streamed plan: {je}")
+        return {"error": f"Failed to parse JSON: {str(je)}", "itinerary": []}
+    except Exception as e:
+        logger.error(f"Error streaming trip plan from Azure OpenAI: {e}")
+        return {"error": f"Failed to generate plan: {str(e)}", "itinerary": []}
+
+
+
+def trip_day_count(trip_details: Dict[str, Any]) -> int:
+    """
+    Returns the number of days in the trip (inclusive), or 1 if the dates are missing.
+    """
+    try:
+        start = date.fromisoformat(str(trip_details.get('start_date')))
+        end = date.fromisoformat(str(trip_details.get('end_date')))
+    except ValueError:
+        return 1
+    return max((end - start).days + 1, 1)
+
+
+TRIP_OUTLINE_SYSTEM_PROMPT = """You are an AI assistant that outlines multi-day travel itineraries. You must respond only with pure JSON format without markdown code blocks.
+
+사용자가 보내는 여행 정보를 바탕으로 전체 일정의 날짜별 개요만 먼저 작성해 주세요.
+각 날짜마다 동선의 중심 지역(area), 테마(theme), 방문할 핵심 장소 3~5곳(places)만 간단히 적고, 세부 시간표와 설명은 작성하지 마세요.
+같은 장소가 여러 날짜에 중복되지 않게 하고, 날짜별 동선이 가까운 지역끼리 묶이도록 배분하세요.
+
+**JSON 예시:**
+{"days": [{"day": 1, "area": "마레 지구", "theme": "역사 지구 산책", "places": ["보주 광장", "피카소 미술관", "퐁피두 센터"]}]}"""
+
+
+DAY_PLAN_SYSTEM_PROMPT = """You are an AI assistant that helps people create detailed travel itineraries. You must respond only with pure JSON format without markdown code blocks.
+
+당신은 여행 일정 중 하루의 상세 시간표를 작성하는 AI 비서입니다.
+사용자가 보내는 전체 개요 중 지정된 날짜의 일정만 시간대별로 상세하게 작성해 주세요.
+이동 동선은 효율적이며, 각 장소의 운영시간과 입장료를 반영하고, 식사 시간과 여유시간을 포함하세요.
+다른 날짜에 배정된 장소는 포함하지 마세요.
+
+**필수 JSON 출력 형식:**
+`itinerary` 키 하나를 가진 JSON 객체이며, 각 일정 객체는 `day`(지정된 날짜), `order_in_day`(1부터 시작), `place_name`, `description`, `start_time`(HH:MM 또는 null), `end_time`(HH:MM 또는 null), `address`(정확하고 완전한 주소 또는 null) 키를 포함해야 합니다."""
+
+
+def generate_trip_outline_with_gpt(trip_details: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generates a cheap day-level outline (area, theme, key places per day).
+    """
+    day_count = trip_day_count(trip_details)
+    messages = [
+        {"role": "system", "content": TRIP_OUTLINE_SYSTEM_PROMPT},
+        {"role": "user", "content": f"**여행 정보:**\n{_format_trip_info(trip_details)}\n\n총 {day_count}일 일정의 개요를 작성해 주세요."}
+    ]
+
+    try:
+        started_at = time.perf_counter()
+        completion = chat_completion(
+            model=route_deployment("trip_outline"),
+            messages=messages,
+            max_tokens=200 + 120 * day_count,
+            temperature=0.7,
+            top_p=0.95,
+            response_format={"type": "json_object"},
+        )
+        _log_usage("trip_outline", route_deployment("trip_outline"), started_at, completion=completion)
+        outline = json.loads(clean_json_response(completion.choices[0].message.content))
+        days = [d for d in outline.get("days", []) if isinstance(d, dict) and isinstance(d.get("day"), int)]
+        known = {d["day"] for d in days}
+        # Every trip day needs an outline entry, even if the model skipped one.
+        days += [{"day": day, "area": "", "theme": "", "places": []} for day in range(1, day_count + 1) if day not in known]
+        outline["days"] = sorted((d for d in days if 1 <= d["day"] <= day_count), key=lambda d: d["day"])
+        return outline
+    except Exception as e:
+        logger.error(f"Error generating trip outline: {e}")
+        return {"error": f"Failed to generate outline: {str(e)}", "days": []}
+
+
+def generate_day_plan_with_gpt(trip_details: Dict[str, Any], outline: Dict[str, Any], day: int) -> List[Dict[str, Any]]:
     """
-    client = AzureOpenAI(
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version="2024-02-01",
+    Generates the detailed itinerary for a single day of the outline.
+    """
+    day_count = trip_day_count(trip_details)
+    outline_lines = "\n".join(
+        f"- {d['day']}일차: {d.get('area', '')} / {d.get('theme', '')} / {', '.join(d.get('places', []))}"
+        for d in outline.get("days", [])
     )
+    day_outline = next((d for d in outline.get("days", []) if d.get("day") == day), {})
+    day_outline_places = [day_outline.get("area", "")] + list(day_outline.get("places", []))
+    day_notes = []
+    if day == 1 and day_count > 1:
+        day_notes.append("숙소 체크인(오후 3~4시 이후) 시간을 반영하세요.")
+    if day == day_count and day_count > 1:
+        day_notes.append("마지막 날이므로 귀가/출국 이동 시간을 고려해 여유 있게 마무리하세요.")
 
+    user_content = f"""**여행 정보:**
+{_format_trip_info(trip_details)}
 
-    prompt_content = f"""
-당신은 여행 계획을 돕는 AI 비서입니다. 현재 여행 계획과 사용자의 요청을 바탕으로 질문에 답변하거나 계획을 수정합니다.
-응답은 항상 순수한 JSON 형식으로 제공해야 합니다. 마크다운 코드 블록을 사용하지 마세요.
+**전체 개요:**
+{outline_lines}
 
+**작성할 날짜:** {day}일차 {' '.join(day_notes)}"""
 
-**현재 여행 정보:**
-- 여행 제목: {trip_details.get('title', '미정')}
-- 기간: {trip_details.get('start_date')}부터 {trip_details.get('end_date')}까지
-- 목적지: {trip_details.get('destination_city', '')}, {trip_details.get('destination_country', '')}
+    messages = [
+        {"role": "system", "content": DAY_PLAN_SYSTEM_PROMPT},
+        {"role": "user", "content": user_content}
+    ]
 
+    started_at = time.perf_counter()
+    completion = chat_completion(
+        model=route_deployment("day_plan"),
+        messages=messages,
+        max_tokens=1500,
+        temperature=0.7,
+        top_p=0.95,
+        response_format={"type": "json_object"},
+        **_grounding(messages, _retrieval_query(trip_details, " ".join(day_outline_places)), PLAN_ROLE_INFORMATION)
+    )
+    _log_usage(f"day_plan[{day}]", route_deployment("day_plan"), started_at, completion=completion)
+    parsed = json.loads(clean_json_response(completion.choices[0].message.content))
+    return parsed.get("itinerary", [])
 
-**현재 여행 계획 (Itinerary):**
-{json.dumps(current_plan, indent=2, ensure_ascii=False)}
+
+def _normalize_hhmm(value: Any) -> Optional[str]:
+    """
+    Returns a valid HH:MM string or None.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip(), '%H:%M').strftime('%H:%M')
+    except ValueError:
+        return None
 
 
-**사용자 요청:**
-"{user_prompt}"
+def validate_day_items(day: int, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Validates one day's items: drops entries without a place name, pins `day`,
+    fixes times, sorts and renumbers `order_in_day` consecutively from 1.
+    """
+    valid = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not str(item.get('place_name') or '').strip():
+            continue
+        valid.append((position, {
+            "day": day,
+            "order_in_day": item.get('order_in_day') if isinstance(item.get('order_in_day'), int) else position + 1,
+            "place_name": str(item['place_name']).strip(),
+            "description": item.get('description'),
+            "start_time": _normalize_hhmm(item.get('start_time')),
+            "end_time": _normalize_hhmm(item.get('end_time')),
+            "address": item.get('address'),
+        }))
+
+    # The model's own ordering wins; start time and position only break ties or duplicates.
+    valid.sort(key=lambda p: (p[1]['order_in_day'], p[1]['start_time'] or '99:99', p[0]))
+    result = []
+    for order, (_, item) in enumerate(valid, start=1):
+        item['order_in_day'] = order
+        result.append(item)
+    return result
+
+
+def generate_trip_plan_parallel(trip_details: Dict[str, Any], on_item: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Generates a trip plan as an outline followed by concurrent per-day completions.
+    `on_item` is called from the calling thread for each validated item as soon as its day completes,
+    so total latency follows the slowest day instead of the trip length. Failed days are retried once;
+    if any day still fails, an error is returned instead of a plan with missing days.
+    """
+    outline = generate_trip_outline_with_gpt(trip_details)
+    if outline.get("error") or not outline.get("days"):
+        return {"error": outline.get("error", "Outline has no days"), "itinerary": []}
+
+    itinerary_by_day: Dict[int, List[Dict[str, Any]]] = {}
+
+    def generate_days(days: List[int]) -> List[int]:
+        failed_days = []
+        with ThreadPoolExecutor(max_workers=min(settings.TRIP_PLAN_PARALLEL_MAX_WORKERS, len(days))) as executor:
+            # Each day runs in a copy of the caller's context so its llm_priority applies to the workers too.
+            futures = {
+                executor.submit(contextvars.copy_context().run, generate_day_plan_with_gpt, trip_details, outline, day): day
+                for day in days
+            }
+            for future in as_completed(futures):
+                day = futures[future]
+                try:
+                    items = validate_day_items(day, future.result())
+                except Exception as e:
+                    logger.error(f"Error generating plan for day {day}: {e}")
+                    failed_days.append(day)
+                    continue
+                itinerary_by_day[day] = items
+                if on_item:
+                    for item in items:
+                        on_item(item)
+        return sorted(failed_days)
+
+    failed_days = generate_days([d["day"] for d in outline["days"]])
+    if failed_days:
+        logger.warning(f"병렬 일정 생성: {failed_days}일차 생성 실패, 재시도합니다.")
+        failed_days = generate_days(failed_days)
+    if failed_days:
+        return {"error": f"Failed to generate days {failed_days}", "itinerary": []}
+
+    merged = [item for day in sorted(itinerary_by_day) for item in itinerary_by_day[day]]
+    return {"itinerary": merged}
+
+
+PACKING_LIST_SYSTEM_PROMPT = """You are an AI assistant that writes travel packing lists. You must respond only with pure JSON format without markdown code blocks.
+
+사용자가 보내는 여행 조건(목적지, 출발 월, 기간, 교통 방식, 숙박)에 맞는 준비물 리스트를 작성해 주세요.
+해당 시기 목적지의 기후와 날씨, 여행 기간, 교통 방식과 숙박 형태를 반영하세요.
+각 항목은 짧은 이름으로만 적고, 같은 물건이 중복되지 않게 하세요.
 
+**JSON 예시:**
+{"packing_list": ["여권", "항공권/E-티켓", "여행자 보험 증서", "현금 (현지 통화)", "신용카드", "스마트폰 및 충전기", "보조 배터리", "상비약", "세면도구", "편한 신발", "우산/우비", "여행용 어댑터/변환기"]}"""
 
-**지시사항:**
+
+def generate_packing_list_with_gpt(profile: Dict[str, Any]) -> List[str]:
+    """
+    Generates a packing list for a packing profile (see app.crud.packing_template.packing_profile)
+    with a small, separate completion. Returns [] on failure so a plan never fails over its packing list.
+    """
+    user_content = f"""**여행 조건:**
+- 목적지: {profile.get('destination_city') or ''}, {profile.get('destination_country') or ''}
+- 출발 월: {profile.get('month') or '미정'}월
+- 기간: {profile.get('length') or '미정'}일
+- 교통 방식: {profile.get('transport_method') or '미정'}
+- 숙박: {profile.get('accommodation') or '미정'}"""
+    messages = [
+        {"role": "system", "content": PACKING_LIST_SYSTEM_PROMPT},
+        {"role": "user", "content": user_content}
+    ]
+
+    try:
+        started_at = time.perf_counter()
+        completion = chat_completion(
+            model=route_deployment("packing_list"),
+            messages=messages,
+            max_tokens=400,
+            temperature=0.3,
+            response_format={"type": "json_object"},
+        )
+        _log_usage("packing_list", route_deployment("packing_list"), started_at, completion=completion)
+        parsed = json.loads(clean_json_response(completion.choices[0].message.content))
+        return [str(item).strip() for item in parsed.get("packing_list", []) if str(item or "").strip()]
+    except Exception as e:
+        logger.error(f"Error generating packing list: {e}")
+        return []
+
+CHAT_EDIT_INSTRUCTIONS = {
+    "operations": """**지시사항:**
+1.  **질문/대화:** 사용자의 요청이 질문(정보성 질문 포함)이거나 일반적인 대화인 경우, `notes` 필드에만 답변을 포함하고 `operations` 필드는 생략한 JSON을 반환하세요.
+2.  **계획 수정:** 사용자의 요청이 계획 수정을 요구하는 것이라면, 전체 계획을 다시 쓰지 말고 현재 계획에 적용할 **변경 작업 목록만** `operations` 필드에 담고, `notes` 필드에 변경 사항 요약을 담아 응답하세요. 작업은 순서대로 적용되며, 기존 일정은 반드시 현재 계획의 `id`로 지정합니다.
+    - `{"op": "move", "id": 일정 id, "day": 옮길 날짜, "order_in_day": 그날의 새 순서}`
+    - `{"op": "insert", "day": 날짜, "order_in_day": 순서, "item": {"place_name": ..., "description": ..., "start_time": "HH:MM" 또는 null, "end_time": "HH:MM" 또는 null, "address": 정확하고 완전한 주소 또는 null}}`
+    - `{"op": "delete", "id": 일정 id}`
+    - `{"op": "update", "id": 일정 id, "fields": {바뀌는 필드만: place_name, description, start_time, end_time, address}}`
+3.  순서 변경으로 밀리는 다른 일정의 `order_in_day`는 서버가 자동으로 다시 매기므로 별도 작업이 필요 없습니다.
+
+
+**JSON 응답 예시:**
+
+
+*   **질문/대화:**
+    {
+      "notes": "첫째 날 일정은 에펠탑 방문과 루브르 박물관 관람입니다."
+    }
+
+
+*   **계획 수정:**
+    {
+      "operations": [
+        {"op": "move", "id": 12, "day": 2, "order_in_day": 1},
+        {"op": "insert", "day": 1, "order_in_day": 3, "item": {"place_name": "르 프로코프", "description": "파리에서 가장 오래된 카페에서 저녁 식사를 합니다.", "start_time": "18:00", "end_time": "19:30", "address": "13 Rue de l'Ancienne Comédie, 75006 Paris, France"}}
+      ],
+      "notes": "[사용자 요청에 대한 계획 수정 요약]"
+    }
+""",
+    "full": """**지시사항:**
 1.  **질문/대화:** 사용자의 요청이 질문(정보성 질문 포함)이거나 일반적인 대화인 경우, `notes` 필드에만 답변을 포함하고 `itinerary` 필드는 생략한 JSON을 반환하세요.
 2.  **계획 수정:** 사용자의 요청이 계획 수정을 요구하는 것이라면(예: "에펠탑 일정을 둘째 날로 옮겨줘", "저녁 식사 메뉴를 추가해줘"), `itinerary` 필드를 수정하여 **완전히 새로운 전체 계획**을 반영하고, `notes` 필드에 변경 사항에 대한 요약을 담아 응답하세요.
 3.  `itinerary` 배열의 각 객체는 `day`, `order_in_day`, `place_name`, `description`, `start_time`, `end_time` 키를 포함해야 합니다. **또한, 각 장소에 대해 정확하고 완전한 주소를 `address` 필드에 포함해야 합니다.** 정보가 없으면 `null`로 설정하세요.
@@ -239,80 +628,133 @@ def get_gpt_chat_response(trip_details: Dict[str, Any], current_plan: List[Dict[
 
 
 *   **질문/대화:**
-    {{
+    {
       "notes": "첫째 날 일정은 에펠탑 방문과 루브르 박물관 관람입니다."
-    }}
+    }
 
 
 *   **계획 수정:**
-    {{
-    "itinerary": [
-        {{
-        "day": 1,
-        "order_in_day": 1,
-        "place_name": "에펠탑",
-        "description": "파리의 상징인 에펠탑을 방문하여 도시의 전경을 감상합니다.",
-        "start_time": "09:00",
-        "end_time": "11:00",
-        "address": "Champ de Mars, 5 Av. Anatole France, 75007 Paris, France"
-        }},
-        {{
-        "day": 1,
-        "order_in_day": 2,
-        "place_name": "루브르 박물관",
-        "description": "모나리자를 비롯한 세계적인 예술 작품들을 감상합니다.",
-        "start_time": "12:00",
-        "end_time": "15:00",
-        "address": "Rue de Rivoli, 75001 Paris, France"
-        }}
-    ],
-    "notes": "[사용자 요청에 대한 계획 수정 요약]"
-    }}
+    {
+      "itinerary": [
+        {"day": 1, "order_in_day": 1, "place_name": "에펠탑", "description": "파리의 상징인 에펠탑을 방문하여 도시의 전경을 감상합니다.", "start_time": "09:00", "end_time": "11:00", "address": "Champ de Mars, 5 Av. Anatole France, 75007 Paris, France"},
+        {"day": 1, "order_in_day": 2, "place_name": "루브르 박물관", "description": "모나리자를 비롯한 세계적인 예술 작품들을 감상합니다.", "start_time": "12:00", "end_time": "15:00", "address": "Rue de Rivoli, 75001 Paris, France"}
+      ],
+      "notes": "[사용자 요청에 대한 계획 수정 요약]"
+    }
+""",
+}
+
+
+CHAT_EDIT_INSTRUCTIONS["answer"] = """**지시사항:**
+1.  사용자의 질문이나 대화에 현재 여행 계획과 여행 정보를 참고하여 `notes` 필드에 간결하게 답변하세요. 계획은 수정하지 않습니다.
+2.  사용자의 요청이 실제로는 계획 수정(일정 추가, 삭제, 이동, 시간 변경 등)을 요구한다면 답변하지 말고 `{"needs_edit": true}`만 반환하세요.
+3.  답변이 이 여행의 계획이나 일행과 무관하게 목적지에 대한 일반 정보(운영 시간, 입장료, 교통, 역사 등)라면 `"general": true`를, 현재 계획이나 이 여행에 따라 달라지는 답변이라면 `"general": false`를 함께 포함하세요.
+
+
+**JSON 응답 예시:**
+    {
+      "notes": "첫째 날 일정은 에펠탑 방문과 루브르 박물관 관람입니다.",
+      "general": false
+    }
 """
 
+CHAT_MAX_TOKENS = {"operations": 1000, "full": 3000, "answer": 600}
 
+
+CHAT_SYSTEM_PREFIX = """You are an AI assistant that helps with travel plans, answering questions and modifying existing itineraries based on user requests. You always respond in pure JSON format without markdown code blocks. Ensure all itinerary items include a precise and complete address in the 'address' field.
+
+당신은 여행 계획을 돕는 AI 비서입니다. 현재 여행 계획과 사용자의 요청을 바탕으로 질문에 답변하거나 계획을 수정합니다.
+응답은 항상 순수한 JSON 형식으로 제공해야 합니다. 마크다운 코드 블록을 사용하지 마세요.
+
+**현재 여행 계획 형식:**
+""" + PLAN_ENCODING_LEGEND + """
+
+"""
+
+# One byte-stable system prompt per edit format so provider prompt caching applies across calls.
+CHAT_SYSTEM_PROMPTS = {edit_format: CHAT_SYSTEM_PREFIX + instructions for edit_format, instructions in CHAT_EDIT_INSTRUCTIONS.items()}
+
+# Stems that almost always mean the user wants the itinerary changed / is only asking something.
+CHAT_EDIT_KEYWORDS = ("바꿔", "바꾸", "변경", "수정", "추가", "넣어", "빼", "삭제", "지워", "제거", "옮겨", "이동시", "대신", "교체", "늦춰", "당겨", "미뤄", "조정", "다시 짜")
+CHAT_QUESTION_KEYWORDS = ("?", "뭐", "무엇", "어디", "언제", "얼마", "어때", "어떤", "어떻게", "몇", "알려", "설명", "있어", "있나")
+
+CHAT_INTENT_SYSTEM_PROMPT = """Classify a travel planner chat message. Reply with exactly one word:
+edit - the user wants the itinerary changed (add, remove, move, reschedule or replace places)
+question - anything else (questions, recommendations without changing the plan, small talk)"""
+
+
+def classify_chat_intent(user_prompt: str) -> str:
+    """
+    Decides whether a chat prompt is an itinerary "edit" or a "question".
+    Clear-cut prompts are decided by keyword; only ambiguous ones cost a small-model call.
+    Errors fall back to "edit", which is always able to answer as well.
+    """
+    text = user_prompt.strip()
+    if any(keyword in text for keyword in CHAT_EDIT_KEYWORDS):
+        return "edit"
+    if any(keyword in text for keyword in CHAT_QUESTION_KEYWORDS):
+        return "question"
+
+    deployment = route_deployment("chat_intent")
+    try:
+        started_at = time.perf_counter()
+        completion = chat_completion(
+            model=deployment,
+            messages=[
+                {"role": "system", "content": CHAT_INTENT_SYSTEM_PROMPT},
+                {"role": "user", "content": text}
+            ],
+            max_tokens=3,
+            temperature=0,
+        )
+        _log_usage("chat_intent", deployment, started_at, completion=completion)
+        answer = (completion.choices[0].message.content or "").strip().lower()
+        return "question" if answer.startswith("question") else "edit"
+    except Exception as e:
+        logger.error(f"Error classifying chat intent: {e}")
+        return "edit"
+
+
+def get_gpt_chat_response(trip_details: Dict[str, Any], current_plan: List[Dict[str, Any]], user_prompt: str, edit_format: str = "operations") -> Dict[str, Any]:
+    """
+    Generates a chat response or a modified trip plan using Azure OpenAI GPT model.
+    With edit_format="operations" modifications come back as `operations` (see app.services.itinerary_ops)
+    so output size follows the edit, not the plan; edit_format="full" returns the complete new `itinerary`.
+    edit_format="answer" runs on the small deployment and only answers; it returns `needs_edit: true`
+    instead when the request turns out to ask for a plan change.
+    """
+    plan_header = f"""**현재 여행 정보:**
+- 여행 제목: {trip_details.get('title', '미정')}
+- 기간: {trip_details.get('start_date')}부터 {trip_details.get('end_date')}까지
+- 목적지: {trip_details.get('destination_city', '')}, {trip_details.get('destination_country', '')}
+
+**현재 여행 계획:**
+"""
+    request_block = f'\n\n**사용자 요청:**\n"{user_prompt}"'
+    system_content = CHAT_SYSTEM_PROMPTS[edit_format]
     messages = [
-        {
-            "role": "system",
-            "content": "You are an AI assistant that helps with travel plans, answering questions and modifying existing itineraries based on user requests. You always respond in pure JSON format without markdown code blocks. Ensure all itinerary items include a precise and complete address in the 'address' field."
-        },
-        {
-            "role": "user",
-            "content": prompt_content
-        }
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": request_block}
     ]
-
+    # Ground first, so the retrieved snippets appended to the request count against the token budget.
+    grounding = _grounding(messages, _retrieval_query(trip_details, user_prompt), PLAN_ROLE_INFORMATION)
+    fixed_tokens = count_tokens(system_content) + count_tokens(plan_header) + count_tokens(messages[-1]["content"])
+    plan_block = fit_plan_to_budget(current_plan, fixed_tokens)
+    messages[-1] = {"role": "user", "content": plan_header + plan_block + messages[-1]["content"]}
+    deployment = route_deployment("chat_answer" if edit_format == "answer" else "chat_edit")
 
     try:
-        completion = client.chat.completions.create(
-            model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
+        started_at = time.perf_counter()
+        completion = chat_completion(
+            model=deployment,
             messages=messages,
-            max_tokens=3000,
+            max_tokens=CHAT_MAX_TOKENS[edit_format],
             temperature=0.7,
             top_p=0.95,
             response_format={"type": "json_object"},
-            extra_body={
-                "data_sources": [{
-                    "type": "azure_search",
-                    "parameters": {
-                        "endpoint": f"{search_endpoint}",
-                        "index_name": f"{search_index}",
-                        "semantic_configuration": f"{semantic_config}",
-                        "query_type": "semantic",
-                        "fields_mapping": {},
-                        "in_scope": True,
-                        "role_information": "You are an AI assistant that helps people create detailed travel itineraries. You must respond only with pure JSON format without markdown code blocks.",
-                        "filter": None,
-                        "strictness": 3,
-                        "top_n_documents": 5,
-                        "authentication": {
-                            "type": "api_key",
-                            "key": f"{search_ai_key}"
-                        }
-                    }
-                }]
-            }
+            **grounding
         )
+        _log_usage(f"chat[{edit_format}]", deployment, started_at, completion=completion)
         
         gpt_response_content = completion.choices[0].message.content
         
@@ -323,79 +765,143 @@ def get_gpt_chat_response(trip_details: Dict[str, Any], current_plan: List[Dict[
 
 
     except json.JSONDecodeError as je:
-        print(f"JSON parsing error in chat response: {je}")
+        logger.error(f"JSON parsing error in chat response: {je}")
         return {"error": f"Failed to parse JSON: {str(je)}", "notes": "죄송합니다, 응답 처리 중 오류가 발생했습니다.", "itinerary": current_plan}
     except Exception as e:
-        print(f"Error calling Azure OpenAI for chat or parsing response: {e}")
+        logger.error(f"Error calling Azure OpenAI for chat or parsing response: {e}")
         return {"error": f"Failed to get chat response: {str(e)}", "notes": "죄송합니다, GPT와 통신하는 중 오류가 발생했습니다.", "itinerary": current_plan}
 
 
-def get_gpt_place_description(place_name: str) -> str:
-    """
-    Generates a detailed description for a given place name using Azure OpenAI GPT model.
-    """
-    client = AzureOpenAI(
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version="2024-02-01",
+def get_text_embeddings(texts: List[str]) -> List[List[float]]:
+    """Embeds texts with the embedding deployment (AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME)."""
+    deployment = settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME
+    started_at = time.perf_counter()
+    response = create_embeddings(model=deployment, input=texts)
+    logger.info(
+        f"[openai] call=embeddings model={deployment} inputs={len(texts)} "
+        f"prompt_tokens={getattr(response.usage, 'prompt_tokens', None)} elapsed_ms={int((time.perf_counter() - started_at) * 1000)}"
     )
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
 
 
-    prompt_content = f"""
-    "{place_name}"에 대한 상세한 설명을 생성해 주세요. 내용은 RAG를 참고하되, 참고할 내용이 없다면 직접 생성해서 추가해주세요. 이 장소의 역사, 중요성, 방문객이 즐길 수 있는 활동, 주변 명소 등을 포함하여 풍부하고 유익한 정보를 제공해 주세요.
-    응답은 다른 말 없이 설명 텍스트만 포함해야 합니다.
-    """
+PLACE_DESCRIPTION_SYSTEM_PROMPT = """You are a helpful AI assistant that provides detailed descriptions of tourist attractions. You must respond only with the descriptive text.
+
+사용자가 보내는 장소에 대한 상세한 설명을 생성해 주세요. 내용은 RAG를 참고하되, 참고할 내용이 없다면 직접 생성해서 추가해주세요. 이 장소의 역사, 중요성, 방문객이 즐길 수 있는 활동, 주변 명소 등을 포함하여 풍부하고 유익한 정보를 제공해 주세요.
+응답은 다른 말 없이 설명 텍스트만 포함해야 합니다."""
 
 
+def get_gpt_place_description(place_name: str, language: str = "ko") -> Optional[str]:
+    """
+    Generates a detailed description for a given place name using Azure OpenAI GPT model.
+    Returns None on failure so callers never store an error message as the description.
+    """
+    user_content = f'"{place_name}"'
+    if language != "ko":
+        user_content += f"\n\n응답 언어: {language}"
     messages = [
-        {
-            "role": "system",
-            "content": "You are a helpful AI assistant that provides detailed descriptions of tourist attractions. You must respond only with the descriptive text."
-        },
-        {
-            "role": "user",
-            "content": prompt_content
-        }
+        {"role": "system", "content": PLACE_DESCRIPTION_SYSTEM_PROMPT},
+        {"role": "user", "content": user_content}
     ]
 
-
     try:
-        completion = client.chat.completions.create(
-            model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
+        started_at = time.perf_counter()
+        completion = chat_completion(
+            model=route_deployment("place_description"),
             messages=messages,
             max_tokens=500,
             temperature=0.7,
             top_p=0.95,
-            extra_body={
-                "data_sources": [{
-                    "type": "azure_search",
-                    "parameters": {
-                        "endpoint": f"{search_endpoint}",
-                        "index_name": f"{search_index}",
-                        "semantic_configuration": f"{semantic_config}",
-                        "query_type": "semantic",
-                        "fields_mapping": {},
-                        "in_scope": True,
-                        "role_information": "You are an AI assistant that helps people create detailed travel itineraries. You must respond only with descriptive text.",
-                        "filter": None,
-                        "strictness": 3,
-                        "top_n_documents": 5,
-                        "authentication": {
-                            "type": "api_key",
-                            "key": f"{search_ai_key}"
-                        }
-                    }
-                }]
-            }
+            **_grounding(messages, place_name, DESCRIPTION_ROLE_INFORMATION)
         )
+        _log_usage("place_description", route_deployment("place_description"), started_at, completion=completion)
         
         description = completion.choices[0].message.content
-        return description.strip()
+        return description.strip() if description else None
 
 
     except Exception as e:
-        print(f"Error calling Azure OpenAI for place description: {e}")
-        return "상세 정보를 생성하는 중 오류가 발생했습니다."
+        logger.error(f"Error calling Azure OpenAI for place description: {e}")
+        return None
+
+
+PLACE_DESCRIPTION_BATCH_SYSTEM_PROMPT = """You are a helpful AI assistant that provides detailed descriptions of tourist attractions. You must respond only with pure JSON format without markdown code blocks.
+
+사용자가 번호와 함께 보내는 여러 장소 각각에 대한 상세한 설명을 생성해 주세요. 내용은 RAG를 참고하되, 참고할 내용이 없다면 직접 생성해서 추가해주세요. 각 장소의 역사, 중요성, 방문객이 즐길 수 있는 활동, 주변 명소 등을 포함하여 풍부하고 유익한 정보를 4~6문장으로 제공해 주세요.
+응답은 `descriptions` 키 하나를 가진 JSON 객체이며, 받은 순서대로 각 장소마다 `{"index": 장소 번호, "description": 설명 텍스트}` 객체를 하나씩 포함해야 합니다."""
+
+PLACE_DESCRIPTION_TOKENS_PER_ITEM = 400
+
+
+def _stream_place_description_batch(batch: List[Tuple[int, str]], language: str, emit: Callable[[int, str], None]):
+    """Streams one batched description completion, emitting (index, description) as each object closes."""
+    lines = "\n".join(f"{index}. {name}" for index, name in batch)
+    if language != "ko":
+        lines += f"\n\n응답 언어: {language}"
+    messages = [
+        {"role": "system", "content": PLACE_DESCRIPTION_BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": lines}
+    ]
+    deployment = route_deployment("place_description")
+    valid_indexes = {index for index, _ in batch}
+    parser = IncrementalArrayParser("descriptions")
+
+    started_at = time.perf_counter()
+    for chunk in stream_chat_completion(
+        model=deployment,
+        messages=messages,
+        max_tokens=PLACE_DESCRIPTION_TOKENS_PER_ITEM * len(batch),
+        temperature=0.7,
+        top_p=0.95,
+        response_format={"type": "json_object"},
+        **_grounding(messages, " ".join(name for _, name in batch), PLAN_ROLE_INFORMATION)
+    ):
+        if not chunk.choices:
+            continue
+        for entry in parser.feed(chunk.choices[0].delta.content or ""):
+            index, description = entry.get("index"), str(entry.get("description") or "").strip()
+            if index in valid_indexes and description:
+                emit(index, description)
+    _log_usage(f"place_description_batch[{len(batch)}]", deployment, started_at, messages=messages, output_text=parser.text)
+
+
+def generate_place_descriptions_batch(place_names: List[str], on_description: Optional[Callable[[int, str], None]] = None, language: str = "ko") -> Dict[int, str]:
+    """
+    Generates descriptions for many places with a few batched, streamed completions instead of one call per place.
+    Places are split into batches of PLACE_DESCRIPTION_BATCH_SIZE that run in parallel; `on_description(position, text)`
+    is called in the calling thread as each description arrives. Returns {position in place_names: description};
+    places missing from the result failed and can be retried individually.
+    """
+    if not place_names:
+        return {}
+    indexed = list(enumerate(place_names))
+    size = max(settings.PLACE_DESCRIPTION_BATCH_SIZE, 1)
+    batches = [indexed[i:i + size] for i in range(0, len(indexed), size)]
+
+    # Workers only parse; results are handed to the calling thread, which owns the DB session.
+    results: "queue.Queue[Tuple[str, Any, Any]]" = queue.Queue()
+
+    def run(batch):
+        try:
+            _stream_place_description_batch(batch, language, lambda index, text: results.put(("item", index, text)))
+        except Exception as e:
+            logger.error(f"Error generating place description batch: {e}")
+        finally:
+            results.put(("done", None, None))
+
+    descriptions: Dict[int, str] = {}
+    with ThreadPoolExecutor(max_workers=min(settings.TRIP_PLAN_PARALLEL_MAX_WORKERS, len(batches))) as executor:
+        for batch in batches:
+            executor.submit(contextvars.copy_context().run, run, batch)
+        pending = len(batches)
+        while pending:
+            kind, index, text = results.get()
+            if kind == "done":
+                pending -= 1
+            elif index not in descriptions:
+                descriptions[index] = text
+                if on_description:
+                    on_description(index, text)
+    return descriptions
 
 
 def generate_diary_image_url(title: str, content: str) -> str:
@@ -407,15 +913,9 @@ def generate_diary_image_url(title: str, content: str) -> str:
 
 
     try:
-        client = AzureOpenAI(
-            api_key=settings.AZURE_DALL_E_API_KEY,
-            api_version=settings.AZURE_DALL_E_API_VERSION,
-            azure_endpoint=settings.AZURE_DALL_E_ENDPOINT,
-        )
-        
         prompt = f"A beautiful and emotional diary illustration about '{title}'. Scene: {content}. in a warm, watercolor style."
         
-        response = client.images.generate(
+        response = generate_image(
             model=settings.AZURE_DALL_E_DEPLOYMENT_NAME,
             prompt=prompt,
             size="1024x1024",
@@ -431,6 +931,6 @@ def generate_diary_image_url(title: str, content: str) -> str:
 
 
     except Exception as e:
-        print(f"DALL-E 3 API error: {str(e)}")
+        logger.error(f"DALL-E 3 API error: {str(e)}")
         # Re-raise the exception to be handled by the caller
         raise e
\ No newline at end of file
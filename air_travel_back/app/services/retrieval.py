@@ -0,0 +1,219 @@
+"""
+Local retrieval over our travel documents, used instead of attaching an Azure Search data source to every completion.
+
+The index is built offline by `python -m app.services.retrieval_ingest` into RETRIEVAL_INDEX_DIR:
+    index.faiss   inner-product index over L2-normalized chunk embeddings (row i = chunk i)
+    chunks.json   [{"source": ..., "title": ..., "text": ...}, ...]
+    meta.json     {"embedder": "hashing" | "azure", "dim": ..., "chunks": ...}
+Queries must be embedded with the same embedder the index was built with, so it is read from meta.json.
+A re-ingested index is picked up by running processes without a restart (see LocalRetriever).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+META_FILE = "meta.json"
+
+
+class HashingEmbedder:
+    """
+    Deterministic, dependency-free embedder: word and character n-grams hashed into a fixed-size
+    vector. Good enough for keyword-heavy travel snippets and lets the whole pipeline run offline.
+    """
+    name = "hashing"
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        text = " ".join(text.casefold().split())
+        words = re.findall(r"\w+", text)
+        features = [f"w:{word}" for word in words]
+        compact = text.replace(" ", "")
+        features += [f"c:{compact[i:i + 3]}" for i in range(max(len(compact) - 2, 0))]
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.md5(feature.encode("utf-8")).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return _normalize(vectors)
+
+
+class AzureEmbedder:
+    """Embeds with the Azure OpenAI embedding deployment."""
+    name = "azure"
+
+    def __init__(self, batch_size: int = 64):
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        from app.services.openai import get_text_embeddings  # avoid a cycle: openai.py uses this module
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(get_text_embeddings(texts[start:start + self.batch_size]))
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def get_embedder(name: str, dim: Optional[int] = None):
+    if name == "azure":
+        return AzureEmbedder()
+    if name == "hashing":
+        return HashingEmbedder(dim or 1024)
+    raise ValueError(f"Unknown retrieval embedder: {name}")
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identity of a file on disk; os.replace gives a renamed-in file a new inode."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class _RetrievalSnapshot(NamedTuple):
+    index: faiss.Index
+    chunks: List[Dict[str, Any]]
+    embedder: Any
+    signature: Optional[Tuple[int, int, int]]
+
+
+class LocalRetriever:
+    """
+    Top-k search over an index directory written by the ingester. Loaded lazily, safe to share across threads.
+    Each search stats index.faiss (renamed into place last by the ingester) and loads the files again when
+    it has been replaced; searches already running keep the snapshot they started with.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_RetrievalSnapshot] = None
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(os.path.join(self.index_dir, INDEX_FILE))
+
+    def _read(self, signature) -> _RetrievalSnapshot:
+        with open(os.path.join(self.index_dir, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(self.index_dir, CHUNKS_FILE), encoding="utf-8") as f:
+            chunks = json.load(f)
+        index = faiss.read_index(os.path.join(self.index_dir, INDEX_FILE))
+        if index.ntotal != len(chunks) or _file_signature(os.path.join(self.index_dir, INDEX_FILE)) != signature:
+            raise RuntimeError("retrieval index was replaced while loading")
+        return _RetrievalSnapshot(index, chunks, get_embedder(meta["embedder"], meta.get("dim")), signature)
+
+    def _current(self) -> _RetrievalSnapshot:
+        snapshot = self._snapshot
+        signature = _file_signature(os.path.join(self.index_dir, INDEX_FILE))
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.signature == signature:
+                return snapshot
+            try:
+                loaded = self._read(signature)
+            except Exception as e:
+                # Mid-ingest or unreadable: keep serving the previous index until the next search.
+                if snapshot is None:
+                    raise
+                logger.warning(f"Keeping the current local retrieval index: {e}")
+                return snapshot
+            self._snapshot = loaded
+            logger.info(f"Loaded local retrieval index: {len(loaded.chunks)} chunks "
+                        f"({loaded.embedder.name}, dim={loaded.index.d})")
+            return loaded
+
+    def search(self, query: str, k: int = 4, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        if not query.strip():
+            return []
+        snapshot = self._current()
+        vector = snapshot.embedder.embed([query])
+        scores, ids = snapshot.index.search(vector, k)
+        results = []
+        for score, chunk_id in zip(scores[0], ids[0]):
+            if chunk_id < 0 or score < min_score:
+                continue
+            results.append({**snapshot.chunks[chunk_id], "score": float(score)})
+        return results
+
+
+def format_snippets(snippets: List[Dict[str, Any]], max_chars: int) -> str:
+    """Renders retrieved chunks as a reference block for the user message, trimmed to max_chars."""
+    lines = []
+    used = 0
+    for i, snippet in enumerate(snippets, start=1):
+        title = snippet.get("title") or snippet.get("source") or ""
+        line = f"[{i}] {title}: {' '.join(snippet['text'].split())}"
+        if used + len(line) > max_chars:
+            line = line[:max(max_chars - used, 0)]
+        if not line:
+            break
+        lines.append(line)
+        used += len(line)
+    if not lines:
+        return ""
+    return "**참고 자료 (관련 있는 내용만 활용하세요):**\n" + "\n".join(lines)
+
+
+_retriever: Optional[LocalRetriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> LocalRetriever:
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = LocalRetriever(settings.RETRIEVAL_INDEX_DIR)
+    return _retriever
+
+
+def use_local_retrieval() -> bool:
+    """RAG_BACKEND=local always uses the local index; auto uses it when an index has been built."""
+    backend = settings.RAG_BACKEND
+    if backend == "local":
+        return True
+    if backend == "auto":
+        return get_retriever().available
+    return False
+
+
+def retrieve_context(query: str, k: Optional[int] = None) -> str:
+    """Returns the formatted reference block for a query, or "" when nothing relevant (or no index) is found."""
+    retriever = get_retriever()
+    if not retriever.available:
+        logger.warning("Local retrieval index not found; continuing without grounding.")
+        return ""
+    try:
+        snippets = retriever.search(query, k or settings.RETRIEVAL_TOP_K, settings.RETRIEVAL_MIN_SCORE)
+    except Exception as e:
+        logger.error(f"Local retrieval failed: {e}")
+        return ""
+    return format_snippets(snippets, settings.RETRIEVAL_MAX_CONTEXT_CHARS)
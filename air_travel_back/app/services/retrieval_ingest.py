@@ -0,0 +1,111 @@
+"""
+Offline ingester for the local retrieval index.
+
+    python -m app.services.retrieval_ingest [--docs DIR] [--out DIR] [--embedder hashing|azure]
+
+Reads .txt / .md files (one document each) and .json / .jsonl files (objects with "text" and
+optional "title"), splits them into overlapping chunks, embeds them and writes index.faiss,
+chunks.json and meta.json. Files are written to a temporary name and renamed into place, so a
+running server never reads a half-written index.
+"""
+import argparse
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List
+
+import faiss
+
+from app.core.config import settings
+from app.services.retrieval import CHUNKS_FILE, INDEX_FILE, META_FILE, get_embedder
+
+logger = logging.getLogger(__name__)
+
+
+def iter_documents(docs_dir: str) -> Iterator[Dict[str, Any]]:
+    for root, _, files in os.walk(docs_dir):
+        for file_name in sorted(files):
+            path = os.path.join(root, file_name)
+            source = os.path.relpath(path, docs_dir)
+            ext = os.path.splitext(file_name)[1].lower()
+            if ext in (".txt", ".md"):
+                with open(path, encoding="utf-8") as f:
+                    yield {"source": source, "title": os.path.splitext(file_name)[0], "text": f.read()}
+            elif ext == ".jsonl":
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            yield {"source": source, "title": record.get("title", ""), "text": record.get("text", "")}
+            elif ext == ".json":
+                with open(path, encoding="utf-8") as f:
+                    records = json.load(f)
+                for record in records if isinstance(records, list) else [records]:
+                    yield {"source": source, "title": record.get("title", ""), "text": record.get("text", "")}
+
+
+def chunk_text(text: str, size: int, overlap: int) -> List[str]:
+    """Splits on paragraph boundaries into chunks of about `size` characters, overlapping by `overlap`."""
+    overlap = min(overlap, size // 2)
+    paragraphs = [" ".join(p.split()) for p in text.split("\n\n") if p.strip()]
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        while len(paragraph) > size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:size])
+            paragraph = paragraph[size - overlap:]
+        if current and len(current) + len(paragraph) + 1 > size:
+            chunks.append(current)
+            current = current[-overlap:] if overlap else ""
+        current = f"{current} {paragraph}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_index(docs_dir: str, out_dir: str, embedder_name: str, chunk_size: int, overlap: int, dim: int) -> int:
+    chunks = []
+    for document in iter_documents(docs_dir):
+        for text in chunk_text(document["text"], chunk_size, overlap):
+            chunks.append({"source": document["source"], "title": document["title"], "text": text})
+    if not chunks:
+        raise SystemExit(f"No documents found in {docs_dir}")
+
+    embedder = get_embedder(embedder_name, dim)
+    # Title is embedded with the text so place names match even when the chunk body omits them.
+    vectors = embedder.embed([f"{chunk['title']} {chunk['text']}" for chunk in chunks])
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+
+    os.makedirs(out_dir, exist_ok=True)
+    meta = {"embedder": embedder_name, "dim": int(vectors.shape[1]), "chunks": len(chunks), "chunk_size": chunk_size}
+    faiss.write_index(index, os.path.join(out_dir, INDEX_FILE + ".tmp"))
+    with open(os.path.join(out_dir, CHUNKS_FILE + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(chunks, f, ensure_ascii=False)
+    with open(os.path.join(out_dir, META_FILE + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    # The index goes last: retrievers treat its presence as "an index exists".
+    for name in (CHUNKS_FILE, META_FILE, INDEX_FILE):
+        os.replace(os.path.join(out_dir, name + ".tmp"), os.path.join(out_dir, name))
+    return len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local retrieval index from travel documents.")
+    parser.add_argument("--docs", default=settings.RETRIEVAL_DOCS_DIR)
+    parser.add_argument("--out", default=settings.RETRIEVAL_INDEX_DIR)
+    parser.add_argument("--embedder", choices=("hashing", "azure"), default=settings.RETRIEVAL_EMBEDDER)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=80)
+    parser.add_argument("--dim", type=int, default=1024, help="vector size for the hashing embedder")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    count = build_index(args.docs, args.out, args.embedder, args.chunk_size, args.overlap, args.dim)
+    print(f"Indexed {count} chunks from {args.docs} into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
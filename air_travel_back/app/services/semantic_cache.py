@@ -0,0 +1,142 @@
+"""
+Semantic cache for informational chat answers.
+
+Answers the small model marks as general (not depending on a specific trip's plan) are stored
+per destination with the question's embedding. A later question whose embedding is close enough
+(cosine >= SEMANTIC_CACHE_THRESHOLD) and younger than SEMANTIC_CACHE_TTL_HOURS is answered from
+the cache without a chat completion. Expired rows are deleted by the job workers (purge_expired).
+"""
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import ChatAnswerCache
+from app.services.openai import get_text_embeddings
+
+logger = logging.getLogger(__name__)
+
+# created_at is the inserting transaction's start time and transactions commit out of order, so each
+# sync re-reads this far behind the newest row it has seen instead of trusting a strict watermark.
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def destination_key(trip_details: Dict) -> str:
+    country = " ".join(str(trip_details.get("destination_country") or "").split()).casefold()
+    city = " ".join(str(trip_details.get("destination_city") or "").split()).casefold()
+    return f"{country}|{city}"
+
+
+class _DestinationIndex:
+    """In-memory inner-product index over one destination's cached questions, keyed by row id."""
+
+    def __init__(self, dim: int):
+        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+        self.created_at: Dict[int, datetime] = {}
+        self.watermark: Optional[datetime] = None
+
+    def add(self, rows: List[ChatAnswerCache]):
+        rows = [row for row in rows if row.id not in self.created_at]
+        if not rows:
+            return
+        vectors = np.stack([np.frombuffer(row.embedding, dtype=np.float32) for row in rows])
+        self.index.add_with_ids(vectors, np.array([row.id for row in rows], dtype=np.int64))
+        for row in rows:
+            self.created_at[row.id] = row.created_at
+            if row.created_at and (self.watermark is None or row.created_at > self.watermark):
+                self.watermark = row.created_at
+
+    def remove(self, row_ids: List[int]):
+        if row_ids:
+            self.index.remove_ids(np.array(row_ids, dtype=np.int64))
+            for row_id in row_ids:
+                self.created_at.pop(row_id, None)
+
+
+class SemanticAnswerCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, _DestinationIndex] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SEMANTIC_CACHE_ENABLED and bool(settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME)
+
+    def _cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(hours=settings.SEMANTIC_CACHE_TTL_HOURS)
+
+    def _sync(self, db: Session, destination: str, dim: int) -> _DestinationIndex:
+        """Loads rows added since the last lookup (by any process) and drops expired ones."""
+        entry = self._indexes.get(destination)
+        if entry is None:
+            entry = self._indexes[destination] = _DestinationIndex(dim)
+        cutoff = self._cutoff()
+        since = cutoff if entry.watermark is None else max(cutoff, entry.watermark - SYNC_OVERLAP)
+        rows = db.query(ChatAnswerCache).filter(
+            ChatAnswerCache.destination_key == destination,
+            ChatAnswerCache.created_at >= since
+        ).order_by(ChatAnswerCache.id).all()
+        entry.add(rows)
+        entry.remove([row_id for row_id, created_at in entry.created_at.items() if created_at and created_at < cutoff])
+        return entry
+
+    def embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(get_text_embeddings([question.strip()])[0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, db: Session, trip_details: Dict, question: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Returns (cached answer or None, question embedding). The embedding is handed back so a miss
+        can be stored without embedding the question twice. Never raises; failures are a miss.
+        """
+        if not self.enabled:
+            return None, None
+        try:
+            vector = self.embed(question)
+            destination = destination_key(trip_details)
+            with self._lock:
+                entry = self._sync(db, destination, vector.shape[0])
+                if entry.index.ntotal == 0:
+                    return None, vector
+                scores, ids = entry.index.search(vector.reshape(1, -1), 1)
+            score, row_id = float(scores[0][0]), int(ids[0][0])
+            if row_id < 0 or score < settings.SEMANTIC_CACHE_THRESHOLD:
+                return None, vector
+            row = db.query(ChatAnswerCache).filter(ChatAnswerCache.id == row_id).first()
+            if not row:
+                return None, vector
+            row.hit_count = (row.hit_count or 0) + 1
+            logger.info(f"Semantic cache hit for '{question}' (row {row_id}, score {score:.3f})")
+            return row.answer, vector
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None, None
+
+    def store(self, db: Session, trip_details: Dict, question: str, answer: str, vector: Optional[np.ndarray]):
+        """Adds a general answer to the cache. The row is flushed; the caller commits."""
+        if not self.enabled or vector is None or not answer:
+            return
+        row = ChatAnswerCache(
+            destination_key=destination_key(trip_details),
+            question=question.strip(),
+            embedding=vector.astype(np.float32).tobytes(),
+            answer=answer,
+        )
+        db.add(row)
+        db.flush()
+
+    def purge_expired(self, db: Session) -> int:
+        """Deletes rows past SEMANTIC_CACHE_TTL_HOURS (lookups already ignore them) and commits."""
+        deleted = db.query(ChatAnswerCache).filter(
+            ChatAnswerCache.created_at < self._cutoff()
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+
+answer_cache = SemanticAnswerCache()
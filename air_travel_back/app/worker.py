@@ -0,0 +1,45 @@
+"""
+Background job worker.
+
+    python -m app.worker [--concurrency N] [--kind plan_generation ...]
+
+Claims jobs enqueued by the web processes and runs them (see app.services.jobs). Run as many
+workers as plan generation throughput needs; they coordinate through the jobs table. SIGINT/SIGTERM
+stop claiming new jobs and let the running ones finish.
+"""
+import argparse
+import logging
+import signal
+import threading
+
+from app.core.config import settings
+from app.db.database import Base, engine
+from app.services.jobs import JOB_HANDLERS, JobWorker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background jobs (trip plan generation).")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--kind", action="append", choices=sorted(JOB_HANDLERS), help="only run these job kinds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    Base.metadata.create_all(bind=engine)
+
+    worker = JobWorker(concurrency=args.concurrency, kinds=args.kind)
+    stopping = threading.Event()
+
+    def request_stop(signum, frame):
+        logging.getLogger(__name__).info("Stopping after the running jobs finish...")
+        stopping.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    worker.start()
+    stopping.wait()
+    worker.stop()
+
+
+if __name__ == "__main__":
+    main()
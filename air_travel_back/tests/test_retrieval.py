@@ -0,0 +1,56 @@
+"""
+Offline checks for local retrieval: the hashing embedder, top-k search over an ingested corpus, and
+pickup of a re-ingested index by a running retriever. Run from air_travel_back: python -m pytest tests
+"""
+import numpy as np
+
+from app.services.retrieval import HashingEmbedder, LocalRetriever
+from app.services.retrieval_ingest import build_index
+
+CORPUS = {
+    "gyeongbokgung.md": "경복궁\n\n조선 왕조의 법궁으로 근정전과 경회루가 있습니다. 수문장 교대식은 매일 열립니다.",
+    "namsan.md": "남산서울타워\n\n남산 정상의 전망대에서 서울 야경을 볼 수 있습니다. 케이블카로 올라갈 수 있습니다.",
+    "bukchon.md": "북촌한옥마을\n\n경복궁과 창덕궁 사이의 전통 한옥 주거지입니다. 주민이 사는 마을이므로 조용히 관람해야 합니다.",
+}
+
+
+def write_corpus(docs_dir, corpus):
+    docs_dir.mkdir(exist_ok=True)
+    for name, text in corpus.items():
+        (docs_dir / name).write_text(text, encoding="utf-8")
+
+
+def ingest(tmp_path, corpus):
+    write_corpus(tmp_path / "docs", corpus)
+    return build_index(str(tmp_path / "docs"), str(tmp_path / "index"), "hashing", chunk_size=500, overlap=80, dim=512)
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=256)
+    first, second = embedder.embed(["남산 케이블카 야경", "남산 케이블카 야경"])
+    assert first.shape == (256,)
+    assert np.allclose(first, second)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+    assert np.allclose(embedder.embed([""])[0], 0.0)
+
+
+def test_search_ranks_matching_document_first(tmp_path):
+    assert ingest(tmp_path, CORPUS) == len(CORPUS)
+    retriever = LocalRetriever(str(tmp_path / "index"))
+
+    results = retriever.search("수문장 교대식 근정전", k=2)
+    assert [r["source"] for r in results][0] == "gyeongbokgung.md"
+    assert len(results) == 2
+    assert results[0]["score"] >= results[1]["score"]
+
+    assert retriever.search("남산 전망대 야경", k=1)[0]["source"] == "namsan.md"
+    assert retriever.search("   ") == []
+
+
+def test_reingested_index_is_picked_up(tmp_path):
+    ingest(tmp_path, CORPUS)
+    retriever = LocalRetriever(str(tmp_path / "index"))
+    assert all(r["source"] != "lotte.md" for r in retriever.search("롯데월드 아쿠아리움", k=3))
+
+    ingest(tmp_path, {**CORPUS, "lotte.md": "롯데월드\n\n잠실의 실내 테마파크와 아쿠아리움입니다."})
+    assert retriever.search("롯데월드 아쿠아리움", k=1)[0]["source"] == "lotte.md"
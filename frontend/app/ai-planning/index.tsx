@@ -1,4 +1,4 @@
-import React, { useEffect, useRef } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
   View,
   Text,
@@ -15,6 +15,10 @@ const AIPlanningPage: React.FC = () => {
   const { tripId } = useLocalSearchParams();
   const { token } = useAuth();
   const animatedValue = useRef(new Animated.Value(0)).current;
+  // 생성 중 스트리밍으로 도착하는 일정 미리보기
+  const [streamedItems, setStreamedItems] = useState<{ id: number; day: number; order_in_day: number; place_name: string }[]>([]);
+  // 미리보기가 속한 생성 시도 번호 (실패한 시도의 항목은 롤백되므로 버립니다)
+  const attemptRef = useRef(0);
 
   useEffect(() => {
     // 로딩 애니메이션 시작
@@ -55,6 +59,33 @@ const AIPlanningPage: React.FC = () => {
 
     ws.onmessage = (event) => {
       const messageData = JSON.parse(event.data);
+      if (messageData.type === 'plan_item') {
+        const item = messageData.payload;
+        const attempt = messageData.attempt ?? 0;
+        if (attempt < attemptRef.current) {
+          return;
+        }
+        const newAttempt = attempt > attemptRef.current;
+        attemptRef.current = attempt;
+        setStreamedItems((prev) =>
+          [...(newAttempt ? [] : prev.filter((p) => p.id !== item.id)), item].sort(
+            (a, b) => a.day - b.day || a.order_in_day - b.order_in_day
+          )
+        );
+        return;
+      }
+      if (messageData.type === 'job_status') {
+        const job = messageData.payload;
+        if (job.status === 'running' && job.attempts > attemptRef.current) {
+          // 새 시도가 시작되면 이전 시도의 미리보기를 비웁니다
+          attemptRef.current = job.attempts;
+          setStreamedItems([]);
+        } else if (job.status === 'failed') {
+          Alert.alert("오류", "여행 일정 생성에 실패했습니다. 잠시 후 다시 시도해주세요.");
+          router.replace(`/trip-itinerary/${tripId}`);
+        }
+        return;
+      }
       if (messageData.type === 'plan_update' || messageData.type === 'initial_plan_ready') {
         console.log('Plan update received, navigating to itinerary.');
         router.replace(`/trip-itinerary/${tripId}`);
@@ -110,6 +141,13 @@ const AIPlanningPage: React.FC = () => {
           
           {/* 로딩 텍스트 */}
           <Text style={styles.loadingText}>일정을 만들고 있습니다...</Text>
+
+          {/* 스트리밍된 일정 미리보기 */}
+          {streamedItems.map((item) => (
+            <Text key={item.id} style={styles.streamedItemText}>
+              {item.day}일차 · {item.place_name}
+            </Text>
+          ))}
         </View>
       </View>
     </SafeAreaView>
@@ -177,6 +215,11 @@ const styles = StyleSheet.create({
     color: '#1a202c',
     fontWeight: '500',
   },
+  streamedItemText: {
+    fontSize: 14,
+    color: '#4a5568',
+    marginTop: 8,
+  },
 });
 
 export default AIPlanningPage;
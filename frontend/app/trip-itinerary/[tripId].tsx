@@ -39,7 +39,7 @@ interface Coordinate {
 export default function TripItineraryPage() {
   const router = useRouter();
   const { tripId } = useLocalSearchParams();
-  const { user, token, getTripDetails, deleteItineraryItem, getPlaceDetailsByName, generateGptDescription, leaveTrip } = useAuth();
+  const { user, token, getTripDetails, deleteItineraryItem, getPlaceDetailsByName, generateGptDescription, generateTripDescriptions, leaveTrip } = useAuth();
 
   const [tripData, setTripData] = useState<TripDetails | null>(null);
   const [isLoading, setIsLoading] = useState(true);
@@ -75,6 +75,9 @@ export default function TripItineraryPage() {
       if (data) {
         setTripData(data);
         setChatMessages(data.chats || []);
+        if (data.itinerary_items.some((item: TripItineraryItem) => !item.gpt_description)) {
+          generateTripDescriptions(tripId);
+        }
         if (data.itinerary_items.length > 0 && tripData === null) {
           const earliestDay = Math.min(...data.itinerary_items.map((item: TripItineraryItem) => item.day));
           setSelectedDay(earliestDay);
@@ -89,7 +92,7 @@ export default function TripItineraryPage() {
     } finally {
       setIsLoading(false);
     }
-  }, [tripId, getTripDetails, router]);
+  }, [tripId, getTripDetails, generateTripDescriptions, router]);
 
   useFocusEffect(useCallback(() => { fetchTripData(); }, [fetchTripData]));
 
@@ -143,6 +146,16 @@ export default function TripItineraryPage() {
         setIsGptLoading(false);
         Alert.alert("일정 업데이트", "GPT에 의해 여행 일정이 업데이트되었습니다.");
         fetchTripData();
+      } else if (messageData.type === 'item_description') {
+        const { id, gpt_description } = messageData.payload;
+        setTripData(prevTripData => {
+          if (!prevTripData) return null;
+          const newItineraryItems = prevTripData.itinerary_items.map(item =>
+            item.id === id ? { ...item, gpt_description } : item
+          );
+          return { ...prevTripData, itinerary_items: newItineraryItems };
+        });
+        setSelectedItem(prev => (prev && prev.id === id ? { ...prev, gpt_description } : prev));
       }
     };
     return () => ws.current?.close();
@@ -103,7 +103,10 @@ const TripPreferencesPage: React.FC = () => {
 
       const newTrip = await createTrip(requestBody);
 
-      if (newTrip) {
+      if (newTrip && newTrip.plan_draft_ready) {
+        // A cached plan was copied in as a draft; it is personalized in the background.
+        router.replace(`/trip-itinerary/${newTrip.id}`);
+      } else if (newTrip) {
         router.replace({
           pathname: '/ai-planning',
           params: { tripId: newTrip.id }
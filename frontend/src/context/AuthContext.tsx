@@ -116,6 +116,7 @@ interface AuthContextType extends AuthState {
   createItineraryItem: (tripId: string, itemData: any) => Promise<boolean>;
   getPlaceDetailsByName: (placeName: string) => Promise<PlaceDetails | null>;
   generateGptDescription: (tripId: string, itemId: number) => Promise<TripItineraryItem | null>;
+  generateTripDescriptions: (tripId: string) => Promise<number>;
   leaveTrip: (tripId: string) => Promise<boolean>;
   updateProfile: (profileData: Partial<User>, imageUri?: string) => Promise<boolean>;
   // Packing List
@@ -381,6 +382,17 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
     }
   };
 
+  // Starts description generation for every item of the trip; results arrive as `item_description` WebSocket messages.
+  const generateTripDescriptions = async (tripId: string): Promise<number> => {
+    try {
+      const response = await axios.post(`${process.env.EXPO_PUBLIC_API_URL}/v1/trips/${tripId}/itinerary/generate-descriptions`);
+      return response.data.pending;
+    } catch (error) {
+      console.error('Failed to start trip description generation:', error);
+      return 0;
+    }
+  };
+
   const leaveTrip = async (tripId: string): Promise<boolean> => {
     try {
       await axios.delete(`${process.env.EXPO_PUBLIC_API_URL}/v1/trips/${tripId}/members/me`);
@@ -559,6 +571,7 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
     createItineraryItem,
     getPlaceDetailsByName,
     generateGptDescription,
+    generateTripDescriptions,
     leaveTrip,
     updateProfile,
     // Packing List